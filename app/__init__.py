@@ -17,16 +17,28 @@ def create_app(config_class=Config):
     if not os.path.exists(app.instance_path):
         os.makedirs(app.instance_path)
 
+    from app.database import init_engine_profile, setup_engine
+    init_engine_profile(app)
     db.init_app(app)
+    from app.metrics import init_metrics
+    from app.profiling import SqlProfiler
+    with app.app_context():
+        setup_engine(app, db.engine)
+        SqlProfiler.from_config(app.config).install(app, db.engine)
+        init_metrics(app, db.engine)
     migrate.init_app(app, db)
     login.init_app(app)
 
-    from app.models import User
-    @login.user_loader
-    def load_user(id):
-        return User.query.get(int(id))
+    from app.identity import load_principal
+    login.user_loader(load_principal)
 
     from app.routes import bp as main_bp
     app.register_blueprint(main_bp)
 
-    return app
\ No newline at end of file
+    from app.commands import register_commands
+    register_commands(app)
+
+    from app.assets import load_manifest
+    load_manifest(app, build=app.config['ASSETS_AUTO_BUILD'])
+
+    return app
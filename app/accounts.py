@@ -0,0 +1,157 @@
+import hashlib
+import hmac
+import logging
+import secrets
+
+from flask import current_app
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import ACCOUNT_NUMBER_SEQUENCE, AppSetting, BankAccount, SequenceCounter
+
+logger = logging.getLogger(__name__)
+
+DIGITS = 10
+HALF = 10 ** (DIGITS // 2)
+ROUNDS = 8
+COUNTER_NAME = 'account_number'
+KEY_SETTING = 'account_number_key'
+
+
+class AccountNumberKeyMismatch(RuntimeError):
+    pass
+
+
+class AccountNumberPermutation:
+    """
+    Keyed format-preserving permutation of [0, 10**10): a balanced Feistel network over two
+    5-digit halves with an HMAC-SHA256 round function.
+
+    Feeding it consecutive sequence values yields numbers that look random but can never
+    repeat, because every Feistel network is a bijection. The key must not change once
+    accounts exist (a new key is a different permutation and may reuse old numbers).
+    """
+
+    def __init__(self, key):
+        self.key = key.encode() if isinstance(key, str) else key
+
+    def _round(self, value, index):
+        digest = hmac.new(self.key, f'{index}:{value}'.encode(), hashlib.sha256).digest()
+        return int.from_bytes(digest[:8], 'big') % HALF
+
+    def encrypt(self, value):
+        left, right = divmod(value, HALF)
+        for index in range(ROUNDS):
+            left, right = right, (left + self._round(right, index)) % HALF
+        return left * HALF + right
+
+    def decrypt(self, value):
+        left, right = divmod(value, HALF)
+        for index in reversed(range(ROUNDS)):
+            left, right = (right - self._round(left, index)) % HALF, left
+        return left * HALF + right
+
+    def format(self, value):
+        return str(self.encrypt(value % HALF ** 2)).zfill(DIGITS)
+
+
+def _load_key():
+    """(key, fresh): fresh is True when this call stored the key and its transaction is still open."""
+    configured = current_app.config['ACCOUNT_NUMBER_KEY']
+    stored = db.session.get(AppSetting, KEY_SETTING)
+    if stored is None:
+        if configured:
+            key = configured
+        elif db.session.query(BankAccount.id).first() is not None:
+            key = current_app.config['SECRET_KEY']
+            logger.warning('Clave de números de cuenta fijada con el SECRET_KEY actual; ya puede rotarse.')
+        else:
+            key = secrets.token_hex(32)
+        try:
+            with db.session.begin_nested():
+                db.session.add(AppSetting(name=KEY_SETTING, value=key))
+            return key, True
+        except IntegrityError:
+            # Another process stored its key first; that one wins.
+            stored = db.session.get(AppSetting, KEY_SETTING)
+
+    if configured and not hmac.compare_digest(configured, stored.value):
+        raise AccountNumberKeyMismatch(
+            'ACCOUNT_NUMBER_KEY no coincide con la clave guardada; cambiarla repetiría números de cuenta.')
+    return stored.value, False
+
+
+def account_number_key():
+    """
+    The permutation key, stored in AppSetting the first time it is needed so that no config
+    change (rotating SECRET_KEY in particular) can switch permutations under issued numbers.
+
+    First use: ACCOUNT_NUMBER_KEY if set; otherwise, if accounts already exist, the SECRET_KEY
+    they were numbered with until now; otherwise a random key. Afterwards ACCOUNT_NUMBER_KEY
+    may be left unset, but if set it must match the stored key.
+    """
+    return _load_key()[0]
+
+
+def _permutation():
+    cached = current_app.extensions.get('account_number_permutation')
+    if cached is None:
+        key, fresh = _load_key()
+        cached = AccountNumberPermutation(key)
+        # A key stored by this transaction is cached only once it is read back committed:
+        # if the caller rolls back, the next allocation must not keep using a key nobody stored.
+        if not fresh:
+            current_app.extensions['account_number_permutation'] = cached
+    return cached
+
+
+def next_sequence_values(count=1):
+    """Reserve `count` consecutive values: nextval() on PostgreSQL, a counter row elsewhere."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        if count == 1:
+            return [db.session.execute(select(ACCOUNT_NUMBER_SEQUENCE.next_value())).scalar()]
+        values = db.session.execute(
+            select(ACCOUNT_NUMBER_SEQUENCE.next_value()).select_from(db.func.generate_series(1, count))
+        ).scalars().all()
+        return sorted(values)
+
+    # The UPDATE takes the row lock first, so concurrent writers queue instead of reading the same value.
+    stmt = update(SequenceCounter).where(SequenceCounter.name == COUNTER_NAME).values(
+        value=SequenceCounter.value + count
+    ).returning(SequenceCounter.value)
+    last = db.session.execute(stmt).scalar()
+    if last is None:
+        db.session.add(SequenceCounter(name=COUNTER_NAME, value=count))
+        db.session.flush()
+        last = count
+    return list(range(last - count + 1, last + 1))
+
+
+def allocate_account_numbers(count=1):
+    """Unique 10-digit account numbers, without looking up existing accounts."""
+    permutation = _permutation()
+    return [permutation.format(value) for value in next_sequence_values(count)]
+
+
+def allocate_account_number():
+    return allocate_account_numbers(1)[0]
+
+
+def open_account(user_id, attempts=3, **fields):
+    """
+    Create the BankAccount for `user_id` with an allocated number (not committed).
+
+    Numbers from the allocator never collide with each other; the savepoint retry only covers
+    accounts created by the old random generator that happen to sit on a permuted value.
+    """
+    for attempt in range(attempts):
+        account = BankAccount(account_number=allocate_account_number(), user_id=user_id, **fields)
+        try:
+            with db.session.begin_nested():
+                db.session.add(account)
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise
+            continue
+        return account
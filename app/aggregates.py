@@ -0,0 +1,101 @@
+import os
+import threading
+from datetime import datetime
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db
+from app.models import BankAccount, BankLoan, BankTransaction, EconomyAggregate
+
+# Counters read by government_dashboard. Every write path updates them in the same
+# transaction as the change itself; `flask economy verify` recomputes them from scratch.
+MONEY_SUPPLY = 'money_supply'
+OUTSTANDING_DEBT = 'outstanding_debt'
+SALARY_EXPENSE = 'salary_expense'
+INCOME_TYPES = ('fine_payment', 'license_buy')
+# Each counter is spread over SLOTS rows and summed on read, so concurrent money transactions
+# do not all queue on one row lock until commit.
+SLOTS = 16
+
+
+def income_key(transaction_type):
+    return f'income:{transaction_type}'
+
+
+ALL_KEYS = (MONEY_SUPPLY, OUTSTANDING_DEBT, SALARY_EXPENSE) + tuple(income_key(t) for t in INCOME_TYPES)
+
+
+def _slot():
+    # Fixed per thread, so one transaction always writes the same slot of every counter it touches.
+    return hash((os.getpid(), threading.get_ident())) % SLOTS
+
+
+def record(name, delta):
+    """Atomically add `delta` to one slot of a counter (INSERT ... ON CONFLICT DO UPDATE)."""
+    if not delta:
+        return
+    slot = _slot()
+    now = datetime.utcnow()
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        upsert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+        stmt = upsert(EconomyAggregate).values(name=name, slot=slot, value=delta, updated_at=now)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['name', 'slot'], set_={'value': EconomyAggregate.value + delta, 'updated_at': now}
+        ))
+        return
+
+    updated = db.session.execute(
+        update(EconomyAggregate)
+        .where(EconomyAggregate.name == name, EconomyAggregate.slot == slot)
+        .values(value=EconomyAggregate.value + delta, updated_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not updated:
+        db.session.add(EconomyAggregate(name=name, slot=slot, value=delta, updated_at=now))
+
+
+def record_income(transaction_type, amount):
+    record(income_key(transaction_type), amount)
+
+
+def read_all():
+    values = dict.fromkeys(ALL_KEYS, 0.0)
+    values.update(db.session.query(EconomyAggregate.name, func.sum(EconomyAggregate.value))
+                  .group_by(EconomyAggregate.name).all())
+    return values
+
+
+def compute_from_scratch():
+    """Recompute every counter with SQL aggregates over the source tables."""
+    values = dict.fromkeys(ALL_KEYS, 0.0)
+    values[MONEY_SUPPLY] = db.session.query(func.coalesce(func.sum(BankAccount.balance), 0.0)).scalar()
+    values[OUTSTANDING_DEBT] = db.session.query(
+        func.coalesce(func.sum(BankLoan.amount_due), 0.0)
+    ).filter(BankLoan.status == 'Active').scalar()
+
+    totals = db.session.query(BankTransaction.type, func.sum(BankTransaction.amount)).filter(
+        BankTransaction.type.in_(INCOME_TYPES + ('salary',))
+    ).group_by(BankTransaction.type).all()
+    for transaction_type, total in totals:
+        if transaction_type == 'salary':
+            values[SALARY_EXPENSE] = total or 0.0
+        else:
+            values[income_key(transaction_type)] = total or 0.0
+    return values
+
+
+def verify(fix=False, tolerance=0.01):
+    """Return `[(name, stored, actual)]` for drifted counters, optionally overwriting them."""
+    stored = read_all()
+    actual = compute_from_scratch()
+    drift = [(name, stored[name], actual[name]) for name in ALL_KEYS
+             if abs(stored[name] - actual[name]) > tolerance]
+
+    if fix and drift:
+        for name, stored_value, value in drift:
+            record(name, value - stored_value)
+        db.session.commit()
+    return drift
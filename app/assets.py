@@ -0,0 +1,120 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # optional: without it only .gz copies are produced
+    brotli = None
+
+# Files (or directories) under app/static that are site assets rather than uploads.
+ASSET_SOURCES = ('css', 'js', 'img/logo.png')
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map'}
+OUTPUT_DIR = 'dist'
+MANIFEST = 'manifest.json'
+
+
+def _sources(static_folder):
+    for source in ASSET_SOURCES:
+        path = os.path.join(static_folder, source)
+        if os.path.isfile(path):
+            yield source
+        elif os.path.isdir(path):
+            for directory, _, files in os.walk(path):
+                for filename in sorted(files):
+                    yield os.path.relpath(os.path.join(directory, filename), static_folder).replace(os.sep, '/')
+
+
+def _write(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.chmod(tmp, 0o644)  # mkstemp creates 0600; a front web server may serve dist/ directly
+    os.replace(tmp, path)
+
+
+def _fingerprint(static_folder):
+    """{logical name: [size, mtime]} for every source, used to tell whether the build is stale."""
+    stamps = {}
+    for name in _sources(static_folder):
+        stat = os.stat(os.path.join(static_folder, name))
+        stamps[name] = [stat.st_size, stat.st_mtime_ns]
+    return stamps
+
+
+def build_assets(static_folder):
+    """
+    Copy every asset to dist/ under a content-hashed name, with .gz (and .br when the brotli
+    package is installed) next to text files, and write the manifest. Returns the manifest.
+    """
+    out = os.path.join(static_folder, OUTPUT_DIR)
+    files = {}
+    for name in _sources(static_folder):
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(name)
+        hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+        target = os.path.join(out, *hashed.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if not os.path.exists(target):
+            _write(target, data)
+            if ext in COMPRESSIBLE:
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(compressed) < len(data):
+                    _write(target + '.gz', compressed)
+                if brotli is not None:
+                    compressed = brotli.compress(data, quality=11)
+                    if len(compressed) < len(data):
+                        _write(target + '.br', compressed)
+        files[name] = hashed
+
+    manifest = {'files': files, 'sources': _fingerprint(static_folder)}
+    _write(os.path.join(out, MANIFEST), json.dumps(manifest, indent=1, sort_keys=True).encode())
+    return manifest
+
+
+def load_manifest(app, build=False):
+    """Read dist/manifest.json; with `build`, (re)build it first when missing or out of date."""
+    path = os.path.join(app.static_folder, OUTPUT_DIR, MANIFEST)
+    manifest = None
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+    if build and (manifest is None or manifest.get('sources') != _fingerprint(app.static_folder)):
+        manifest = build_assets(app.static_folder)
+    app.extensions['asset_manifest'] = (manifest or {}).get('files', {})
+    return app.extensions['asset_manifest']
+
+
+def asset_url(filename):
+    """url_for('static') for assets, but pointing at the fingerprinted copy when there is one."""
+    hashed = current_app.extensions.get('asset_manifest', {}).get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('main.asset', filename=hashed)
+
+
+def send_asset(filename):
+    """Serve a fingerprinted file, preferring a precompressed copy the client accepts."""
+    directory = os.path.join(current_app.static_folder, OUTPUT_DIR)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    accepted = request.accept_encodings
+    served, encoding = filename, None
+    for suffix, name in (('.br', 'br'), ('.gz', 'gzip')):
+        if accepted[name] and os.path.exists(os.path.join(directory, *(filename + suffix).split('/'))):
+            served, encoding = filename + suffix, name
+            break
+
+    response = send_from_directory(directory, served, mimetype=mimetype, max_age=31536000)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if os.path.splitext(filename)[1] in COMPRESSIBLE:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,116 @@
+import random
+import time
+
+from sqlalchemy import update
+from sqlalchemy.exc import DBAPIError
+
+from app import aggregates, db
+from app.models import BankAccount, GovernmentFund
+
+MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.05
+
+# Driver messages for errors that only mean "another transaction got there first".
+RETRYABLE_ERRORS = (
+    'deadlock detected',            # PostgreSQL
+    'could not serialize access',   # PostgreSQL (SERIALIZABLE / REPEATABLE READ)
+    'lock_not_available',
+    'database is locked',           # SQLite
+    'database table is locked',
+)
+
+
+class InsufficientFunds(Exception):
+    """The conditional debit matched no row: the balance is lower than the amount."""
+
+
+def is_retryable(error):
+    message = str(getattr(error, 'orig', error)).lower()
+    return any(fragment in message for fragment in RETRYABLE_ERRORS)
+
+
+def run_atomic(unit_of_work, attempts=MAX_ATTEMPTS):
+    """
+    Run `unit_of_work()` and commit, retrying on deadlocks and lock timeouts.
+
+    The callable is re-executed from scratch after a rollback, so it must create every
+    object it adds. Business errors such as InsufficientFunds roll back and propagate.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            result = unit_of_work()
+            db.session.commit()
+            return result
+        except DBAPIError as e:
+            db.session.rollback()
+            if attempt == attempts or not is_retryable(e):
+                raise
+            time.sleep(RETRY_BASE_DELAY * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def _refresh(*accounts):
+    # The UPDATEs bypass the ORM; make loaded accounts re-read their balance.
+    for account in accounts:
+        if account in db.session:
+            db.session.expire(account, ['balance'])
+
+
+def lock_accounts(account_ids):
+    """SELECT ... FOR UPDATE in ascending id order so two transfers never lock in opposite order."""
+    ids = sorted(set(account_ids))
+    db.session.query(BankAccount.id).filter(BankAccount.id.in_(ids)).order_by(BankAccount.id).with_for_update().all()
+
+
+def debit(account, amount, allow_overdraft=False, track=True):
+    """UPDATE ... SET balance = balance - :x WHERE id = :id AND balance >= :x."""
+    stmt = update(BankAccount).where(BankAccount.id == account.id)
+    if not allow_overdraft:
+        stmt = stmt.where(BankAccount.balance >= amount)
+    updated = db.session.execute(
+        stmt.values(balance=BankAccount.balance - amount).execution_options(synchronize_session=False)
+    ).rowcount
+    if updated != 1:
+        raise InsufficientFunds(account.id)
+    if track:
+        aggregates.record(aggregates.MONEY_SUPPLY, -amount)
+    _refresh(account)
+
+
+def credit(account, amount, track=True):
+    db.session.execute(
+        update(BankAccount)
+        .where(BankAccount.id == account.id)
+        .values(balance=BankAccount.balance + amount)
+        .execution_options(synchronize_session=False)
+    )
+    if track:
+        aggregates.record(aggregates.MONEY_SUPPLY, amount)
+    _refresh(account)
+
+
+def transfer(source, target, amount):
+    """Move money between two accounts; the money supply does not change."""
+    lock_accounts([source.id, target.id])
+    debit(source, amount, track=False)
+    credit(target, amount, track=False)
+
+
+def adjust_fund(fund, delta, allow_overdraft=True):
+    """
+    Atomic `fund.balance += delta` on the GovernmentFund row. Loans and payroll may take the
+    fund below zero; with `allow_overdraft=False` a withdrawal larger than the balance raises
+    InsufficientFunds instead.
+    """
+    stmt = update(GovernmentFund).where(GovernmentFund.id == fund.id)
+    if delta < 0 and not allow_overdraft:
+        stmt = stmt.where(GovernmentFund.balance >= -delta)
+    updated = db.session.execute(
+        stmt.values(balance=GovernmentFund.balance + delta).execution_options(synchronize_session=False)
+    ).rowcount
+    if updated != 1:
+        raise InsufficientFunds(fund.id)
+    if fund in db.session:
+        db.session.expire(fund, ['balance'])
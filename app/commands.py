@@ -0,0 +1,191 @@
+import logging
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+
+@click.command('worker')
+@click.option('--only', multiple=True, help='Ejecuta solo los jobs indicados (repetible).')
+@click.option('--once', is_flag=True, help='Ejecuta cada job una vez y termina.')
+@with_appcontext
+def worker_command(only, once):
+    """Run background jobs (Discord outbox, ...)."""
+    from app.worker import run_worker
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    run_worker(current_app._get_current_object(), only=only, once=once)
+
+
+economy_cli = AppGroup('economy', help='Agregados económicos del panel de Gobierno.')
+
+
+@economy_cli.command('verify')
+@click.option('--fix', is_flag=True, help='Sobrescribe los contadores con los valores recalculados.')
+@click.option('--tolerance', default=0.01, show_default=True, help='Diferencia máxima aceptada.')
+def economy_verify_command(fix, tolerance):
+    """Recompute the economy counters from scratch and report drift."""
+    from app import aggregates
+
+    drift = aggregates.verify(fix=fix, tolerance=tolerance)
+    if not drift:
+        click.echo('Agregados correctos.')
+        return
+
+    for name, stored, actual in drift:
+        click.echo(f'{name}: guardado={stored:,.2f} real={actual:,.2f} diferencia={stored - actual:+,.2f}')
+    if fix:
+        click.echo(f'{len(drift)} contadores corregidos.')
+    else:
+        raise SystemExit(1)
+
+
+rollups_cli = AppGroup('rollups', help='Rollups diarios de transacciones.')
+
+
+@rollups_cli.command('build')
+@click.option('--rebuild', is_flag=True, help='Borra los rollups y los recalcula desde cero.')
+@click.option('--chunk-size', default=5000, show_default=True)
+def rollups_build_command(rebuild, chunk_size):
+    """Fold new transactions into the daily rollup buckets."""
+    from app.rollups import build_rollups, rebuild_rollups
+
+    processed = rebuild_rollups(chunk_size) if rebuild else build_rollups(chunk_size)
+    click.echo(f'{processed} transacciones agregadas.')
+
+
+@click.command('sweep-loans')
+@click.option('--chunk-size', default=500, show_default=True)
+@with_appcontext
+def sweep_loans_command(chunk_size):
+    """Apply late-payment penalties to every overdue loan."""
+    from app.loans import sweep_loan_penalties
+
+    click.echo(f'{sweep_loan_penalties(chunk_size=chunk_size)} préstamos penalizados.')
+
+
+@click.command('lottery-draw')
+@with_appcontext
+def lottery_draw_command():
+    """Run the daily lottery draw if it is due."""
+    from app.lottery import run_daily_draw
+
+    draw = run_daily_draw()
+    if draw is None:
+        click.echo('No hay sorteo pendiente.')
+    else:
+        click.echo(f'Sorteo del {draw.draw_date}: número {draw.winning_number}, {draw.winners} ganadores.')
+
+
+uploads_cli = AppGroup('uploads', help='Almacén de archivos subidos por contenido.')
+
+
+@uploads_cli.command('gc')
+def uploads_gc_command():
+    """Delete stored files that nothing references any more."""
+    from app.uploads import collect_garbage
+
+    click.echo(f'{collect_garbage()} archivos eliminados.')
+
+
+@uploads_cli.command('process')
+@click.option('--limit', type=int, help='Procesa como máximo este número de archivos.')
+def uploads_process_command(limit):
+    """Build image variants for pending uploads now instead of waiting for the worker."""
+    from app.images import process_pending
+
+    click.echo(f'{process_pending(limit)} imágenes procesadas.')
+
+
+@uploads_cli.command('import-legacy')
+def uploads_import_legacy_command():
+    """Move files referenced by their old flat name into the store, deduplicating them."""
+    from app.uploads import import_legacy
+
+    moved, missing = import_legacy()
+    click.echo(f'{moved} referencias migradas, {missing} archivos no encontrados.')
+
+
+assets_cli = AppGroup('assets', help='Archivos estáticos con huella y precomprimidos.')
+
+
+@assets_cli.command('build')
+def assets_build_command():
+    """Fingerprint and precompress static assets into app/static/dist."""
+    from app.assets import build_assets, load_manifest
+
+    manifest = build_assets(current_app.static_folder)
+    load_manifest(current_app)
+    for name, hashed in sorted(manifest['files'].items()):
+        click.echo(f'{name} -> {hashed}')
+
+
+metrics_cli = AppGroup('metrics', help='Métricas Prometheus compartidas entre procesos.')
+
+
+@metrics_cli.command('reset')
+def metrics_reset_command():
+    """Delete every process snapshot and the archive, e.g. right before a deploy."""
+    from app.metrics import REGISTRY
+
+    click.echo(f'{REGISTRY.reset()} archivos eliminados.')
+
+
+@click.command('pdf-check')
+@with_appcontext
+def pdf_check_command():
+    """Render a sample criminal record to check fpdf2 and the configured fonts (run after upgrades)."""
+    from app.pdfs import check_renderer
+
+    click.echo(f'PDF correcto ({check_renderer():,} bytes).')
+
+
+synthetic_cli = AppGroup('synthetic', help='Datos sintéticos a escala de producción para pruebas de carga.')
+
+
+@synthetic_cli.command('generate')
+@click.option('--citizens', default=20000, show_default=True)
+@click.option('--transactions', default=2000000, show_default=True)
+@click.option('--officials', default=40, show_default=True, help='Funcionarios por departamento.')
+@click.option('--tickets', default=50000, show_default=True, help='Boletos de lotería de la última semana.')
+@click.option('--photos', default=24, show_default=True, help='Imágenes distintas compartidas por las fotos.')
+@click.option('--days', default=180, show_default=True, help='Días de historial.')
+@click.option('--password', default='synthetic', show_default=True, help='Contraseña de todas las cuentas.')
+@click.option('--seed', default=1, show_default=True)
+@click.option('--manifest', default=None, help='Ruta del manifiesto [instance/synthetic.json].')
+@click.option('--yes', is_flag=True, help='No pide confirmación.')
+def synthetic_generate_command(citizens, transactions, officials, tickets, photos, days, password, seed,
+                               manifest, yes):
+    """Bulk-generate citizens, accounts, history, records and tickets, then write the load-test manifest."""
+    from app import db
+    from app.synthetic import generate_world, has_synthetic_data, write_manifest
+
+    if has_synthetic_data():
+        raise click.ClickException('La base de datos ya tiene datos sintéticos; usa una base de datos nueva.')
+    click.echo(f'Base de datos: {db.engine.url.render_as_string(hide_password=True)}')
+    if not yes:
+        click.confirm(f'¿Generar {citizens:,} ciudadanos y {transactions:,} transacciones?', abort=True)
+
+    started = time.perf_counter()
+    counts = generate_world(citizens=citizens, transactions=transactions, officials_per_department=officials,
+                            photos=photos, tickets=tickets, days=days, password=password, seed=seed,
+                            echo=click.echo)
+    manifest = manifest or os.path.join(current_app.instance_path, 'synthetic.json')
+    os.makedirs(os.path.dirname(os.path.abspath(manifest)), exist_ok=True)
+    write_manifest(manifest, password, seed=seed)
+    click.echo(f'{sum(counts.values()):,} filas en {time.perf_counter() - started:.0f}s. Manifiesto: {manifest}')
+
+
+def register_commands(app):
+    app.cli.add_command(worker_command)
+    app.cli.add_command(economy_cli)
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(sweep_loans_command)
+    app.cli.add_command(lottery_draw_command)
+    app.cli.add_command(uploads_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(metrics_cli)
+    app.cli.add_command(pdf_check_command)
+    app.cli.add_command(synthetic_cli)
@@ -0,0 +1,235 @@
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+
+# Per-dialect defaults; every value can be overridden with the DB_* settings in config.py.
+PRESETS = {
+    'postgresql': {
+        'pool_size': 10,
+        'max_overflow': 5,
+        'pool_timeout': 10,
+        # Railway's proxy drops idle connections; recycle before it does and ping on checkout.
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'statement_timeout_ms': 15000,
+    },
+    'sqlite': {
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+        'pool_recycle': -1,
+        'pool_pre_ping': False,
+        # sqlite3's own wait for a locked database, in seconds.
+        'busy_timeout': 15,
+        # Production mode (configure_sqlite): WAL + pragmas on every connection and one writer
+        # per process at a time. Off, the database runs with SQLite's stock settings.
+        'tuned': True,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_kib': 64 * 1024,
+        'serialize_writes': True,
+    },
+}
+
+def _flag(value):
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+SETTINGS = {
+    'pool_size': ('DB_POOL_SIZE', int),
+    'max_overflow': ('DB_MAX_OVERFLOW', int),
+    'pool_timeout': ('DB_POOL_TIMEOUT', float),
+    'pool_recycle': ('DB_POOL_RECYCLE', int),
+    'pool_pre_ping': ('DB_POOL_PRE_PING', _flag),
+    'statement_timeout_ms': ('DB_STATEMENT_TIMEOUT_MS', int),
+    'busy_timeout': ('DB_SQLITE_BUSY_TIMEOUT', float),
+    'tuned': ('DB_SQLITE_TUNED', _flag),
+    'mmap_size': ('DB_SQLITE_MMAP_SIZE', int),
+    'cache_kib': ('DB_SQLITE_CACHE_KIB', int),
+    'serialize_writes': ('DB_SQLITE_SERIALIZE_WRITES', _flag),
+}
+
+# Statements that need SQLite's write lock.
+WRITE_VERBS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER')
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited and how many timed out."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            self.wait_stats.timeouts += 1
+            raise
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+
+class PoolWaitStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = self.timeouts = self.connects = self.invalidations = 0
+        self.wait_total = self.wait_max = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+
+def engine_profile(config):
+    """Resolved settings for the configured database: the dialect preset plus DB_* overrides."""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    dialect = url.get_backend_name()
+    profile = dict(PRESETS.get(dialect, PRESETS['postgresql']))
+    for name, (key, convert) in SETTINGS.items():
+        if config.get(key) not in (None, ''):
+            profile[name] = convert(config[key])
+    profile['dialect'] = dialect
+    profile['in_memory'] = dialect == 'sqlite' and url.database in (None, '', ':memory:')
+    return profile
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the profile; explicit options in the config win."""
+    profile = engine_profile(config)
+    options = {}
+    connect_args = {}
+    if not profile['in_memory']:
+        # In-memory SQLite is left to Flask-SQLAlchemy's StaticPool.
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=profile['pool_size'],
+            max_overflow=profile['max_overflow'],
+            pool_timeout=profile['pool_timeout'],
+            pool_recycle=profile['pool_recycle'],
+            pool_pre_ping=profile['pool_pre_ping'],
+        )
+    if profile['dialect'] == 'postgresql' and profile.get('statement_timeout_ms'):
+        connect_args['options'] = f"-c statement_timeout={profile['statement_timeout_ms']}"
+    if profile['dialect'] == 'sqlite':
+        connect_args['timeout'] = profile['busy_timeout']
+    if connect_args:
+        options['connect_args'] = connect_args
+
+    explicit = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if 'connect_args' in explicit:
+        explicit['connect_args'] = {**connect_args, **explicit['connect_args']}
+    options.update(explicit)
+    return options
+
+
+def init_engine_profile(app):
+    """Call before db.init_app(): fills SQLALCHEMY_ENGINE_OPTIONS from the profile."""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+
+def track_pool(engine):
+    """Count new connections and invalidations (failed pre-pings, dropped connections)."""
+    if not isinstance(engine.pool, TimedQueuePool):
+        return
+
+    # engine.dispose() swaps in a fresh pool, so look the stats up on every event.
+    @event.listens_for(engine, 'connect')
+    def _connect(dbapi_connection, connection_record):
+        engine.pool.wait_stats.connects += 1
+
+    @event.listens_for(engine, 'invalidate')
+    def _invalidate(dbapi_connection, connection_record, exception):
+        engine.pool.wait_stats.invalidations += 1
+
+
+def configure_sqlite(engine, profile):
+    """
+    SQLite production mode. Every new connection gets WAL (readers never block the writer and
+    vice versa), busy_timeout, synchronous=NORMAL (durable at checkpoints, safe with WAL) and
+    mmap/page cache sizing.
+
+    With serialize_writes, threads of one process also queue on a lock from their first write
+    statement until commit or rollback, so they wait their turn instead of spinning in SQLite's
+    busy handler. Other processes are still serialized by SQLite itself through busy_timeout.
+    """
+    if profile['dialect'] != 'sqlite' or profile['in_memory'] or not profile['tuned']:
+        return
+
+    busy_ms = int(profile['busy_timeout'] * 1000)
+
+    @event.listens_for(engine, 'connect')
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={busy_ms}')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f"PRAGMA mmap_size={profile['mmap_size']}")
+        cursor.execute(f"PRAGMA cache_size=-{profile['cache_kib']}")
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.close()
+
+    if not profile['serialize_writes']:
+        return
+
+    write_lock = threading.Lock()
+
+    def release(info):
+        if info.pop('sqlite_write_lock', False):
+            write_lock.release()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _acquire(conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get('sqlite_write_lock') or not statement.lstrip().upper().startswith(WRITE_VERBS):
+            return
+        if not write_lock.acquire(timeout=profile['busy_timeout']):
+            # Same error SQLite raises, so balances.run_atomic retries it.
+            raise OperationalError(statement, parameters, sqlite3.OperationalError('database is locked'))
+        conn.info['sqlite_write_lock'] = True
+
+    @event.listens_for(engine, 'commit')
+    @event.listens_for(engine, 'rollback')
+    def _release(conn):
+        release(conn.info)
+
+    # A connection returned to the pool mid-transaction is rolled back by the pool itself.
+    @event.listens_for(engine, 'reset')
+    def _release_on_reset(dbapi_connection, connection_record, reset_state):
+        release(connection_record.info)
+
+    @event.listens_for(engine, 'close')
+    def _release_on_close(dbapi_connection, connection_record):
+        release(connection_record.info)
+
+
+def setup_engine(app, engine):
+    """Call after db.init_app(), inside an app context."""
+    profile = engine_profile(app.config)
+    track_pool(engine)
+    configure_sqlite(engine, profile)
+
+
+def pool_stats(engine):
+    """Live numbers for this process's pool. Wait times are in milliseconds."""
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__, 'status': pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update(size=pool.size(), checked_out=pool.checkedout(), checked_in=pool.checkedin(),
+                     overflow=max(pool.overflow(), 0), max_overflow=pool._max_overflow)
+    wait = getattr(pool, 'wait_stats', None)
+    if wait is not None:
+        with wait._lock:
+            stats.update(
+                checkouts=wait.checkouts, timeouts=wait.timeouts, connects=wait.connects,
+                invalidations=wait.invalidations,
+                wait_avg_ms=wait.wait_total / wait.checkouts * 1000 if wait.checkouts else 0.0,
+                wait_max_ms=wait.wait_max * 1000,
+            )
+    return stats
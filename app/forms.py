@@ -1,7 +1,7 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, BooleanField, SelectField, TextAreaField, FloatField, DateField, MultipleFileField, TimeField
 from flask_wtf.file import FileField, FileRequired, FileAllowed
-from wtforms.validators import DataRequired, EqualTo, NumberRange, Length, Regexp
+from wtforms.validators import DataRequired, EqualTo, NumberRange, Length, Regexp, Optional
 
 class LoginForm(FlaskForm):
     dni = StringField('DNI', validators=[DataRequired()])
@@ -80,6 +80,32 @@ class SearchUserForm(FlaskForm):
     query = StringField('Buscar por Nombre o DNI', validators=[DataRequired()])
     submit = SubmitField('Buscar')
 
+class TransactionFilterForm(FlaskForm):
+    class Meta:
+        csrf = False  # GET filters for the history, also read by the JSON endpoint
+
+    type = SelectField('Tipo', choices=[
+        ('', 'Todos'),
+        ('transfer_in', 'Transferencia recibida'),
+        ('transfer_out', 'Transferencia enviada'),
+        ('salary', 'Nómina'),
+        ('loan_received', 'Préstamo recibido'),
+        ('loan_payment', 'Pago de préstamo'),
+        ('loan_fee', 'Cargo por mora'),
+        ('savings_deposit', 'Depósito a ahorros'),
+        ('savings_withdrawal', 'Retiro de ahorros'),
+        ('lottery_ticket', 'Ticket de lotería'),
+        ('lottery_win', 'Premio de lotería'),
+        ('license_buy', 'Compra de licencia'),
+        ('fine_payment', 'Pago de multa'),
+        ('government_adjustment_add', 'Ajuste Gobierno (+)'),
+        ('government_adjustment_sub', 'Ajuste Gobierno (-)')
+    ], validators=[Optional()])
+    date_from = DateField('Desde', format='%Y-%m-%d', validators=[Optional()])
+    date_to = DateField('Hasta', format='%Y-%m-%d', validators=[Optional()])
+    min_amount = FloatField('Monto mínimo', validators=[Optional(), NumberRange(min=0)])
+    max_amount = FloatField('Monto máximo', validators=[Optional(), NumberRange(min=0)])
+
 class CriminalRecordForm(FlaskForm):
     date = DateField('Fecha del Suceso', format='%Y-%m-%d', validators=[DataRequired()])
     crime = StringField('Delito Cometido', validators=[DataRequired()])
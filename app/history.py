@@ -0,0 +1,71 @@
+import base64
+from datetime import datetime, timedelta
+
+from sqlalchemy import tuple_
+
+from app.models import BankTransaction
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(transaction):
+    raw = f'{transaction.timestamp.isoformat()}|{transaction.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, transaction_id = raw.split('|')
+        return datetime.fromisoformat(timestamp), int(transaction_id)
+    except ValueError as e:
+        raise InvalidCursor(cursor) from e
+
+
+def transaction_page(account_id, cursor=None, type=None, date_from=None, date_to=None,
+                     min_amount=None, max_amount=None, limit=PAGE_SIZE):
+    """
+    Return `(transactions, next_cursor)` for one page of an account's history, newest first.
+
+    Pages are addressed by an (timestamp, id) cursor instead of an OFFSET, so every page is a
+    range scan on ix_bank_transaction_account_timestamp_id no matter how old the account is.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = BankTransaction.query.filter(BankTransaction.account_id == account_id)
+
+    if type:
+        query = query.filter(BankTransaction.type == type)
+    if date_from:
+        query = query.filter(BankTransaction.timestamp >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        query = query.filter(BankTransaction.timestamp < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    if min_amount is not None:
+        query = query.filter(BankTransaction.amount >= min_amount)
+    if max_amount is not None:
+        query = query.filter(BankTransaction.amount <= max_amount)
+    if cursor:
+        query = query.filter(tuple_(BankTransaction.timestamp, BankTransaction.id) < decode_cursor(cursor))
+
+    rows = query.order_by(BankTransaction.timestamp.desc(), BankTransaction.id.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+def serialize_transaction(transaction):
+    return {
+        'id': transaction.id,
+        'type': transaction.type,
+        'amount': transaction.amount,
+        'description': transaction.description,
+        'related_account': transaction.related_account,
+        'is_positive': transaction.is_positive,
+        'timestamp': transaction.timestamp.isoformat(),
+        'date_str': transaction.timestamp.strftime('%d/%m/%Y %H:%M')
+    }
@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import User
+
+# Columns copied into the cache; anything else is read from the real User on first access.
+PRINCIPAL_FIELDS = ('id', 'badge_id', 'department', 'official_rank', 'official_status', 'first_name', 'last_name')
+
+
+class PrincipalCache:
+    """Per-process LRU of user snapshots with a TTL. Thread-safe; counts hits, misses and invalidations."""
+
+    def __init__(self, maxsize=1024, ttl=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.invalidations = self.evictions = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user_id, snapshot):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'invalidations': self.invalidations, 'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+class Principal(UserMixin):
+    """
+    The authenticated user as seen by current_user: the cached columns are plain attributes and
+    any other attribute (bank_account, dni, ...) loads the User row once for this request.
+    """
+
+    def __init__(self, snapshot):
+        self.__dict__.update(snapshot)
+
+    def _user(self):
+        user = self.__dict__.get('_loaded')
+        if user is None:
+            user = self.__dict__['_loaded'] = db.session.get(User, self.id)
+        return user
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self._user(), name)
+
+
+def get_cache(app=None):
+    app = app or current_app
+    cache = app.extensions.get('identity_cache')
+    if cache is None:
+        cache = app.extensions['identity_cache'] = PrincipalCache(
+            maxsize=app.config['IDENTITY_CACHE_SIZE'], ttl=app.config['IDENTITY_CACHE_TTL'])
+    return cache
+
+
+def cache_metrics(app):
+    """Per-process principal cache counters for /metrics (summed over every process)."""
+    stats = get_cache(app).stats()
+    yield 'hermes_identity_cache_entries', 'gauge', 'Usuarios en la caché de identidad.', {}, stats['size']
+    for key in ('hits', 'misses', 'invalidations', 'evictions'):
+        yield (f'hermes_identity_cache_{key}_total', 'counter',
+               f'Caché de identidad (usuario autenticado): {key}.', {}, stats[key])
+
+
+def load_principal(user_id):
+    """Flask-Login user_loader: no query while the snapshot is cached."""
+    cache = get_cache()
+    user_id = int(user_id)
+    snapshot = cache.get(user_id)
+    if snapshot is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+        cache.put(user_id, snapshot)
+    return Principal(snapshot)
+
+
+# Invalidation: any flushed change to a User (status approval, salary, Discord link, deletion) drops
+# its entry, again after the commit so a request that re-read it mid-transaction cannot keep stale data.
+# Other worker processes converge within IDENTITY_CACHE_TTL.
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, user):
+    session = Session.object_session(user)
+    if session is not None:
+        session.info.setdefault('identity_dirty', set()).add(user.id)
+    if has_app_context():
+        get_cache().invalidate(user.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    dirty = session.info.pop('identity_dirty', None)
+    if dirty and has_app_context():
+        cache = get_cache()
+        for user_id in dirty:
+            cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_dirty(session):
+    session.info.pop('identity_dirty', None)
@@ -0,0 +1,217 @@
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+from flask import current_app
+from PIL import Image, ImageOps
+
+from app import db
+from app.models import UploadBlob
+from app.uploads import STORE_PREFIX, blob_path, is_stored
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels for each variant, smallest first.
+VARIANTS = {
+    'thumb': 160,
+    'profile': 480,
+    'print': 1200,
+}
+JPEG_QUALITY = 85
+# Refuse decompression bombs well before Pillow's own limit.
+MAX_PIXELS = 40_000_000
+WORKER_DIED = 'el proceso de conversión terminó inesperadamente'
+
+
+def variant_name(name, variant):
+    """'cas/ab/cd/<sha>.png' -> 'cas/ab/cd/<sha>.<variant>.jpg'."""
+    return f'{os.path.splitext(name)[0]}.{variant}.jpg'
+
+
+def variant_names(name):
+    return [variant_name(name, variant) for variant in VARIANTS]
+
+
+def variant_source(name):
+    """'cas/ab/cd/<sha>.print.jpg' -> ('cas/ab/cd/<sha>', 'print'); None if `name` is not a variant."""
+    base, ext = os.path.splitext(name)
+    base, variant = os.path.splitext(base)
+    variant = variant.lstrip('.')
+    if ext != '.jpg' or variant not in VARIANTS or not is_stored(name):
+        return None
+    return base, variant
+
+
+def blob_for_variant(name):
+    """The UploadBlob a variant name was generated from, or None."""
+    source = variant_source(name)
+    if source is None:
+        return None
+    return UploadBlob.query.filter(UploadBlob.key.startswith(source[0] + '.', autoescape=True)).first()
+
+
+def best_name(name, variant):
+    """
+    The variant if it has been generated, otherwise the original upload. Only for server-side
+    use (PDFs): the original keeps its EXIF, so it is never what a browser gets.
+    """
+    if is_stored(name) and variant in VARIANTS:
+        candidate = variant_name(name, variant)
+        if os.path.exists(blob_path(candidate)):
+            return candidate
+    return name
+
+
+def build_variants(path):
+    """
+    Validate one image and write its variants next to it. Runs in a pool process, so it only
+    takes and returns plain values. Returns `(path, error)`; error is None on success.
+    """
+    try:
+        with Image.open(path) as probe:
+            if probe.width * probe.height > MAX_PIXELS:
+                return path, f'demasiado grande ({probe.width}x{probe.height})'
+            probe.verify()
+
+        with Image.open(path) as source:
+            # Apply the orientation tag, then drop every EXIF field by re-encoding the pixels only.
+            image = ImageOps.exif_transpose(source)
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, 'white')
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+
+            base = os.path.splitext(path)[0]
+            for variant, size in VARIANTS.items():
+                resized = image.copy()
+                resized.thumbnail((size, size), Image.LANCZOS)
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+                with os.fdopen(fd, 'wb') as out:
+                    resized.save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+                os.replace(tmp, f'{base}.{variant}.jpg')
+        return path, None
+    except Exception as e:
+        return path, str(e) or e.__class__.__name__
+
+
+class ImagePipeline:
+    """Worker job: claims pending uploads and builds their variants on a process pool."""
+
+    def __init__(self, workers=None, batch_size=32, lease=300):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.lease = lease
+        self._pool = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(workers=config['IMAGE_WORKERS'] or None, batch_size=config['IMAGE_BATCH_SIZE'])
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def reset_pool(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _build(self, paths):
+        """`({path: error}, crashed)`; crashed lists the paths lost to a dead pool worker."""
+        futures = {}
+        crashed = []
+        for path in paths:
+            try:
+                futures[path] = self.pool.submit(build_variants, path)
+            except BrokenProcessPool:
+                crashed.append(path)
+        errors = {}
+        for path, future in futures.items():
+            try:
+                errors[path] = future.result()[1]
+            except BrokenProcessPool:
+                crashed.append(path)
+        return errors, crashed
+
+    def build(self, paths):
+        """
+        `{path: error}` for every path. A worker that dies (decoder crash, OOM) breaks the whole
+        pool and fails every pending path with it, so the pool is replaced and those paths are
+        retried one at a time: the one that kills a worker on its own is reported as an error
+        instead of being reclaimed on every lease.
+        """
+        errors, crashed = self._build(paths)
+        if crashed:
+            logger.warning('Un proceso de conversión de imágenes murió; se reintentan %d imágenes', len(crashed))
+            self.reset_pool()
+            for path in crashed:
+                retried, died = self._build([path])
+                errors.update(retried)
+                if died:
+                    self.reset_pool()
+                    errors[path] = WORKER_DIED
+        return errors
+
+    def claim_batch(self):
+        now = datetime.utcnow()
+        rows = UploadBlob.query.filter(
+            (UploadBlob.status == 'Pending') |
+            ((UploadBlob.status == 'Processing') & (UploadBlob.claimed_at < now - timedelta(seconds=self.lease)))
+        ).order_by(UploadBlob.created_at).limit(self.batch_size).with_for_update(skip_locked=True).all()
+        for row in rows:
+            row.status = 'Processing'
+            row.claimed_at = now
+        keys = [row.key for row in rows]
+        db.session.commit()
+        return keys
+
+    def run_once(self):
+        keys = self.claim_batch()
+        if not keys:
+            return 0
+
+        by_path = {blob_path(key): key for key in keys}
+        results = {}
+        for path, error in self.build(list(by_path)).items():
+            key = by_path[path]
+            results[key] = 'Invalid' if error else 'Ready'
+            if error:
+                logger.warning('Imagen inválida %s: %s', key, error)
+                # A failure part-way may have left some variants; none of them may be served.
+                for name in variant_names(key):
+                    if os.path.exists(blob_path(name)):
+                        os.remove(blob_path(name))
+
+        for key, status in results.items():
+            db.session.query(UploadBlob).filter_by(key=key).update(
+                {'status': status, 'claimed_at': None}, synchronize_session=False)
+        db.session.commit()
+        return len(results)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def process_pending(limit=None):
+    """Synchronous drain used by the CLI; returns the number of uploads processed."""
+    pipeline = ImagePipeline.from_config(current_app.config)
+    total = 0
+    try:
+        while limit is None or total < limit:
+            processed = pipeline.run_once()
+            if not processed:
+                break
+            total += processed
+    finally:
+        pipeline.shutdown()
+    return total
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func, insert, update
+
+from app import aggregates, db
+from app.models import BankAccount, BankLoan, BankTransaction, User
+from app.notifications import enqueue_notifications
+
+# A 1% penalty on the amount due for every full 2-day interval past the due date.
+PENALTY_INTERVAL_DAYS = 2
+PENALTY_RATE = 0.01
+
+
+def sweep_loan_penalties(now=None, chunk_size=500):
+    """
+    Apply late-payment penalties to every overdue active loan.
+
+    Overdue loans are found through ix_bank_loan_status_due_date and processed in chunks:
+    one bulk UPDATE of loans, one of account balances, one bulk INSERT of `loan_fee`
+    transactions and notifications, and a single commit per chunk. Returns the number of
+    loans penalized.
+
+    Owners are outer-joined: a loan whose citizen was deleted is still penalized and its account
+    charged, without a notification; one whose account is gone only grows its amount due.
+    """
+    now = now or datetime.utcnow()
+    threshold = now - timedelta(days=PENALTY_INTERVAL_DAYS)
+    base_date = func.coalesce(BankLoan.last_penalty_check, BankLoan.due_date)
+    last_id = 0
+    penalized = 0
+
+    while True:
+        loans = db.session.query(
+            BankLoan.id, BankLoan.account_id, BankLoan.amount_due, BankLoan.due_date,
+            BankLoan.last_penalty_check, BankAccount.id.label('existing_account_id'), User.discord_id
+        ).outerjoin(BankAccount, BankAccount.id == BankLoan.account_id).outerjoin(
+            User, User.id == BankAccount.user_id
+        ).filter(
+            BankLoan.status == 'Active',
+            BankLoan.due_date <= threshold,
+            base_date <= threshold,
+            BankLoan.id > last_id
+        ).order_by(BankLoan.id).limit(chunk_size).with_for_update(of=BankLoan).all()
+        if not loans:
+            break
+        last_id = loans[-1].id
+
+        loan_updates = []
+        charges = {}
+        transactions = []
+        notifications = []
+        debt = 0.0
+        for loan in loans:
+            diff = now - (loan.last_penalty_check or loan.due_date)
+            intervals = diff.days // PENALTY_INTERVAL_DAYS
+            if intervals < 1:
+                continue
+            penalty_amount = (loan.amount_due * PENALTY_RATE) * intervals
+
+            loan_updates.append({'id': loan.id, 'amount_due': loan.amount_due + penalty_amount,
+                                 'last_penalty_check': now})
+            debt += penalty_amount
+            if loan.existing_account_id is None:
+                continue
+            charges[loan.account_id] = charges.get(loan.account_id, 0.0) + penalty_amount
+            transactions.append({
+                'account_id': loan.account_id,
+                'type': 'loan_fee',
+                'amount': penalty_amount,
+                'description': f'Cargo por mora ({intervals * 1}%)',
+                'timestamp': now
+            })
+            # discord_id is None when the owner was deleted; enqueue_notifications skips those.
+            notifications.append((loan.discord_id, f"⚠️ **Cargo por Mora**\nSe ha aplicado una penalización de ${penalty_amount:,.2f} a tu préstamo vencido."))
+
+        if loan_updates:
+            db.session.execute(update(BankLoan), loan_updates)
+            if charges:
+                db.session.execute(
+                    update(BankAccount)
+                    .where(BankAccount.id.in_(charges))
+                    .values(balance=BankAccount.balance - case(charges, value=BankAccount.id, else_=0.0))
+                    .execution_options(synchronize_session=False)
+                )
+                db.session.execute(insert(BankTransaction), transactions)
+            enqueue_notifications(notifications)
+
+            aggregates.record(aggregates.OUTSTANDING_DEBT, debt)
+            aggregates.record(aggregates.MONEY_SUPPLY, -sum(charges.values()))
+            penalized += len(loan_updates)
+
+        db.session.commit()
+        if len(loans) < chunk_size:
+            break
+
+    return penalized
@@ -0,0 +1,125 @@
+import logging
+import random
+import string
+from datetime import datetime
+
+from sqlalchemy import case, insert, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+from app import aggregates, db
+from app.models import BankAccount, BankTransaction, Lottery, LotteryDraw, LotteryNumberCount, LotteryTicket, User
+from app.notifications import enqueue_notifications
+
+logger = logging.getLogger(__name__)
+
+BASE_JACKPOT = 50000.0
+
+
+def get_lottery():
+    """Ensure the lottery record exists. Draws are run by the worker, never by requests."""
+    lottery = Lottery.query.first()
+    if not lottery:
+        lottery = Lottery(current_jackpot=BASE_JACKPOT, last_run_date=datetime.utcnow().date())
+        db.session.add(lottery)
+        db.session.commit()
+    return lottery
+
+
+def count_ticket(day, numbers):
+    """Increment the per-number ticket count with an upsert (same transaction as the ticket)."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        upsert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+        stmt = upsert(LotteryNumberCount).values(date=day, numbers=numbers, count=1)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['date', 'numbers'],
+            set_={'count': LotteryNumberCount.count + 1}
+        ))
+        return
+
+    updated = db.session.query(LotteryNumberCount).filter_by(date=day, numbers=numbers).update(
+        {'count': LotteryNumberCount.count + 1}, synchronize_session=False)
+    if not updated:
+        db.session.add(LotteryNumberCount(date=day, numbers=numbers, count=1))
+
+
+def run_daily_draw(today=None, rng=random):
+    """
+    Draw the tickets of `lottery.last_run_date` once that day is over.
+
+    The Lottery row is locked and the LotteryDraw row has a unique draw_date, so concurrent
+    workers cannot both draw the same day. Winners are found through the per-number count
+    and the (date, numbers) index and paid in the same transaction. Returns the draw or None.
+    """
+    today = today or datetime.utcnow().date()
+    lottery = Lottery.query.with_for_update().first()
+    if not lottery or today <= lottery.last_run_date:
+        db.session.commit()
+        return None
+
+    draw_date = lottery.last_run_date
+    jackpot = lottery.current_jackpot
+    winning_number = ''.join(rng.choices(string.digits, k=5))
+
+    draw = LotteryDraw(draw_date=draw_date, winning_number=winning_number, jackpot=jackpot)
+    db.session.add(draw)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        logger.info('El sorteo del %s ya fue realizado por otro proceso.', draw_date)
+        return None
+
+    tickets_won = db.session.query(LotteryNumberCount.count).filter_by(
+        date=draw_date, numbers=winning_number).scalar() or 0
+
+    winners = []
+    if tickets_won:
+        # Only tickets whose owner still exists and has an account can be paid.
+        winners = db.session.query(BankAccount.id, User.discord_id).select_from(LotteryTicket).join(
+            User, User.id == LotteryTicket.user_id
+        ).join(BankAccount, BankAccount.user_id == User.id).filter(
+            LotteryTicket.date == draw_date, LotteryTicket.numbers == winning_number
+        ).all()
+
+    # With no payable winner the jackpot rolls over to the next draw untouched.
+    if winners:
+        # Split between every payable winning ticket.
+        prize_per_winner = jackpot / len(winners)
+        credits = {}
+        transactions = []
+        notifications = []
+        now = datetime.utcnow()
+        for account_id, discord_id in winners:
+            credits[account_id] = credits.get(account_id, 0.0) + prize_per_winner
+            transactions.append({
+                'account_id': account_id, 'type': 'lottery_win', 'amount': prize_per_winner,
+                'description': f'Premio Lotería (Núm: {winning_number})', 'timestamp': now
+            })
+            notifications.append((discord_id, f"🎉 **¡GANASTE LA LOTERÍA!**\nTu número {winning_number} ha sido premiado con ${prize_per_winner:,.2f}."))
+
+        db.session.execute(
+            update(BankAccount)
+            .where(BankAccount.id.in_(credits))
+            .values(balance=BankAccount.balance + case(credits, value=BankAccount.id, else_=0.0))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(insert(BankTransaction), transactions)
+        enqueue_notifications(notifications)
+        aggregates.record(aggregates.MONEY_SUPPLY, sum(credits.values()))
+
+        draw.winners = len(winners)
+        draw.prize_per_winner = prize_per_winner
+        # Remove the paid jackpot in SQL so ticket sales that raced the draw are kept.
+        lottery.current_jackpot = Lottery.current_jackpot - jackpot + BASE_JACKPOT
+
+    lottery.last_run_date = today
+    db.session.commit()
+    logger.info('Sorteo del %s: número %s, %s ganadores.', draw_date, winning_number, draw.winners)
+    return draw
+
+
+def latest_draw():
+    return LotteryDraw.query.order_by(LotteryDraw.draw_date.desc()).first()
@@ -0,0 +1,374 @@
+import atexit
+import bisect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, and os.kill(pid, 0) would terminate the process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ARCHIVE = 'archive.json'
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, registry, name, help, labels=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def dump(self):
+        return {json.dumps(key): value for key, value in self.values.items()}
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, registry, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.registry.lock:
+            state = self.values.get(key)
+            if state is None:
+                # Per-bucket (not cumulative) counts, one extra slot for +Inf; then sum and count.
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def dump(self):
+        return {json.dumps(key): [list(counts), total, count] for key, (counts, total, count) in self.values.items()}
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Registry:
+    """
+    Process-local metrics, shared between gunicorn workers through files: each process writes
+    a snapshot to `directory/<pid>-<start>.json` at most every `flush_interval` seconds, and a
+    scrape merges every snapshot. Counters and histograms of processes that have exited are
+    folded into archive.json so totals never go backwards; gauges only count live processes.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.metrics = {}
+        self.collectors = {}
+        self.scrape_collectors = {}
+        self.directory = None
+        self.flush_interval = 5.0
+        self.last_flush = 0.0
+        self.pid = None
+        self.filename = None
+
+    def counter(self, name, help, labels=()):
+        return self.metrics.setdefault(name, Counter(self, name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.metrics.setdefault(name, Histogram(self, name, help, labels, buckets))
+
+    def add_collector(self, name, func, scrape_only=False):
+        """
+        `func()` yields (name, type, help, labels dict, value). Process collectors run at every
+        flush and are merged like counters; scrape-only ones run once per scrape in the scraping
+        process, for values every process would report the same (database counts).
+        """
+        (self.scrape_collectors if scrape_only else self.collectors)[name] = func
+
+    def configure(self, directory, flush_interval):
+        if directory and fcntl is None:
+            # Sharing needs flock and a liveness check; single-process (flask run) is all Windows gets.
+            logger.info('Métricas solo de este proceso: el directorio compartido requiere fcntl.')
+            directory = None
+        if directory and not self.directory:
+            atexit.register(self.flush, force=True)
+        self.directory = directory
+        self.flush_interval = flush_interval
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    # --- Per-process snapshots ---
+
+    def snapshot(self):
+        metrics = {}
+        with self.lock:
+            for metric in self.metrics.values():
+                entry = {'type': metric.type, 'help': metric.help, 'labels': metric.labels, 'values': metric.dump()}
+                if metric.type == 'histogram':
+                    entry['buckets'] = metric.buckets
+                metrics[metric.name] = entry
+        _run_collectors(self.collectors, metrics)
+        return {'pid': os.getpid(), 'metrics': metrics}
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not self.directory or (not force and now - self.last_flush < self.flush_interval):
+            return
+        self.last_flush = now
+        if self.pid != os.getpid():
+            # First flush, or a forked worker: start a file of its own without the parent's values.
+            if self.pid is not None:
+                with self.lock:
+                    for metric in self.metrics.values():
+                        metric.values.clear()
+            self.pid = os.getpid()
+            self.filename = f'{self.pid}-{int(time.time() * 1000)}.json'
+        _write_json(os.path.join(self.directory, self.filename), self.snapshot())
+
+    def collect(self):
+        """Merged snapshot of every process sharing the directory (just this one without a directory)."""
+        if not self.directory:
+            return self.snapshot()['metrics']
+        self.flush(force=True)
+        with _locked(self.directory):
+            merged = _read_json(os.path.join(self.directory, ARCHIVE)) or {'metrics': {}}
+            dead = []
+            for filename in sorted(os.listdir(self.directory)):
+                if not filename.endswith('.json') or filename == ARCHIVE:
+                    continue
+                path = os.path.join(self.directory, filename)
+                snapshot = _read_json(path)
+                if snapshot is None:
+                    continue
+                alive = _is_alive(snapshot['pid'])
+                _merge(merged['metrics'], snapshot['metrics'], include_gauges=alive)
+                if not alive:
+                    dead.append((path, snapshot))
+            if dead:
+                archive = _read_json(os.path.join(self.directory, ARCHIVE)) or {'metrics': {}}
+                for _, snapshot in dead:
+                    _merge(archive['metrics'], snapshot['metrics'], include_gauges=False)
+                _write_json(os.path.join(self.directory, ARCHIVE), archive)
+                for path, _ in dead:
+                    os.remove(path)
+        return merged['metrics']
+
+    def reset(self):
+        """Drop every snapshot and the archive (e.g. before starting a new deploy)."""
+        if not self.directory:
+            return 0
+        removed = 0
+        with _locked(self.directory):
+            for filename in os.listdir(self.directory):
+                if filename.endswith('.json'):
+                    os.remove(os.path.join(self.directory, filename))
+                    removed += 1
+        return removed
+
+    def render(self):
+        metrics = self.collect()
+        _run_collectors(self.scrape_collectors, metrics)
+        return render_text(metrics)
+
+
+def _run_collectors(collectors, metrics):
+    for collector_name, collector in collectors.items():
+        try:
+            for name, kind, help, labels, value in collector():
+                entry = metrics.setdefault(name, {'type': kind, 'help': help, 'labels': list(labels), 'values': {}})
+                entry['values'][json.dumps([str(v) for v in labels.values()])] = value
+        except Exception:
+            logger.exception('Error en el colector de métricas %s', collector_name)
+
+
+def _merge(target, source, include_gauges):
+    for name, entry in source.items():
+        if entry['type'] == 'gauge' and not include_gauges:
+            continue
+        current = target.setdefault(name, {**entry, 'values': {}})
+        values = current['values']
+        for key, value in entry['values'].items():
+            if entry['type'] == 'histogram':
+                if key not in values:
+                    values[key] = [list(value[0]), value[1], value[2]]
+                else:
+                    state = values[key]
+                    state[0] = [a + b for a, b in zip(state[0], value[0])]
+                    state[1] += value[1]
+                    state[2] += value[2]
+            else:
+                values[key] = values.get(key, 0.0) + value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render_text(metrics):
+    """Prometheus text exposition format 0.0.4."""
+    lines = []
+    for name in sorted(metrics):
+        entry = metrics[name]
+        lines.append(f'# HELP {name} {entry["help"]}')
+        lines.append(f'# TYPE {name} {entry["type"]}')
+        for key in sorted(entry['values']):
+            label_values = json.loads(key)
+            value = entry['values'][key]
+            if entry['type'] == 'histogram':
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(list(entry['buckets']) + [float('inf')], counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{_labels(entry["labels"], label_values, [("le", _number(bound))])} {cumulative}')
+                lines.append(f'{name}_sum{_labels(entry["labels"], label_values)} {_number(total)}')
+                lines.append(f'{name}_count{_labels(entry["labels"], label_values)} {count}')
+            else:
+                lines.append(f'{name}{_labels(entry["labels"], label_values)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _is_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+class _locked:
+    """Exclusive flock on directory/.lock, so two scrapes do not archive the same file twice."""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, '.lock')
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'hermes_http_requests_total', 'Peticiones HTTP por endpoint, método y código.', ('endpoint', 'method', 'status'))
+HTTP_LATENCY = REGISTRY.histogram(
+    'hermes_http_request_duration_seconds', 'Latencia de las peticiones HTTP por endpoint.', ('endpoint',))
+PDF_RENDER = REGISTRY.histogram(
+    'hermes_pdf_render_seconds', 'Tiempo de generación de PDFs (fallos de caché).', ('document',),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+PDF_REQUESTS = REGISTRY.counter(
+    'hermes_pdf_requests_total', 'PDFs servidos, desde caché o generados.', ('document', 'cache'))
+UPLOAD_BYTES = REGISTRY.counter(
+    'hermes_upload_bytes_total', 'Bytes recibidos en subidas; stored=new ocupa disco, duplicate no.', ('stored',))
+UPLOADS = REGISTRY.counter(
+    'hermes_uploads_total', 'Archivos subidos.', ('stored',))
+NOTIFICATIONS = REGISTRY.counter(
+    'hermes_notifications_total', 'Envíos al bot de Discord por resultado.', ('outcome',))
+NOTIFICATION_LATENCY = REGISTRY.histogram(
+    'hermes_notification_duration_seconds', 'Duración de cada envío al bot de Discord.', ('outcome',))
+
+
+def init_metrics(app, engine):
+    """Configure the shared directory, time every request and collect pool gauges."""
+    from flask import g, request
+
+    from app.database import pool_stats
+    from app.identity import cache_metrics
+    from app.notifications import outbox_metrics
+    from app.profiling import UNMATCHED, profiler_metrics
+
+    directory = app.config['METRICS_DIR'] or os.path.join(app.instance_path, 'metrics')
+    REGISTRY.configure(directory, app.config['METRICS_FLUSH_INTERVAL'])
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            # Unmatched URLs share one label value so 404 scans cannot explode the series count.
+            endpoint = request.endpoint or UNMATCHED
+            HTTP_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+            HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        REGISTRY.flush()
+        return response
+
+    def pool_collector():
+        stats = pool_stats(engine)
+        for key in ('checked_out', 'overflow', 'size'):
+            if key in stats:
+                yield f'hermes_db_pool_{key}', 'gauge', f'Pool de conexiones: {key}.', {}, stats[key]
+        wait = getattr(engine.pool, 'wait_stats', None)
+        if wait is not None:
+            yield 'hermes_db_pool_checkouts_total', 'counter', 'Conexiones obtenidas del pool.', {}, wait.checkouts
+            yield 'hermes_db_pool_timeouts_total', 'counter', 'Esperas del pool agotadas.', {}, wait.timeouts
+            yield ('hermes_db_pool_wait_seconds_total', 'counter',
+                   'Tiempo total esperando una conexión del pool.', {}, wait.wait_total)
+
+    REGISTRY.add_collector('db_pool', pool_collector)
+    REGISTRY.add_collector('identity_cache', lambda: cache_metrics(app))
+    REGISTRY.add_collector('sql_profile', lambda: profiler_metrics(app))
+    REGISTRY.add_collector('notification_outbox', outbox_metrics, scrape_only=True)
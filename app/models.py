@@ -1,8 +1,14 @@
 from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.passwords import hash_password, verify_and_update
 from flask_login import UserMixin
 from datetime import datetime
 
+# Transaction types that add money to the account (shown as "+" in the history).
+POSITIVE_TRANSACTION_TYPES = frozenset([
+    'transfer_in', 'loan_received', 'savings_withdrawal', 'interest',
+    'lottery_win', 'salary', 'government_adjustment_add'
+])
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(64))
@@ -10,7 +16,7 @@ class User(UserMixin, db.Model):
     dni = db.Column(db.String(20), index=True)
     selfie_filename = db.Column(db.String(128))
     dni_photo_filename = db.Column(db.String(128))
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(256))
     
     # NUEVO: Campo para Discord
     discord_id = db.Column(db.String(32), nullable=True)
@@ -28,6 +34,12 @@ class User(UserMixin, db.Model):
     # Meta
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Se incrementa con cada cambio en antecedentes/fotos; versiona la caché de PDFs (app/pdfs.py)
+    criminal_record_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Nombre + DNI normalizados (sin tildes, minúsculas), mantenido por app/search.py
+    search_name = db.Column(db.String(200))
+
     # Relationships
     comments = db.relationship('Comment', foreign_keys='Comment.user_id', backref='citizen', lazy=True)
     traffic_fines = db.relationship('TrafficFine', foreign_keys='TrafficFine.user_id', backref='citizen', lazy=True)
@@ -39,10 +51,11 @@ class User(UserMixin, db.Model):
     appointments_received = db.relationship('Appointment', foreign_keys='Appointment.official_id', backref='official', lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        # Re-hashes with PASSWORD_HASH_METHOD when the stored method differs; the caller commits.
+        return verify_and_update(self, password)
 
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -110,6 +123,16 @@ class BankTransaction(db.Model):
     related_account = db.Column(db.String(20))
     description = db.Column(db.String(100))
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    department = db.Column(db.String(50), nullable=True)  # Only for salary payments
+
+    # Backs the keyset-paginated history (see app/history.py).
+    __table_args__ = (
+        db.Index('ix_bank_transaction_account_timestamp_id', 'account_id', 'timestamp', 'id'),
+    )
+
+    @property
+    def is_positive(self):
+        return self.type in POSITIVE_TRANSACTION_TYPES
 
 class BankLoan(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -120,6 +143,11 @@ class BankLoan(db.Model):
     last_penalty_check = db.Column(db.DateTime)
     status = db.Column(db.String(20), default='Active')
 
+    # Lets the penalty sweeper (app/loans.py) find overdue active loans without a full scan.
+    __table_args__ = (
+        db.Index('ix_bank_loan_status_due_date', 'status', 'due_date'),
+    )
+
 class BankSavings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     account_id = db.Column(db.Integer, db.ForeignKey('bank_account.id'), nullable=False)
@@ -138,6 +166,25 @@ class LotteryTicket(db.Model):
     numbers = db.Column(db.String(5), nullable=False)
     date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date)
 
+    __table_args__ = (
+        db.Index('ix_lottery_ticket_date_numbers', 'date', 'numbers'),
+    )
+
+class LotteryNumberCount(db.Model):
+    # Tickets sold per (day, number): the draw checks for winners without touching the tickets.
+    date = db.Column(db.Date, primary_key=True)
+    numbers = db.Column(db.String(5), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class LotteryDraw(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    draw_date = db.Column(db.Date, nullable=False, unique=True)  # Day whose tickets were drawn
+    winning_number = db.Column(db.String(5), nullable=False)
+    jackpot = db.Column(db.Float, nullable=False)
+    winners = db.Column(db.Integer, nullable=False, default=0)
+    prize_per_winner = db.Column(db.Float, nullable=False, default=0.0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class GovernmentFund(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     balance = db.Column(db.Float, default=1000000.0)
@@ -166,3 +213,66 @@ class Appointment(db.Model):
     date = db.Column(db.DateTime, nullable=False)
     reason = db.Column(db.String(200), nullable=False)
     status = db.Column(db.String(20), default='Pending')
+
+class NotificationOutbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    discord_id = db.Column(db.String(32), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='Pending')
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+class EconomyAggregate(db.Model):
+    # Cada contador se reparte en varias filas (slot) que se suman al leer (app/aggregates.py).
+    name = db.Column(db.String(64), primary_key=True)
+    slot = db.Column(db.Integer, primary_key=True, autoincrement=False, default=0)
+    value = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class TransactionRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    type = db.Column(db.String(20), nullable=False)
+    department = db.Column(db.String(50), nullable=False, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    min_amount = db.Column(db.Float)
+    max_amount = db.Column(db.Float)
+
+    __table_args__ = (
+        db.UniqueConstraint('day', 'type', 'department', name='uq_transaction_rollup_bucket'),
+    )
+
+class RollupState(db.Model):
+    name = db.Column(db.String(64), primary_key=True)
+    last_transaction_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# PostgreSQL source for account numbers (app/accounts.py); other databases use SequenceCounter.
+ACCOUNT_NUMBER_SEQUENCE = db.Sequence('account_number_seq', metadata=db.metadata)
+
+class SequenceCounter(db.Model):
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+class AppSetting(db.Model):
+    # Valores que deben sobrevivir a cambios de configuración, p. ej. la clave de números de cuenta.
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.String(255), nullable=False)
+
+class UploadBlob(db.Model):
+    # Archivo subido en el almacén por contenido (app/uploads.py); key = 'cas/ab/cd/<sha256>.<ext>'
+    key = db.Column(db.String(128), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Variantes (app/images.py): Pending -> Processing -> Ready | Invalid
+    status = db.Column(db.String(20), nullable=False, default='Pending', index=True)
+    claimed_at = db.Column(db.DateTime)
@@ -0,0 +1,227 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import func, insert, update
+
+from app import db, metrics
+from app.models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+
+# --- DISCORD INTEGRATION START ---
+def notify_discord_bot(user, message):
+    """
+    Encola una notificación para el bot de Discord si el usuario tiene su cuenta vinculada.
+
+    Solo añade una fila al outbox en la sesión actual: se guarda en el mismo commit
+    que el cambio que la origina y el worker (`flask worker`) se encarga del envío.
+    """
+    if not user or not user.discord_id:
+        return
+    db.session.add(NotificationOutbox(discord_id=user.discord_id, message=message))
+
+
+def enqueue_notifications(notifications):
+    """Bulk version of `notify_discord_bot` for (discord_id, message) pairs: a single INSERT."""
+    rows = [{'discord_id': discord_id, 'message': message}
+            for discord_id, message in notifications if discord_id]
+    if rows:
+        db.session.execute(insert(NotificationOutbox), rows)
+# --- DISCORD INTEGRATION END ---
+
+
+class CircuitBreaker:
+    """
+    Stops calling the bot after `threshold` consecutive failures for `cooldown` seconds.
+    Once the cooldown is over (half-open) exactly one call is let through as a probe; its
+    result closes or re-opens the breaker. Thread-safe: the dispatcher's sender threads
+    record results concurrently.
+    """
+
+    def __init__(self, threshold=5, cooldown=60.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """True if a call may go out now; in half-open state only the first caller gets to probe."""
+        with self._lock:
+            state = self._state()
+            if state == 'half-open':
+                if self.probing:
+                    return False
+                self.probing = True
+            return state != 'open'
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            # A failed probe in half-open state re-opens the breaker straight away.
+            if self.failures >= self.threshold or self.opened_at is not None:
+                self.opened_at = self.clock()
+
+
+class OutboxDispatcher:
+    """Drains `NotificationOutbox` rows towards `BOT_URL/notify`."""
+
+    def __init__(self, bot_url, batch_size=50, concurrency=4, timeout=5.0,
+                 max_attempts=8, backoff_base=5.0, backoff_max=600.0,
+                 lease=120.0, breaker=None):
+        self.bot_url = bot_url.rstrip('/') if bot_url else None
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+        self.breaker = breaker or CircuitBreaker()
+
+        # Pooled keep-alive connections to the bot, shared by every batch.
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency, max_retries=0)
+        self.http.mount('http://', adapter)
+        self.http.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='outbox')
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config.get('BOT_URL'),
+            batch_size=config['NOTIFY_BATCH_SIZE'],
+            concurrency=config['NOTIFY_CONCURRENCY'],
+            timeout=config['NOTIFY_TIMEOUT'],
+            max_attempts=config['NOTIFY_MAX_ATTEMPTS'],
+            breaker=CircuitBreaker(config['NOTIFY_BREAKER_THRESHOLD'], config['NOTIFY_BREAKER_COOLDOWN']),
+        )
+
+    def backoff(self, attempts):
+        delay = min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+        return delay * random.uniform(0.8, 1.2)
+
+    def claim_batch(self, limit=None):
+        """Lease a batch of due rows so concurrent workers never send the same notification."""
+        now = datetime.utcnow()
+        rows = NotificationOutbox.query.filter(
+            NotificationOutbox.status == 'Pending',
+            NotificationOutbox.next_attempt_at <= now
+        ).order_by(NotificationOutbox.id).limit(limit or self.batch_size).with_for_update(skip_locked=True).all()
+
+        lease_until = now + timedelta(seconds=self.lease)
+        for row in rows:
+            row.next_attempt_at = lease_until
+        batch = [(row.id, row.discord_id, row.message, row.attempts or 0) for row in rows]
+        db.session.commit()
+        return batch
+
+    def send(self, discord_id, message):
+        payload = {
+            'discord_id': discord_id,
+            'message': message
+        }
+        response = self.http.post(f"{self.bot_url}/notify", json=payload, timeout=self.timeout)
+        response.raise_for_status()
+
+    def _send_guarded(self, item):
+        row_id, discord_id, message, attempts = item
+        if not self.breaker.allow():
+            metrics.NOTIFICATIONS.inc(outcome='skipped')
+            return row_id, attempts, None, 'circuit open'
+        start = time.perf_counter()
+        try:
+            self.send(discord_id, message)
+        except Exception as e:
+            self.breaker.record_failure()
+            metrics.NOTIFICATIONS.inc(outcome='failure')
+            metrics.NOTIFICATION_LATENCY.observe(time.perf_counter() - start, outcome='failure')
+            return row_id, attempts, False, str(e)[:255]
+        self.breaker.record_success()
+        metrics.NOTIFICATIONS.inc(outcome='success')
+        metrics.NOTIFICATION_LATENCY.observe(time.perf_counter() - start, outcome='success')
+        return row_id, attempts, True, None
+
+    def run_once(self):
+        """Send one batch. Returns the number of notifications delivered."""
+        if not self.bot_url:
+            return 0
+        state = self.breaker.state
+        if state == 'open':
+            return 0
+
+        # Half-open: lease a single row as the probe and leave the rest of the backlog alone.
+        batch = self.claim_batch(limit=1 if state == 'half-open' else None)
+        if not batch:
+            return 0
+
+        now = datetime.utcnow()
+        sent = 0
+        updates = []
+        for row_id, attempts, ok, error in self.executor.map(self._send_guarded, batch):
+            if ok is None:
+                # Skipped: retry once the breaker closes, or right away if it was only waiting on a probe.
+                delay = self.breaker.cooldown if self.breaker.state == 'open' else 0
+                updates.append({'id': row_id, 'next_attempt_at': now + timedelta(seconds=delay)})
+            elif ok:
+                sent += 1
+                updates.append({'id': row_id, 'status': 'Sent', 'sent_at': now,
+                                'attempts': attempts + 1, 'last_error': None})
+            else:
+                attempts += 1
+                change = {'id': row_id, 'attempts': attempts, 'last_error': error,
+                          'next_attempt_at': now + timedelta(seconds=self.backoff(attempts))}
+                if attempts >= self.max_attempts:
+                    change['status'] = 'Failed'
+                updates.append(change)
+
+        # ORM bulk UPDATE by primary key: one executemany per distinct set of columns.
+        db.session.execute(update(NotificationOutbox), updates)
+        db.session.commit()
+
+        if self.breaker.state == 'open':
+            logger.warning('Circuit breaker abierto para BOT_URL tras %s fallos seguidos.', self.breaker.failures)
+        return sent
+
+
+def outbox_metrics():
+    """Outbox backlog for /metrics, read from the database so it holds wherever the worker runs."""
+    counts = dict(db.session.query(NotificationOutbox.status, func.count(NotificationOutbox.id)).filter(
+        NotificationOutbox.status.in_(('Pending', 'Failed'))
+    ).group_by(NotificationOutbox.status).all())
+    for status in ('Pending', 'Failed'):
+        yield ('hermes_notification_outbox_rows', 'gauge', 'Notificaciones en el outbox por estado.',
+               {'status': status.lower()}, counts.get(status, 0))
+    oldest = db.session.query(func.min(NotificationOutbox.created_at)).filter(
+        NotificationOutbox.status == 'Pending').scalar()
+    age = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+    yield ('hermes_notification_outbox_oldest_pending_seconds', 'gauge',
+           'Antigüedad de la notificación pendiente más antigua.', {}, age)
@@ -0,0 +1,107 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class VerifierBusy(Exception):
+    """Every verification slot stayed taken for longer than PASSWORD_VERIFY_WAIT."""
+
+
+def canonical_method(method):
+    """
+    Spell out werkzeug's defaults so a stored hash can be compared with the configured method:
+    'scrypt' -> 'scrypt:32768:8:1', 'pbkdf2' -> 'pbkdf2:sha256:600000'.
+    """
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        n, r, p = args or (2 ** 15, 8, 1)
+        return f'scrypt:{int(n)}:{int(r)}:{int(p)}'
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    raise ValueError(f'Método de hash no soportado: {method!r}')
+
+
+def stored_method(password_hash):
+    return (password_hash or '').split('$', 1)[0]
+
+
+def needs_rehash(password_hash, method=None):
+    """True when the hash was made with a different method or cost than the configured one."""
+    method = canonical_method(method or current_app.config['PASSWORD_HASH_METHOD'])
+    return stored_method(password_hash) != method
+
+
+class PasswordVerifier:
+    """
+    Runs password hashing on a small thread pool. scrypt and PBKDF2 release the GIL, so at most
+    `workers` cores go to logins however many arrive; callers beyond `workers + queue` wait up
+    to `wait` seconds for a slot and then get VerifierBusy instead of piling up.
+    With workers=0 everything runs inline in the calling thread.
+    """
+
+    def __init__(self, workers=4, queue=16, wait=2.0):
+        self.workers = workers
+        self.wait = wait
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='password') if workers > 0 else None
+        self._slots = threading.BoundedSemaphore(workers + queue) if workers > 0 else None
+        self._lock = threading.Lock()
+        self.in_flight = self.completed = self.rejected = 0
+
+    def run(self, func, *args):
+        if self._executor is None:
+            return func(*args)
+        if not self._slots.acquire(timeout=self.wait):
+            with self._lock:
+                self.rejected += 1
+            raise VerifierBusy()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            return self._executor.submit(func, *args).result()
+        finally:
+            self._slots.release()
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+    def verify(self, password_hash, password):
+        return bool(password_hash) and self.run(check_password_hash, password_hash, password)
+
+    def hash(self, password, method):
+        return self.run(generate_password_hash, password, method)
+
+    def stats(self):
+        with self._lock:
+            return {'workers': self.workers, 'in_flight': self.in_flight,
+                    'completed': self.completed, 'rejected': self.rejected}
+
+
+def get_password_verifier(app=None):
+    app = app or current_app
+    verifier = app.extensions.get('password_verifier')
+    if verifier is None:
+        verifier = app.extensions['password_verifier'] = PasswordVerifier(
+            app.config['PASSWORD_VERIFY_WORKERS'], app.config['PASSWORD_VERIFY_QUEUE'],
+            app.config['PASSWORD_VERIFY_WAIT'])
+    return verifier
+
+
+def hash_password(password, method=None):
+    return get_password_verifier().hash(password, method or current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def verify_and_update(user, password):
+    """
+    Check `password` against the user's stored hash; on success, re-hash it with the configured
+    method if the stored one differs (stronger or weaker). The caller commits.
+    """
+    verifier = get_password_verifier()
+    if not verifier.verify(user.password_hash, password):
+        return False
+    if needs_rehash(user.password_hash):
+        user.password_hash = hash_password(password)
+    return True
@@ -0,0 +1,139 @@
+import time
+from datetime import datetime
+
+from sqlalchemy import case, insert, or_, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import aggregates, balances, db
+from app.models import BankAccount, BankTransaction, PayrollItem, PayrollRequest, User
+from app.notifications import enqueue_notifications
+
+
+class PayrollAlreadyProcessed(Exception):
+    """Another request approved or rejected the payroll first."""
+
+
+class DisbursementResult:
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.outcomes = []
+        self.elapsed_ms = 0.0
+
+    def add(self, item_id, name, amount, status, account_number=None):
+        self.outcomes.append({
+            'item_id': item_id,
+            'name': name,
+            'amount': amount,
+            'status': status,
+            'account_number': account_number
+        })
+
+    @property
+    def paid(self):
+        return [o for o in self.outcomes if o['status'] == 'paid']
+
+    @property
+    def unpaid(self):
+        return [o for o in self.outcomes if o['status'] != 'paid']
+
+    @property
+    def paid_total(self):
+        return sum(o['amount'] for o in self.paid)
+
+
+def disburse_payroll(req):
+    """
+    Pay every item of a pending payroll with a fixed number of statements.
+
+    The target accounts are resolved with one query, locked in id order like
+    balances.transfer, credited with one bulk UPDATE, and the `salary` transactions and
+    Discord notifications are bulk-inserted. Nothing is committed here: the caller runs it
+    through balances.run_atomic, so the whole payroll is one transaction retried on deadlock.
+    """
+    started = time.perf_counter()
+    result = DisbursementResult(req.id)
+
+    # Claim the request atomically so two approvals can never pay it twice.
+    claimed = db.session.execute(
+        update(PayrollRequest)
+        .where(PayrollRequest.id == req.id, PayrollRequest.status == 'Pending')
+        .values(status='Approved')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if claimed != 1:
+        raise PayrollAlreadyProcessed(req.id)
+
+    items = db.session.query(
+        PayrollItem.id, PayrollItem.user_id, PayrollItem.amount,
+        User.id.label('found_user_id'), User.first_name, User.last_name, User.salary_account_number
+    ).outerjoin(User, User.id == PayrollItem.user_id).filter(
+        PayrollItem.request_id == req.id
+    ).order_by(PayrollItem.id).all()
+
+    # A salary account number takes precedence; otherwise the member's own account is used.
+    account_numbers = {i.salary_account_number for i in items if i.salary_account_number}
+    owner_ids = {i.user_id for i in items if i.found_user_id and not i.salary_account_number}
+
+    accounts = []
+    if account_numbers or owner_ids:
+        accounts = db.session.query(
+            BankAccount.id, BankAccount.account_number, BankAccount.user_id, User.discord_id
+        ).join(User, User.id == BankAccount.user_id).filter(
+            or_(BankAccount.account_number.in_(account_numbers), BankAccount.user_id.in_(owner_ids))
+        ).all()
+    by_number = {a.account_number: a for a in accounts}
+    by_owner = {a.user_id: a for a in accounts}
+
+    credits = {}
+    transactions = []
+    notifications = []
+    now = datetime.utcnow()
+    description = f'Nómina {req.department} ({req.created_at.strftime("%d/%m")})'
+
+    for item in items:
+        if not item.found_user_id:
+            result.add(item.id, None, item.amount, 'missing_user')
+            continue
+
+        name = f'{item.first_name} {item.last_name}'
+        if item.salary_account_number:
+            account = by_number.get(item.salary_account_number)
+        else:
+            account = by_owner.get(item.user_id)
+        if not account:
+            result.add(item.id, name, item.amount, 'no_account', item.salary_account_number)
+            continue
+
+        credits[account.id] = credits.get(account.id, 0.0) + item.amount
+        transactions.append({
+            'account_id': account.id,
+            'type': 'salary',
+            'amount': item.amount,
+            'description': description,
+            'department': req.department,
+            'timestamp': now
+        })
+        notifications.append((account.discord_id, f"💰 **Nómina Recibida**\nHas recibido tu sueldo de ${item.amount:,.2f} correspondiente al departamento {req.department}."))
+        result.add(item.id, name, item.amount, 'paid', account.account_number)
+
+    if credits:
+        # The bulk UPDATE touches rows in whatever order the plan picks; taking the locks first,
+        # in ascending id order, keeps it from deadlocking against concurrent transfers.
+        balances.lock_accounts(credits)
+        db.session.execute(
+            update(BankAccount)
+            .where(BankAccount.id.in_(credits))
+            .values(balance=BankAccount.balance + case(credits, value=BankAccount.id, else_=0.0))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(insert(BankTransaction), transactions)
+        enqueue_notifications(notifications)
+
+        paid_total = sum(credits.values())
+        aggregates.record(aggregates.MONEY_SUPPLY, paid_total)
+        aggregates.record(aggregates.SALARY_EXPENSE, paid_total)
+
+    # Keep the loaded request in sync without emitting a second UPDATE.
+    set_committed_value(req, 'status', 'Approved')
+    result.elapsed_ms = (time.perf_counter() - started) * 1000
+    return result
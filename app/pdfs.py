@@ -0,0 +1,328 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from types import SimpleNamespace
+
+from flask import current_app
+from fpdf import FPDF
+from PIL import Image, ImageOps
+from sqlalchemy import event, select, update
+
+from app import db, metrics
+from app.models import CriminalRecord, CriminalRecordEvidencePhoto, CriminalRecordSubjectPhoto, User
+from app.images import best_name
+from app.profiles import criminal_record_options
+
+# Bump when the layout changes so cached files from the old renderer stop matching.
+RENDERER_VERSION = 3
+
+
+class PdfResources:
+    """
+    Photos shared by every PDF rendered in this process, through fpdf2's public API only.
+
+    Each photo is decoded once, scaled to `image_px` and re-encoded as JPEG; fpdf2 embeds a
+    JPEG without recompressing it, so later documents skip both the decode and the compression.
+    Images are keyed by content hash and kept in an LRU of `max_images` entries.
+
+    Fonts are not shared: each document registers its own with FPDF.add_font, because output()
+    subsets the font's tables in place, so every document needs a parse of its own anyway (a
+    deep-copied template document measured no faster).
+    """
+
+    FAMILY = 'docfont'
+
+    def __init__(self, font_path=None, bold_font_path=None, image_px=600, max_images=256):
+        self.font_path = font_path
+        self.bold_font_path = bold_font_path or font_path
+        self.image_px = image_px
+        self.max_images = max_images
+        self._images = OrderedDict()
+        self._hashes = {}
+        self._lock = threading.Lock()
+        self.image_hits = self.image_misses = 0
+
+    @property
+    def family(self):
+        return self.FAMILY if self.font_path else 'Arial'
+
+    def new_document(self):
+        pdf = FPDF()
+        if self.font_path:
+            pdf.add_font(self.FAMILY, '', self.font_path)
+            pdf.add_font(self.FAMILY, 'B', self.bold_font_path)
+        return pdf
+
+    def _content_hash(self, path):
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = self._hashes.get(key)
+        if digest is None:
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            if len(self._hashes) >= self.max_images * 4:
+                self._hashes.clear()
+            self._hashes[key] = digest
+        return digest
+
+    def _jpeg(self, path):
+        digest = self._content_hash(path)
+        with self._lock:
+            data = self._images.get(digest)
+            if data is not None:
+                self._images.move_to_end(digest)
+                self.image_hits += 1
+                return data
+
+        with Image.open(path) as source:
+            image = ImageOps.exif_transpose(source)
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, 'white')
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+            image.thumbnail((self.image_px, self.image_px * 4))
+            encoded = io.BytesIO()
+            image.save(encoded, 'JPEG', quality=85, optimize=True)
+        data = encoded.getvalue()
+
+        with self._lock:
+            self.image_misses += 1
+            self._images[digest] = data
+            while len(self._images) > self.max_images:
+                self._images.popitem(last=False)
+        return data
+
+    def image(self, pdf, path, **kwargs):
+        pdf.image(io.BytesIO(self._jpeg(path)), **kwargs)
+
+
+def render_criminal_record(user, records, upload_folder, resources=None, issued=None):
+    """
+    `resources=None` renders without shared caches (core font, photos read from disk).
+    `issued` is the issue date printed on the document (today, UTC, by default).
+    """
+    issued = issued or datetime.utcnow().date()
+    pdf = resources.new_document() if resources else FPDF()
+    family = resources.family if resources else "Arial"
+
+    def add_image(path, **kwargs):
+        if resources:
+            resources.image(pdf, path, **kwargs)
+        else:
+            pdf.image(path, **kwargs)
+
+    pdf.add_page()
+    pdf.set_font(family, size=12)
+
+    # Header
+    pdf.set_font(family, 'B', 16)
+    pdf.cell(200, 10, txt="Reporte de Antecedentes Penales", ln=True, align='C')
+    pdf.ln(10)
+
+    # User Info
+    pdf.set_font(family, size=12)
+    pdf.cell(200, 8, txt=f"Ciudadano: {user.first_name} {user.last_name}", ln=True)
+    pdf.cell(200, 8, txt=f"DNI: {user.dni}", ln=True)
+    pdf.cell(200, 8, txt=f"Fecha de Emisión: {issued.strftime('%d/%m/%Y')}", ln=True)
+    pdf.ln(10)
+
+    if not records:
+        pdf.cell(200, 10, txt="No se encontraron antecedentes penales.", ln=True)
+    else:
+        for record in records:
+            pdf.set_font(family, 'B', 12)
+            pdf.cell(200, 8, txt=f"Delito: {record.crime} (CP: {record.penal_code})", ln=True)
+            pdf.set_font(family, size=12)
+            pdf.cell(200, 6, txt=f"Fecha: {record.date.strftime('%d/%m/%Y')}", ln=True)
+            pdf.multi_cell(0, 6, txt=f"Informe: {record.report_text}")
+
+            for title, photos in (("Fotos del Sujeto:", record.subject_photos), ("Evidencia:", record.evidence_photos)):
+                if not photos:
+                    continue
+                pdf.ln(5)
+                pdf.cell(200, 6, txt=title, ln=True)
+                x_start = 10
+                for photo in photos:
+                    img_path = os.path.join(upload_folder, best_name(photo.filename, 'print'))
+                    if os.path.exists(img_path):
+                        # Scaling image to width 50
+                        add_image(img_path, x=x_start, y=pdf.get_y(), w=50)
+                        x_start += 55
+                        if x_start > 150:  # Wrap row
+                            x_start = 10
+                            pdf.ln(55)  # Approx height of image + gap
+                pdf.ln(60)  # Space after image row
+
+            pdf.ln(10)
+            pdf.line(10, pdf.get_y(), 200, pdf.get_y())
+            pdf.ln(10)
+
+    # fpdf2 output() returns a bytearray.
+    return bytes(pdf.output())
+
+
+def check_renderer():
+    """
+    Render a sample record with the configured font and a photo through the shared resources;
+    raises if the installed fpdf2 no longer works with this module. Returns the PDF size.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        Image.new('RGB', (64, 48), 'gray').save(os.path.join(directory, 'check.png'))
+        photo = SimpleNamespace(filename='check.png')
+        user = SimpleNamespace(first_name='José', last_name='Núñez', dni='00000000')
+        record = SimpleNamespace(crime='Prueba', penal_code='0', report_text='Informe', date=datetime.utcnow(),
+                                 subject_photos=[photo], evidence_photos=[photo])
+        document = render_criminal_record(user, [record], directory, get_pdf_resources())
+    if not document.startswith(b'%PDF'):
+        raise RuntimeError('fpdf2 no generó un PDF válido')
+    return len(document)
+
+
+def get_pdf_resources(app=None):
+    app = app or current_app
+    resources = app.extensions.get('pdf_resources')
+    if resources is None:
+        resources = app.extensions['pdf_resources'] = PdfResources(
+            font_path=app.config['PDF_FONT_PATH'], bold_font_path=app.config['PDF_BOLD_FONT_PATH'],
+            image_px=app.config['PDF_IMAGE_PX'])
+    return resources
+
+
+class PdfCache:
+    """
+    Rendered PDFs on disk, one file per key, bounded to `max_bytes`.
+
+    Hits bump the file's mtime and eviction removes the oldest mtimes first, which makes the
+    directory an LRU that every worker process shares.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.pdf')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, data, prefix=None):
+        """Store atomically; `prefix` removes older versions for the same owner."""
+        if prefix:
+            for name in os.listdir(self.directory):
+                if name.startswith(prefix) and name != f'{key}.pdf':
+                    self._remove(os.path.join(self.directory, name))
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self.path(key))
+        self.evict()
+        return self.path(key)
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.pdf'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def get_pdf_cache(app=None):
+    app = app or current_app
+    cache = app.extensions.get('pdf_cache')
+    if cache is None:
+        directory = app.config['PDF_CACHE_DIR'] or os.path.join(app.instance_path, 'pdf_cache')
+        cache = app.extensions['pdf_cache'] = PdfCache(directory, app.config['PDF_CACHE_MAX_BYTES'])
+    return cache
+
+
+def criminal_record_key(user_id, version, first_name, last_name, dni, issued):
+    """
+    Cache key and ETag: changes with the record set, the citizen's identity, the renderer and
+    the issue date printed on the document, so a cached copy is never served with an old date.
+    """
+    identity = hashlib.sha256(f'{first_name}|{last_name}|{dni}'.encode()).hexdigest()[:12]
+    return f'record-{user_id}-v{version}-{identity}-r{RENDERER_VERSION}-{issued:%Y%m%d}'
+
+
+def criminal_record_pdf(user_id):
+    """Return `(key, path)` for the user's record PDF, rendering it only when the version changed."""
+    version, first_name, last_name, dni = db.session.query(
+        User.criminal_record_version, User.first_name, User.last_name, User.dni
+    ).filter(User.id == user_id).one()
+    issued = datetime.utcnow().date()
+    key = criminal_record_key(user_id, version, first_name, last_name, dni, issued)
+
+    cache = get_pdf_cache()
+    path = cache.get(key)
+    metrics.PDF_REQUESTS.inc(document='criminal_record', cache='miss' if path is None else 'hit')
+    if path is None:
+        user = db.session.get(User, user_id)
+        records = db.session.query(CriminalRecord).options(*criminal_record_options()).filter(
+            CriminalRecord.user_id == user_id
+        ).order_by(CriminalRecord.id).all()
+        with metrics.PDF_RENDER.time(document='criminal_record'):
+            data = render_criminal_record(user, records, current_app.config['UPLOAD_FOLDER'], get_pdf_resources(),
+                                          issued=issued)
+        path = cache.put(key, data, prefix=f'record-{user_id}-')
+    return key, path
+
+
+# --- Record-set version ---
+# Any insert/update/delete of a record or photo bumps User.criminal_record_version in the same
+# transaction, so the next download misses the cache.
+
+def _bump(connection, user_id):
+    connection.execute(
+        update(User.__table__).where(User.__table__.c.id == user_id)
+        .values(criminal_record_version=User.__table__.c.criminal_record_version + 1)
+    )
+
+
+@event.listens_for(CriminalRecord, 'after_insert')
+@event.listens_for(CriminalRecord, 'after_update')
+@event.listens_for(CriminalRecord, 'after_delete')
+def _record_changed(mapper, connection, record):
+    _bump(connection, record.user_id)
+
+
+@event.listens_for(CriminalRecordSubjectPhoto, 'after_insert')
+@event.listens_for(CriminalRecordSubjectPhoto, 'after_update')
+@event.listens_for(CriminalRecordSubjectPhoto, 'after_delete')
+@event.listens_for(CriminalRecordEvidencePhoto, 'after_insert')
+@event.listens_for(CriminalRecordEvidencePhoto, 'after_update')
+@event.listens_for(CriminalRecordEvidencePhoto, 'after_delete')
+def _photo_changed(mapper, connection, photo):
+    owner = select(CriminalRecord.__table__.c.user_id).where(
+        CriminalRecord.__table__.c.id == photo.record_id
+    ).scalar_subquery()
+    _bump(connection, owner)
@@ -0,0 +1,45 @@
+from flask import current_app
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+
+from app import db
+from app.models import Comment, CriminalRecord, TrafficFine, User
+
+
+def criminal_record_options():
+    """Author and both photo collections of a CriminalRecord, shared with the PDF renderer."""
+    return [
+        joinedload(CriminalRecord.author),
+        selectinload(CriminalRecord.subject_photos),
+        selectinload(CriminalRecord.evidence_photos),
+    ]
+
+
+def profile_load_options():
+    """
+    Everything citizen_profile.html reads, in a fixed number of queries: the user with its bank
+    account (one JOIN), then one SELECT ... IN per collection with the authors joined in, and one
+    per photo collection. Seven queries no matter how long the record is.
+    """
+    return [
+        joinedload(User.bank_account),
+        selectinload(User.comments).joinedload(Comment.author),
+        selectinload(User.traffic_fines).joinedload(TrafficFine.author),
+        selectinload(User.licenses),
+        selectinload(User.criminal_records).options(*criminal_record_options()),
+    ]
+
+
+def load_citizen_profile(user_id, strict=None):
+    """
+    Load a citizen for the profile page, or None.
+
+    With `strict` (default: the PROFILE_STRICT_LOADING setting) any relationship outside the plan
+    raises instead of lazy loading, so a template change that adds an N+1 fails loudly in tests.
+    """
+    if strict is None:
+        strict = current_app.config.get('PROFILE_STRICT_LOADING', False)
+
+    options = profile_load_options()
+    if strict:
+        options.append(raiseload('*', sql_only=True))
+    return db.session.query(User).options(*options).filter(User.id == user_id).one_or_none()
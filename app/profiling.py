@@ -0,0 +1,169 @@
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# A bound-parameter list such as "(?, ?, ?)" or "(%(id_1_1)s, %(id_1_2)s)": the expanded IN of a
+# batch query, which must collapse to the same shape whatever its length.
+_PARAM = r'(?:\?|%\(\w+\)s|%s|:\w+)'
+_PARAM_LIST = re.compile(rf'\(\s*{_PARAM}(?:\s*,\s*{_PARAM})*\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_SPACE = re.compile(r'\s+')
+_SELECT_LIST = re.compile(r'^SELECT .+? FROM ')
+# Requests no route matched (404 scans) share one entry, so the per-endpoint stats stay bounded.
+UNMATCHED = 'unmatched'
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement):
+    """The statement with literals and parameter lists folded, so repeated lookups compare equal."""
+    shape = _PARAM_LIST.sub('(?)', statement)
+    shape = _NUMBER.sub('N', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+def brief(shape, limit=300):
+    """Shape for the log: the column list adds nothing to spotting which query repeats."""
+    return _SELECT_LIST.sub('SELECT ... FROM ', shape, count=1)[:limit]
+
+
+class RequestProfile:
+    """Queries run while handling one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.started = None
+        self.shapes = Counter()
+        self.timings = []
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total += elapsed
+        shape = statement_shape(statement)
+        self.shapes[shape] += 1
+        self.timings.append((elapsed, shape))
+
+    def slowest(self, limit):
+        return sorted(self.timings, key=lambda timing: timing[0], reverse=True)[:limit]
+
+    def repeated(self, threshold):
+        """Shapes run at least `threshold` times: one query per row of something, probably."""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+class SqlProfiler:
+    """
+    Per-request SQL profile from cursor events. A request is profiled with probability
+    `sample_rate`, or always when `allow_header` is set and it sends `X-SQL-Profile: 1`.
+    Unsampled requests cost one dictionary lookup per query.
+    """
+
+    def __init__(self, sample_rate=0.0, allow_header=False, slow_ms=100.0, n_plus_one=5, top=3):
+        self.sample_rate = sample_rate
+        self.allow_header = allow_header
+        self.slow_ms = slow_ms
+        self.n_plus_one = n_plus_one
+        self.top = top
+        self._lock = threading.Lock()
+        self.endpoints = {}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            sample_rate=config['SQL_PROFILE_SAMPLE_RATE'],
+            allow_header=config['SQL_PROFILE_HEADER'],
+            slow_ms=config['SQL_PROFILE_SLOW_MS'],
+            n_plus_one=config['SQL_PROFILE_N_PLUS_ONE'],
+        )
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or self.allow_header
+
+    def install(self, app, engine):
+        if not self.enabled:
+            return
+        app.extensions['sql_profiler'] = self
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _start(self):
+        forced = self.allow_header and request.headers.get('X-SQL-Profile') == '1'
+        if forced or random.random() < self.sample_rate:
+            g.sql_profile = RequestProfile()
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = g.get('sql_profile') if has_request_context() else None
+        if profile is not None:
+            profile.started = time.perf_counter()
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = g.get('sql_profile') if has_request_context() else None
+        if profile is not None and profile.started is not None:
+            profile.record(statement, time.perf_counter() - profile.started)
+            profile.started = None
+
+    def _finish(self, response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+
+        endpoint = request.endpoint or UNMATCHED
+        repeated = profile.repeated(self.n_plus_one)
+        total_ms = profile.total * 1000
+        self._aggregate(endpoint, profile, repeated)
+
+        level = logging.WARNING if repeated or total_ms >= self.slow_ms else logging.INFO
+        if logger.isEnabledFor(level):
+            lines = [f'SQL {request.method} {endpoint}: {profile.count} consultas, {total_ms:.1f} ms']
+            for shape, count in repeated:
+                lines.append(f'  posible N+1 ({count}x): {brief(shape)}')
+            for elapsed, shape in profile.slowest(self.top):
+                lines.append(f'  {elapsed * 1000:.1f} ms: {brief(shape)}')
+            logger.log(level, '\n'.join(lines))
+
+        if self.allow_header:
+            response.headers['X-SQL-Profile'] = f'queries={profile.count}; time={total_ms:.1f}ms; n+1={len(repeated)}'
+            response.headers.add('Server-Timing', f'db;dur={total_ms:.1f};desc="{profile.count} queries"')
+        return response
+
+    def _aggregate(self, endpoint, profile, repeated):
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, {'requests': 0, 'queries': 0, 'seconds': 0.0, 'n_plus_one': 0})
+            stats['requests'] += 1
+            stats['queries'] += profile.count
+            stats['seconds'] += profile.total
+            stats['n_plus_one'] += bool(repeated)
+
+    def stats(self):
+        with self._lock:
+            return {endpoint: dict(stats) for endpoint, stats in self.endpoints.items()}
+
+
+def profiler_metrics(app):
+    """Per-endpoint totals of the sampled requests for /metrics (summed over every process)."""
+    profiler = app.extensions.get('sql_profiler')
+    if profiler is None:
+        return
+    for endpoint, stats in profiler.stats().items():
+        labels = {'endpoint': endpoint}
+        yield 'hermes_sql_profiled_requests_total', 'counter', 'Peticiones con perfil SQL.', labels, stats['requests']
+        yield ('hermes_sql_profiled_queries_total', 'counter', 'Consultas en las peticiones con perfil SQL.',
+               labels, stats['queries'])
+        yield ('hermes_sql_profiled_seconds_total', 'counter', 'Tiempo en SQL de las peticiones con perfil.',
+               labels, stats['seconds'])
+        yield ('hermes_sql_n_plus_one_requests_total', 'counter', 'Peticiones con perfil y un posible N+1.',
+               labels, stats['n_plus_one'])
@@ -0,0 +1,138 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func
+
+from app import db
+from app.models import BankTransaction, RollupState, TransactionRollup
+
+STATE_NAME = 'bank_transaction_daily'
+
+# Rows younger than this are left for the next run: a concurrent transaction may still
+# commit a lower id, and the builder only ever moves its watermark forward.
+SETTLE_SECONDS = 60
+
+
+def _as_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _get_state():
+    state = RollupState.query.filter_by(name=STATE_NAME).with_for_update().first()
+    if not state:
+        state = RollupState(name=STATE_NAME, last_transaction_id=0)
+        db.session.add(state)
+    return state
+
+
+def build_rollups(chunk_size=5000, now=None):
+    """
+    Fold new BankTransaction rows into the daily (day, type, department) buckets.
+
+    Work is proportional to the transactions added since the last run; each chunk is one
+    GROUP BY over an id range plus a merge into at most a few hundred bucket rows, and is
+    committed together with the watermark. Returns the number of transactions processed.
+    """
+    now = now or datetime.utcnow()
+    state = _get_state()
+    upper = db.session.query(func.max(BankTransaction.id)).filter(
+        BankTransaction.id > state.last_transaction_id,
+        BankTransaction.timestamp < now - timedelta(seconds=SETTLE_SECONDS)
+    ).scalar()
+    if not upper:
+        db.session.commit()
+        return 0
+
+    processed = 0
+    while state.last_transaction_id < upper:
+        low = state.last_transaction_id
+        high = min(low + chunk_size, upper)
+        day = func.date(BankTransaction.timestamp)
+        department = func.coalesce(BankTransaction.department, '')
+        groups = db.session.query(
+            day, BankTransaction.type, department,
+            func.count(BankTransaction.id), func.sum(BankTransaction.amount),
+            func.min(BankTransaction.amount), func.max(BankTransaction.amount)
+        ).filter(
+            BankTransaction.id > low, BankTransaction.id <= high
+        ).group_by(day, BankTransaction.type, department).all()
+
+        days = {_as_date(g[0]) for g in groups}
+        existing = {
+            (r.day, r.type, r.department): r
+            for r in TransactionRollup.query.filter(TransactionRollup.day.in_(days)).all()
+        } if days else {}
+
+        for bucket_day, transaction_type, bucket_department, count, total, low_amount, high_amount in groups:
+            key = (_as_date(bucket_day), transaction_type or '', bucket_department)
+            bucket = existing.get(key)
+            if bucket is None:
+                bucket = TransactionRollup(day=key[0], type=key[1], department=key[2],
+                                           count=0, total=0.0, min_amount=low_amount, max_amount=high_amount)
+                db.session.add(bucket)
+                existing[key] = bucket
+            bucket.count += count
+            bucket.total += total or 0.0
+            bucket.min_amount = min(bucket.min_amount, low_amount)
+            bucket.max_amount = max(bucket.max_amount, high_amount)
+            processed += count
+
+        state.last_transaction_id = high
+        state.updated_at = now
+        db.session.commit()
+        if high < upper:
+            state = _get_state()
+    return processed
+
+
+def rebuild_rollups(chunk_size=5000):
+    TransactionRollup.query.delete()
+    RollupState.query.filter_by(name=STATE_NAME).delete()
+    db.session.commit()
+    return build_rollups(chunk_size=chunk_size)
+
+
+def rollup_watermark():
+    state = db.session.get(RollupState, STATE_NAME)
+    return state.updated_at if state else None
+
+
+# --- Range queries (touch rollup rows only) ---
+
+def totals_by_type(start, end, types):
+    """Sum per type for days in [start, end)."""
+    rows = db.session.query(TransactionRollup.type, func.sum(TransactionRollup.total)).filter(
+        TransactionRollup.day >= start, TransactionRollup.day < end,
+        TransactionRollup.type.in_(types)
+    ).group_by(TransactionRollup.type).all()
+    totals = dict.fromkeys(types, 0.0)
+    totals.update({t: total or 0.0 for t, total in rows})
+    return totals
+
+
+def period_comparison(types, days=7, today=None):
+    """Total for the last `days` days (today included) against the `days` before them."""
+    end = (today or datetime.utcnow().date()) + timedelta(days=1)
+    current = sum(totals_by_type(end - timedelta(days=days), end, types).values())
+    previous = sum(totals_by_type(end - timedelta(days=2 * days), end - timedelta(days=days), types).values())
+    change = ((current - previous) / previous * 100) if previous else None
+    return {'current': current, 'previous': previous, 'change_pct': change}
+
+
+def salary_by_department_week(weeks=4, today=None):
+    """`(week_start, {department: total})` for the last `weeks` ISO weeks, newest first."""
+    today = today or datetime.utcnow().date()
+    this_week = today - timedelta(days=today.weekday())
+    start = this_week - timedelta(weeks=weeks - 1)
+    rows = db.session.query(
+        TransactionRollup.day, TransactionRollup.department, TransactionRollup.total
+    ).filter(
+        TransactionRollup.type == 'salary', TransactionRollup.day >= start
+    ).all()
+
+    by_week = {start + timedelta(weeks=i): {} for i in range(weeks)}
+    for day, department, total in rows:
+        week = day - timedelta(days=day.weekday())
+        departments = by_week.setdefault(week, {})
+        name = department or 'Sin departamento'
+        departments[name] = departments.get(name, 0.0) + total
+    return sorted(by_week.items(), reverse=True)
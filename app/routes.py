@@ -1,16 +1,16 @@
+import hashlib
+import hmac
+import json
 import os
-import random
-import string
-import requests  # --- DISCORD INTEGRATION: Necesario para notificaciones
 from datetime import datetime, timedelta, date
-from flask import render_template, flash, redirect, url_for, request, current_app, jsonify, make_response
+from flask import render_template, flash, redirect, url_for, request, current_app, jsonify, abort, send_file, send_from_directory
 from app import db
 from app.forms import (
     LoginForm, RegistrationForm, OfficialLoginForm, OfficialRegistrationForm,
     SearchUserForm, CriminalRecordForm, TrafficFineForm, CommentForm,
     TransferForm, LoanForm, LoanRepayForm, SavingsForm, CardCustomizationForm,
     LotteryTicketForm, AdjustBalanceForm, GovFundAdjustForm, SalaryForm, AppointmentForm,
-    CreateLeaderForm
+    CreateLeaderForm, TransactionFilterForm
 )
 from app.models import (
     User, Comment, TrafficFine, License, CriminalRecord,
@@ -19,14 +19,23 @@ from app.models import (
     Lottery, LotteryTicket, GovernmentFund, PayrollRequest, PayrollItem,
     Appointment
 )
+from app.notifications import notify_discord_bot
+from app.payroll import disburse_payroll, PayrollAlreadyProcessed
+from app import aggregates, assets, balances, images, metrics, rollups, search, uploads
+from app.accounts import open_account
+from app.database import engine_profile, pool_stats
+from app.profiles import load_citizen_profile
+from app.passwords import VerifierBusy
+from app.pdfs import criminal_record_pdf
+from app.lottery import get_lottery, count_ticket, latest_draw
+from app.history import transaction_page, serialize_transaction, InvalidCursor, PAGE_SIZE
 from flask_login import current_user, login_user, logout_user, login_required
 from flask import Blueprint
-from werkzeug.utils import secure_filename
 from sqlalchemy import or_
-from fpdf import FPDF
-import io
 
 bp = Blueprint('main', __name__)
+bp.add_app_template_global(uploads.upload_url)
+bp.add_app_template_global(assets.asset_url)
 
 # --- Configuración de Licencias ---
 LICENSE_TYPES = {
@@ -39,102 +48,35 @@ LICENSE_TYPES = {
     'stripping': {'name': 'Licencia de Stripping', 'price': 3000}
 }
 
-# --- Helper Functions ---
+# Identificadores por petición en /api/citizens/lookup
+MAX_LOOKUP_BATCH = 1000
 
-# --- DISCORD INTEGRATION START ---
-def notify_discord_bot(user, message):
-    """
-    Envía una notificación al bot de Discord si el usuario tiene su cuenta vinculada.
-    """
-    if not user.discord_id:
-        return
-    
-    # Asegúrate de tener esta variable en Railway en el proyecto de la WEB
-    bot_url = os.environ.get('BOT_URL')
-    
-    if not bot_url:
-        print("ADVERTENCIA: Variable 'BOT_URL' no configurada en la Web.")
-        return
 
-    try:
-        payload = {
-            'discord_id': user.discord_id,
-            'message': message
-        }
-        # Timeout corto para no bloquear la web
-        requests.post(f"{bot_url}/notify", json=payload, timeout=2)
-    except Exception as e:
-        print(f"Error enviando notificación a Discord: {e}")
-# --- DISCORD INTEGRATION END ---
-
-def generate_account_number():
-    while True:
-        # Generate 10 digits
-        acc_num = ''.join(random.choices(string.digits, k=10))
-        if not BankAccount.query.filter_by(account_number=acc_num).first():
-            return acc_num
-
-def check_loan_penalties(account):
-    """Check for overdue loans and apply penalties."""
-    loans = BankLoan.query.filter_by(account_id=account.id, status='Active').all()
-    for loan in loans:
-        if datetime.utcnow() > loan.due_date:
-            base_date = loan.last_penalty_check if loan.last_penalty_check else loan.due_date
-            diff = datetime.utcnow() - base_date
-            if diff.days >= 2:
-                intervals = diff.days // 2
-                penalty_amount = (loan.amount_due * 0.01) * intervals
-
-                loan.amount_due += penalty_amount
-                account.balance -= penalty_amount
-                loan.last_penalty_check = datetime.utcnow()
+def bearer_authorized(token):
+    """True if the request carries `Authorization: Bearer <token>`; always False without a token."""
+    return bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
 
-                trans = BankTransaction(
-                    account_id=account.id,
-                    type='loan_fee',
-                    amount=penalty_amount,
-                    description=f'Cargo por mora ({intervals * 1}%)'
-                )
-                db.session.add(trans)
-                db.session.commit()
-                
-                # --- DISCORD NOTIFICATION ---
-                notify_discord_bot(account.owner, f"⚠️ **Cargo por Mora**\nSe ha aplicado una penalización de ${penalty_amount:,.2f} a tu préstamo vencido.")
-
-def get_lottery_state():
-    """Ensure lottery record exists and handle daily draw."""
-    lottery = Lottery.query.first()
-    if not lottery:
-        lottery = Lottery(current_jackpot=50000.0, last_run_date=datetime.utcnow().date())
-        db.session.add(lottery)
-        db.session.commit()
 
-    today = datetime.utcnow().date()
-    if today > lottery.last_run_date:
-        winning_number = ''.join(random.choices(string.digits, k=5))
-
-        # Draw for tickets bought on the last_run_date (yesterday/previous active day)
-        winning_tickets = LotteryTicket.query.filter_by(date=lottery.last_run_date, numbers=winning_number).all()
-
-        if winning_tickets:
-            prize_per_winner = lottery.current_jackpot / len(winning_tickets)
-            for ticket in winning_tickets:
-                winner_acc = ticket.owner.bank_account
-                if winner_acc:
-                    winner_acc.balance += prize_per_winner
-                    trans = BankTransaction(
-                        account_id=winner_acc.id, type='lottery_win', amount=prize_per_winner,
-                        description=f'Premio Lotería (Núm: {winning_number})'
-                    )
-                    db.session.add(trans)
-                    # --- DISCORD NOTIFICATION ---
-                    notify_discord_bot(ticket.owner, f"🎉 **¡GANASTE LA LOTERÍA!**\nTu número {winning_number} ha sido premiado con ${prize_per_winner:,.2f}.")
-            lottery.current_jackpot = 50000.0
-
-        lottery.last_run_date = today
-        db.session.commit()
+def _lookup_ids(data, key):
+    """The `key` list of a lookup body as strings, or None if it is not a list of DNIs/IDs."""
+    values = data.get(key)
+    if values is None:
+        return []
+    if not isinstance(values, list) or not all(
+            isinstance(v, (str, int)) and not isinstance(v, bool) for v in values):
+        return None
+    return sorted({str(v) for v in values})
+
+# --- Helper Functions ---
 
-    return lottery
+def transaction_filters(form):
+    """History filters from a TransactionFilterForm, ignoring fields that did not validate."""
+    form.validate()
+    return {
+        name: getattr(form, name).data
+        for name in ('type', 'date_from', 'date_to', 'min_amount', 'max_amount')
+        if name not in form.errors
+    }
 
 def get_gov_fund():
     fund = GovernmentFund.query.first()
@@ -144,6 +86,41 @@ def get_gov_fund():
         db.session.commit()
     return fund
 
+@bp.route('/assets/<path:filename>')
+def asset(filename):
+    # Fingerprinted copy from `flask assets build`; the name changes whenever the content does.
+    return assets.send_asset(filename)
+
+@bp.route('/uploads/<path:name>')
+def uploaded_file(name):
+    # Only EXIF-free variants of uploads that passed validation; originals are never served.
+    blob = images.blob_for_variant(f'{uploads.STORE_PREFIX}/{name}')
+    if blob is None or blob.status == 'Invalid':
+        abort(404)
+    # Content-addressed: a name never changes its bytes, so browsers can keep it forever.
+    root = os.path.join(current_app.config['UPLOAD_FOLDER'], uploads.STORE_PREFIX)
+    response = send_from_directory(root, name, max_age=31536000)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """
+    Prometheus: contadores de todos los procesos más el estado del outbox (app/metrics.py).
+    Con METRICS_TOKEN exige el token; sin él solo responde a peticiones locales.
+    """
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        if not bearer_authorized(token):
+            abort(401)
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        abort(403)
+    return metrics.REGISTRY.render(), 200, {
+        'Content-Type': 'text/plain; version=0.0.4; charset=utf-8',
+        'Cache-Control': 'no-store',
+    }
+
 # --- API ROUTES FOR DISCORD BOT (NEW) ---
 
 @bp.route('/api/check_citizen/<dni>', methods=['GET'])
@@ -158,6 +135,54 @@ def check_citizen_api(dni):
         })
     return jsonify({'found': False}), 404
 
+@bp.route('/api/citizens/lookup', methods=['POST'])
+def citizens_lookup_api():
+    """
+    Consulta por lotes para el bot: {"dnis": [...], "discord_ids": [...]} resuelto con una sola
+    consulta IN. Responde un mapa por DNI (null si no existe) y discord_id -> DNI. La ETag es el
+    hash de la respuesta, así un lote sin cambios devuelve 304 con If-None-Match.
+    Devuelve los discord_id de cada DNI, así que exige el token del bot (BOT_API_TOKEN).
+    """
+    if not bearer_authorized(current_app.config['BOT_API_TOKEN']):
+        abort(401)
+
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'El cuerpo debe ser un objeto JSON'}), 400
+    dnis = _lookup_ids(data, 'dnis')
+    discord_ids = _lookup_ids(data, 'discord_ids')
+    if dnis is None or discord_ids is None:
+        return jsonify({'error': 'dnis y discord_ids deben ser listas de identificadores'}), 400
+    if len(dnis) + len(discord_ids) > MAX_LOOKUP_BATCH:
+        return jsonify({'error': f'Máximo {MAX_LOOKUP_BATCH} identificadores por consulta'}), 400
+
+    result = {'dnis': dict.fromkeys(dnis), 'discord_ids': dict.fromkeys(discord_ids)}
+    conditions = []
+    if dnis:
+        conditions.append(User.dni.in_(dnis))
+    if discord_ids:
+        conditions.append(User.discord_id.in_(discord_ids))
+    if conditions:
+        rows = db.session.query(User.dni, User.first_name, User.last_name, User.discord_id).filter(
+            User.badge_id == None, or_(*conditions)
+        ).all()
+        for dni, first_name, last_name, discord_id in rows:
+            if dni in result['dnis']:
+                result['dnis'][dni] = {'first_name': first_name, 'last_name': last_name, 'discord_id': discord_id}
+            if discord_id in result['discord_ids']:
+                result['discord_ids'][discord_id] = dni
+
+    body = json.dumps(result, separators=(',', ':'), sort_keys=True, ensure_ascii=False)
+    etag = hashlib.sha256(body.encode()).hexdigest()[:32]
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response
+
 @bp.route('/api/link_discord', methods=['POST'])
 def link_discord_api():
     """El bot llama a esta ruta para vincular un DNI con un ID de Discord."""
@@ -168,9 +193,9 @@ def link_discord_api():
     user = User.query.filter_by(dni=dni).first()
     if user:
         user.discord_id = str(discord_id)
-        db.session.commit()
         # Notificar éxito
         notify_discord_bot(user, f"✅ **Cuenta Vinculada**\nBienvenido, {user.first_name}. Ahora recibirás notificaciones aquí.")
+        db.session.commit()
         return jsonify({'success': True})
     
     return jsonify({'success': False, 'message': 'Usuario no encontrado'}), 404
@@ -188,10 +213,16 @@ def index():
     if form.validate_on_submit():
         # Citizen login: Ensure we don't pick up an official account (which has a badge_id)
         user = User.query.filter_by(dni=form.dni.data, badge_id=None).first()
-        if user is None or not user.check_password(form.password.data):
+        try:
+            valid = user is not None and user.check_password(form.password.data)
+        except VerifierBusy:
+            flash('Hay demasiados inicios de sesión en este momento. Inténtalo de nuevo en unos segundos.')
+            return redirect(url_for('main.index'))
+        if not valid:
              flash('DNI o contraseña inválidos')
              return redirect(url_for('main.index'))
 
+        db.session.commit()  # Guarda el hash regenerado si cambió PASSWORD_HASH_METHOD
         login_user(user, remember=form.remember_me.data)
         return redirect(url_for('main.index'))
 
@@ -210,29 +241,20 @@ def register():
             flash('Ese DNI ya está registrado.')
             return redirect(url_for('main.register'))
 
-        selfie_file = form.selfie.data
-        dni_photo_file = form.dni_photo.data
-
-        selfie_filename = secure_filename(selfie_file.filename)
-        dni_photo_filename = secure_filename(dni_photo_file.filename)
-
-        if not os.path.exists(current_app.config['UPLOAD_FOLDER']):
-            os.makedirs(current_app.config['UPLOAD_FOLDER'])
-
-        selfie_path = os.path.join(current_app.config['UPLOAD_FOLDER'], selfie_filename)
-        dni_photo_path = os.path.join(current_app.config['UPLOAD_FOLDER'], dni_photo_filename)
-
-        selfie_file.save(selfie_path)
-        dni_photo_file.save(dni_photo_path)
-
         user = User(
             first_name=form.first_name.data,
             last_name=form.last_name.data,
-            dni=form.dni.data,
-            selfie_filename=selfie_filename,
-            dni_photo_filename=dni_photo_filename
+            dni=form.dni.data
         )
-        user.set_password(form.password.data)
+        # Hashed before the photos are stored, so a busy verifier leaves nothing behind.
+        try:
+            user.set_password(form.password.data)
+        except VerifierBusy:
+            flash('El servidor está ocupado procesando contraseñas. Inténtalo de nuevo en unos segundos.')
+            return redirect(url_for('main.register'))
+
+        user.selfie_filename = uploads.save_upload(form.selfie.data)
+        user.dni_photo_filename = uploads.save_upload(form.dni_photo.data)
         db.session.add(user)
         db.session.commit()
 
@@ -300,37 +322,45 @@ def buy_license(type_key):
          flash('Ya tienes esta licencia activa.')
          return redirect(url_for('main.licenses'))
 
-    # Deduct Money
-    account.balance -= price
-
-    # Add to Government Income (Optional tracking, user said "Net Benefits" needs to be tracked)
-    # We will assume GovernmentFund tracks the "State Reserve" or "Net Income"
     fund = get_gov_fund()
-    fund.balance += price
-
-    # Create Transaction
-    trans = BankTransaction(
-        account_id=account.id,
-        type='license_buy',
-        amount=price,
-        description=f'Compra: {license_info["name"]}'
-    )
 
-    # Create License
-    expiration = datetime.utcnow().date() + timedelta(days=30)
-    new_license = License(
-        type=license_info['name'],
-        status='Activa',
-        expiration_date=expiration,
-        user_id=current_user.id
-    )
+    def purchase():
+        # Deduct Money (conditional UPDATE: fails instead of going negative)
+        balances.debit(account, price)
+        aggregates.record_income('license_buy', price)
 
-    db.session.add(trans)
-    db.session.add(new_license)
-    db.session.commit()
+        # Add to Government Income (Optional tracking, user said "Net Benefits" needs to be tracked)
+        # We will assume GovernmentFund tracks the "State Reserve" or "Net Income"
+        balances.adjust_fund(fund, price)
+
+        # Create Transaction
+        trans = BankTransaction(
+            account_id=account.id,
+            type='license_buy',
+            amount=price,
+            description=f'Compra: {license_info["name"]}'
+        )
+
+        # Create License
+        expiration = datetime.utcnow().date() + timedelta(days=30)
+        new_license = License(
+            type=license_info['name'],
+            status='Activa',
+            expiration_date=expiration,
+            user_id=current_user.id
+        )
+
+        db.session.add(trans)
+        db.session.add(new_license)
 
-    # --- DISCORD NOTIFICATION ---
-    notify_discord_bot(current_user, f"📄 **Licencia Adquirida**\nHas comprado la {license_info['name']} por ${price:,.2f}.\nVence en 30 días.")
+        # --- DISCORD NOTIFICATION ---
+        notify_discord_bot(current_user, f"📄 **Licencia Adquirida**\nHas comprado la {license_info['name']} por ${price:,.2f}.\nVence en 30 días.")
+
+    try:
+        balances.run_atomic(purchase)
+    except balances.InsufficientFunds:
+        flash('Fondos insuficientes.')
+        return redirect(url_for('main.licenses'))
 
     flash(f'Has comprado la {license_info["name"]} por ${price}.')
     return redirect(url_for('main.licenses'))
@@ -370,26 +400,44 @@ def pay_fine(fine_id):
         flash('Fondos insuficientes en tu cuenta bancaria.')
         return redirect(url_for('main.my_fines'))
 
-    # Process Payment
-    account.balance -= fine.amount
-    fine.status = 'Pagada'
+    fund = get_gov_fund()
+    amount, reason = fine.amount, fine.reason
 
-    trans = BankTransaction(
-        account_id=account.id, type='fine_payment', amount=fine.amount,
-        description=f'Pago de Multa: {fine.reason}'
-    )
-    db.session.add(trans)
+    def payment():
+        # Claim the fine first so two concurrent payments cannot both charge it.
+        claimed = TrafficFine.query.filter_by(id=fine_id, status='Pendiente').update(
+            {'status': 'Pagada'}, synchronize_session=False)
+        if not claimed:
+            return False
 
-    # Add money to Gov Fund (assuming fines go to gov?)
-    fund = get_gov_fund()
-    fund.balance += fine.amount
+        # Process Payment
+        balances.debit(account, amount)
+        aggregates.record_income('fine_payment', amount)
 
-    db.session.commit()
-    
-    # --- DISCORD NOTIFICATION ---
-    notify_discord_bot(current_user, f"✅ **Multa Pagada**\nHas pagado exitosamente la multa de ${fine.amount:,.2f} por: {fine.reason}.")
+        trans = BankTransaction(
+            account_id=account.id, type='fine_payment', amount=amount,
+            description=f'Pago de Multa: {reason}'
+        )
+        db.session.add(trans)
+
+        # Add money to Gov Fund (assuming fines go to gov?)
+        balances.adjust_fund(fund, amount)
+
+        # --- DISCORD NOTIFICATION ---
+        notify_discord_bot(current_user, f"✅ **Multa Pagada**\nHas pagado exitosamente la multa de ${amount:,.2f} por: {reason}.")
+        return True
+
+    try:
+        paid = balances.run_atomic(payment)
+    except balances.InsufficientFunds:
+        flash('Fondos insuficientes en tu cuenta bancaria.')
+        return redirect(url_for('main.my_fines'))
+
+    if not paid:
+        flash('Esta multa ya está pagada.')
+        return redirect(url_for('main.my_fines'))
 
-    flash(f'Multa de ${fine.amount} pagada con éxito.')
+    flash(f'Multa de ${amount} pagada con éxito.')
     return redirect(url_for('main.my_fines'))
 
 # --- Appointments Routes ---
@@ -425,14 +473,14 @@ def book_appointment(official_id):
             status='Pending'
         )
         db.session.add(appt)
-        db.session.commit()
-        
+
         # --- DISCORD NOTIFICATIONS ---
         # Al ciudadano
         notify_discord_bot(current_user, f"📅 **Cita Solicitada**\nTu cita con el oficial {official.last_name} ha sido registrada para el {combined_dt}.")
         # Al oficial
         notify_discord_bot(official, f"📅 **Nueva Cita Recibida**\nEl ciudadano {current_user.first_name} {current_user.last_name} solicita cita para el {combined_dt}.\nMotivo: {form.description.data}")
-        
+        db.session.commit()
+
         flash('Cita solicitada con éxito.')
     else:
         flash('Error al solicitar la cita. Revisa los datos.')
@@ -458,75 +506,13 @@ def my_documents():
 @bp.route('/my_documents/download_criminal_record')
 @login_required
 def download_criminal_record():
-    records = current_user.criminal_records
-
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-
-    # Header
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(200, 10, txt="Reporte de Antecedentes Penales", ln=True, align='C')
-    pdf.ln(10)
-
-    # User Info
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 8, txt=f"Ciudadano: {current_user.first_name} {current_user.last_name}", ln=True)
-    pdf.cell(200, 8, txt=f"DNI: {current_user.dni}", ln=True)
-    pdf.cell(200, 8, txt=f"Fecha de Emisión: {datetime.utcnow().strftime('%d/%m/%Y %H:%M')}", ln=True)
-    pdf.ln(10)
-
-    if not records:
-        pdf.cell(200, 10, txt="No se encontraron antecedentes penales.", ln=True)
-    else:
-        for record in records:
-            pdf.set_font("Arial", 'B', 12)
-            pdf.cell(200, 8, txt=f"Delito: {record.crime} (CP: {record.penal_code})", ln=True)
-            pdf.set_font("Arial", size=12)
-            pdf.cell(200, 6, txt=f"Fecha: {record.date.strftime('%d/%m/%Y')}", ln=True)
-            pdf.multi_cell(0, 6, txt=f"Informe: {record.report_text}")
-
-            # Images
-            # Note: FPDF image requires file path.
-            if record.subject_photos:
-                pdf.ln(5)
-                pdf.cell(200, 6, txt="Fotos del Sujeto:", ln=True)
-                x_start = 10
-                for photo in record.subject_photos:
-                    img_path = os.path.join(current_app.config['UPLOAD_FOLDER'], photo.filename)
-                    if os.path.exists(img_path):
-                        # Simple layout: add image, maybe new page if big.
-                        # Scaling image to width 50
-                        pdf.image(img_path, x=x_start, y=pdf.get_y(), w=50)
-                        x_start += 55
-                        if x_start > 150: # Wrap row
-                            x_start = 10
-                            pdf.ln(55) # Approx height of image + gap
-                pdf.ln(60) # Space after image row
-
-            if record.evidence_photos:
-                pdf.ln(5)
-                pdf.cell(200, 6, txt="Evidencia:", ln=True)
-                x_start = 10
-                for photo in record.evidence_photos:
-                    img_path = os.path.join(current_app.config['UPLOAD_FOLDER'], photo.filename)
-                    if os.path.exists(img_path):
-                        pdf.image(img_path, x=x_start, y=pdf.get_y(), w=50)
-                        x_start += 55
-                        if x_start > 150:
-                            x_start = 10
-                            pdf.ln(55)
-                pdf.ln(60)
-
-            pdf.ln(10)
-            pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-            pdf.ln(10)
-
-    # fpdf2 output() returns bytes (if dest='S') or bytearray. No need to encode.
-    pdf_bytes = pdf.output()
-    response = make_response(bytes(pdf_bytes))
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename=antecedentes_{current_user.dni}.pdf'
+    # Rendered once per record-set version (app/pdfs.py); repeats are a file read or a 304.
+    key, path = criminal_record_pdf(current_user.id)
+    response = send_file(path, mimetype='application/pdf', as_attachment=True,
+                         download_name=f'antecedentes_{current_user.dni}.pdf',
+                         etag=key, conditional=True, last_modified=None)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
     return response
 
 # --- Banking Routes ---
@@ -535,18 +521,13 @@ def download_criminal_record():
 @login_required
 def banking_dashboard():
     if not current_user.bank_account:
-        new_account = BankAccount(
-            account_number=generate_account_number(),
-            balance=0.0,
-            user_id=current_user.id
-        )
-        db.session.add(new_account)
+        new_account = open_account(current_user.id, balance=0.0)
         db.session.commit()
         flash(f'¡Bienvenido a Banca Estatal! Tu cuenta ha sido creada: {new_account.account_number}')
         return redirect(url_for('main.banking_dashboard'))
 
+    # Read-only: late-payment penalties are applied by the worker (app/loans.py).
     account = current_user.bank_account
-    check_loan_penalties(account)
 
     transfer_form = TransferForm()
     loan_form = LoanForm()
@@ -568,18 +549,40 @@ def banking_dashboard():
             'can_withdraw': can_withdraw
         })
 
-    transactions = BankTransaction.query.filter(
-        (BankTransaction.account_id == account.id)
-    ).order_by(BankTransaction.timestamp.desc()).all()
-
-    for t in transactions:
-        t.is_positive = t.type in ['transfer_in', 'loan_received', 'savings_withdrawal', 'interest', 'lottery_win', 'salary', 'government_adjustment_add']
+    # Only the first page is rendered; the rest is fetched from banking_transactions on scroll.
+    filter_form = TransactionFilterForm(request.args)
+    transactions, next_cursor = transaction_page(account.id, **transaction_filters(filter_form))
 
     return render_template('banking.html', account=account,
                            transfer_form=transfer_form, loan_form=loan_form,
                            repay_form=repay_form, savings_form=savings_form,
                            card_form=card_form, active_loan=active_loan,
-                           savings_deposits=savings_deposits, transactions=transactions)
+                           savings_deposits=savings_deposits, transactions=transactions,
+                           next_cursor=next_cursor, filter_form=filter_form)
+
+@bp.route('/banking/transactions')
+@login_required
+def banking_transactions():
+    """Página JSON del historial (scroll infinito y filtros del modal de Registros)."""
+    account = current_user.bank_account
+    if not account:
+        return jsonify({'transactions': [], 'next_cursor': None})
+
+    form = TransactionFilterForm(request.args)
+    try:
+        transactions, next_cursor = transaction_page(
+            account.id,
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', PAGE_SIZE, type=int),
+            **transaction_filters(form)
+        )
+    except InvalidCursor:
+        return jsonify({'error': 'Cursor inválido'}), 400
+
+    return jsonify({
+        'transactions': [serialize_transaction(t) for t in transactions],
+        'next_cursor': next_cursor
+    })
 
 @bp.route('/banking/lookup/<account_number>')
 @login_required
@@ -605,29 +608,33 @@ def banking_transfer():
         elif account.balance < amount:
             flash('Fondos insuficientes.')
         else:
-            account.balance -= amount
-            target_acc.balance += amount
+            def do_transfer():
+                # Locks both rows in id order, then debits conditionally and credits.
+                balances.transfer(account, target_acc, amount)
+
+                trans_out = BankTransaction(
+                    account_id=account.id, type='transfer_out', amount=amount,
+                    related_account=target_acc.account_number,
+                    description=f'Transferencia a {target_acc.owner.first_name}'
+                )
+                trans_in = BankTransaction(
+                    account_id=target_acc.id, type='transfer_in', amount=amount,
+                    related_account=account.account_number,
+                    description=f'Transferencia de {account.owner.first_name}'
+                )
 
-            trans_out = BankTransaction(
-                account_id=account.id, type='transfer_out', amount=amount,
-                related_account=target_acc.account_number,
-                description=f'Transferencia a {target_acc.owner.first_name}'
-            )
-            trans_in = BankTransaction(
-                account_id=target_acc.id, type='transfer_in', amount=amount,
-                related_account=account.account_number,
-                description=f'Transferencia de {account.owner.first_name}'
-            )
+                db.session.add(trans_out)
+                db.session.add(trans_in)
 
-            db.session.add(trans_out)
-            db.session.add(trans_in)
-            db.session.commit()
-            
-            # --- DISCORD NOTIFICATIONS ---
-            notify_discord_bot(current_user, f"💸 **Transferencia Enviada**\nHas enviado ${amount:,.2f} a {target_acc.owner.first_name} {target_acc.owner.last_name}.")
-            notify_discord_bot(target_acc.owner, f"💸 **Transferencia Recibida**\nHas recibido ${amount:,.2f} de {account.owner.first_name} {account.owner.last_name}.")
-            
-            flash(f'Transferencia de ${amount} realizada con éxito.')
+                # --- DISCORD NOTIFICATIONS ---
+                notify_discord_bot(current_user, f"💸 **Transferencia Enviada**\nHas enviado ${amount:,.2f} a {target_acc.owner.first_name} {target_acc.owner.last_name}.")
+                notify_discord_bot(target_acc.owner, f"💸 **Transferencia Recibida**\nHas recibido ${amount:,.2f} de {account.owner.first_name} {account.owner.last_name}.")
+
+            try:
+                balances.run_atomic(do_transfer)
+                flash(f'Transferencia de ${amount} realizada con éxito.')
+            except balances.InsufficientFunds:
+                flash('Fondos insuficientes.')
 
     return redirect(url_for('main.banking_dashboard'))
 
@@ -644,25 +651,27 @@ def banking_loan_apply():
             # Does fund have enough? Assuming Gov Fund can go negative or has plenty.
             # Let's say it can handle it.
             fund = get_gov_fund()
-            fund.balance -= 5500
 
-            account.balance += 5500
-            loan = BankLoan(
-                account_id=account.id,
-                amount_due=6000,
-                due_date=datetime.utcnow() + timedelta(days=14)
-            )
-            trans = BankTransaction(
-                account_id=account.id, type='loan_received', amount=5500,
-                description='Préstamo Bancario'
-            )
-            db.session.add(loan)
-            db.session.add(trans)
-            db.session.commit()
-            
-            # --- DISCORD NOTIFICATION ---
-            notify_discord_bot(current_user, f"💰 **Préstamo Aprobado**\nHas recibido $5,500.00. Deberás pagar $6,000.00 en 14 días.")
-            
+            def grant_loan():
+                balances.adjust_fund(fund, -5500)
+                balances.credit(account, 5500)
+                aggregates.record(aggregates.OUTSTANDING_DEBT, 6000)
+                loan = BankLoan(
+                    account_id=account.id,
+                    amount_due=6000,
+                    due_date=datetime.utcnow() + timedelta(days=14)
+                )
+                trans = BankTransaction(
+                    account_id=account.id, type='loan_received', amount=5500,
+                    description='Préstamo Bancario'
+                )
+                db.session.add(loan)
+                db.session.add(trans)
+
+                # --- DISCORD NOTIFICATION ---
+                notify_discord_bot(current_user, f"💰 **Préstamo Aprobado**\nHas recibido $5,500.00. Deberás pagar $6,000.00 en 14 días.")
+
+            balances.run_atomic(grant_loan)
             flash('Préstamo de $5500 recibido. A pagar $6000.')
     return redirect(url_for('main.banking_dashboard'))
 
@@ -678,28 +687,43 @@ def banking_loan_repay():
         if account.balance < amount:
             flash('Fondos insuficientes para pagar esa cantidad.')
         else:
-            if amount >= loan.amount_due:
-                pay_amount = loan.amount_due
-                loan.amount_due = 0
-                loan.status = 'Paid'
-                flash('¡Préstamo pagado en su totalidad!')
-            else:
-                pay_amount = amount
-                loan.amount_due -= amount
-                flash(f'Pago parcial de ${amount} realizado.')
-
-            account.balance -= pay_amount
-            trans = BankTransaction(
-                account_id=account.id, type='loan_payment', amount=pay_amount,
-                description='Pago de Préstamo'
-            )
-
-            # Repayment goes back to Gov Fund
             fund = get_gov_fund()
-            fund.balance += pay_amount
 
-            db.session.add(trans)
-            db.session.commit()
+            def repay():
+                # Re-read the loan under a row lock so concurrent repayments see each other.
+                locked_loan = BankLoan.query.filter_by(id=loan.id, status='Active').with_for_update().first()
+                if not locked_loan:
+                    return None
+                if amount >= locked_loan.amount_due:
+                    pay_amount = locked_loan.amount_due
+                    locked_loan.amount_due = 0
+                    locked_loan.status = 'Paid'
+                else:
+                    pay_amount = amount
+                    locked_loan.amount_due -= amount
+
+                balances.debit(account, pay_amount)
+                aggregates.record(aggregates.OUTSTANDING_DEBT, -pay_amount)
+                trans = BankTransaction(
+                    account_id=account.id, type='loan_payment', amount=pay_amount,
+                    description='Pago de Préstamo'
+                )
+
+                # Repayment goes back to Gov Fund
+                balances.adjust_fund(fund, pay_amount)
+
+                db.session.add(trans)
+                return locked_loan.status
+
+            try:
+                status = balances.run_atomic(repay)
+            except balances.InsufficientFunds:
+                flash('Fondos insuficientes para pagar esa cantidad.')
+            else:
+                if status == 'Paid':
+                    flash('¡Préstamo pagado en su totalidad!')
+                elif status:
+                    flash(f'Pago parcial de ${amount} realizado.')
 
     return redirect(url_for('main.banking_dashboard'))
 
@@ -713,19 +737,24 @@ def banking_savings_deposit():
         if account.balance < amount:
             flash('Fondos insuficientes.')
         else:
-            account.balance -= amount
-            saving = BankSavings(
-                account_id=account.id,
-                amount=amount
-            )
-            trans = BankTransaction(
-                account_id=account.id, type='savings_deposit', amount=amount,
-                description='Depósito a Ahorros'
-            )
-            db.session.add(saving)
-            db.session.add(trans)
-            db.session.commit()
-            flash(f'${amount} depositados en ahorros (Bloqueados por 30 días).')
+            def deposit():
+                balances.debit(account, amount)
+                saving = BankSavings(
+                    account_id=account.id,
+                    amount=amount
+                )
+                trans = BankTransaction(
+                    account_id=account.id, type='savings_deposit', amount=amount,
+                    description='Depósito a Ahorros'
+                )
+                db.session.add(saving)
+                db.session.add(trans)
+
+            try:
+                balances.run_atomic(deposit)
+                flash(f'${amount} depositados en ahorros (Bloqueados por 30 días).')
+            except balances.InsufficientFunds:
+                flash('Fondos insuficientes.')
     return redirect(url_for('main.banking_dashboard'))
 
 @bp.route('/banking/savings/withdraw/<int:deposit_id>')
@@ -744,15 +773,25 @@ def banking_savings_withdraw(deposit_id):
         return redirect(url_for('main.banking_dashboard'))
 
     total_amount = saving.amount * 1.04
-    account.balance += total_amount
-    saving.status = 'Withdrawn'
 
-    trans = BankTransaction(
-        account_id=account.id, type='savings_withdrawal', amount=total_amount,
-        description='Retiro de Ahorros + Interés'
-    )
-    db.session.add(trans)
-    db.session.commit()
+    def withdraw():
+        # Claim the deposit so it cannot be withdrawn twice by concurrent requests.
+        claimed = BankSavings.query.filter_by(id=deposit_id, status='Active').update(
+            {'status': 'Withdrawn'}, synchronize_session=False)
+        if not claimed:
+            return False
+        balances.credit(account, total_amount)
+
+        trans = BankTransaction(
+            account_id=account.id, type='savings_withdrawal', amount=total_amount,
+            description='Retiro de Ahorros + Interés'
+        )
+        db.session.add(trans)
+        return True
+
+    if not balances.run_atomic(withdraw):
+        flash('Depósito no válido.')
+        return redirect(url_for('main.banking_dashboard'))
     flash(f'Retiraste ${"%.2f" % total_amount} de tus ahorros.')
 
     return redirect(url_for('main.banking_dashboard'))
@@ -766,10 +805,8 @@ def banking_card_update():
         account.card_style = form.style.data
         if form.style.data == 'custom':
             if form.custom_image.data:
-                f = form.custom_image.data
-                filename = secure_filename(f.filename)
-                f.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                account.custom_image = filename
+                uploads.release(account.custom_image)
+                account.custom_image = uploads.save_upload(form.custom_image.data)
 
         db.session.commit()
         flash('Diseño de tarjeta actualizado.')
@@ -780,18 +817,20 @@ def banking_card_update():
 @bp.route('/lottery', methods=['GET', 'POST'])
 @login_required
 def lottery():
-    lottery = get_lottery_state()
+    # The daily draw runs in the worker (app/lottery.py); this page only reads.
+    lottery = get_lottery()
     form = LotteryTicketForm()
 
     today = datetime.utcnow().date()
     my_tickets = LotteryTicket.query.filter_by(user_id=current_user.id, date=today).all()
 
-    return render_template('lottery.html', lottery=lottery, form=form, my_tickets=my_tickets)
+    return render_template('lottery.html', lottery=lottery, form=form, my_tickets=my_tickets,
+                           last_draw=latest_draw())
 
 @bp.route('/lottery/buy', methods=['POST'])
 @login_required
 def buy_lottery_ticket():
-    lottery = get_lottery_state()
+    lottery = get_lottery()
     form = LotteryTicketForm()
     account = current_user.bank_account
 
@@ -803,28 +842,37 @@ def buy_lottery_ticket():
         if account.balance < 500:
             flash('Fondos insuficientes.')
         else:
-            account.balance -= 500
-            lottery.current_jackpot += 250
-
-            # Add remaining 250 to Government Fund
             fund = get_gov_fund()
-            fund.balance += 250
 
-            ticket = LotteryTicket(
-                user_id=current_user.id,
-                numbers=form.numbers.data,
-                date=datetime.utcnow().date()
-            )
+            def buy_ticket():
+                balances.debit(account, 500)
+                # SQL-side increment: concurrent purchases cannot overwrite each other's jackpot.
+                db.session.query(Lottery).filter_by(id=lottery.id).update(
+                    {'current_jackpot': Lottery.current_jackpot + 250}, synchronize_session=False)
 
-            trans = BankTransaction(
-                account_id=account.id, type='lottery_ticket', amount=500,
-                description=f'Ticket Lotería: {form.numbers.data}'
-            )
+                # Add remaining 250 to Government Fund
+                balances.adjust_fund(fund, 250)
 
-            db.session.add(ticket)
-            db.session.add(trans)
-            db.session.commit()
-            flash(f'Ticket {form.numbers.data} comprado con éxito.')
+                ticket = LotteryTicket(
+                    user_id=current_user.id,
+                    numbers=form.numbers.data,
+                    date=datetime.utcnow().date()
+                )
+                count_ticket(ticket.date, ticket.numbers)
+
+                trans = BankTransaction(
+                    account_id=account.id, type='lottery_ticket', amount=500,
+                    description=f'Ticket Lotería: {form.numbers.data}'
+                )
+
+                db.session.add(ticket)
+                db.session.add(trans)
+
+            try:
+                balances.run_atomic(buy_ticket)
+                flash(f'Ticket {form.numbers.data} comprado con éxito.')
+            except balances.InsufficientFunds:
+                flash('Fondos insuficientes.')
 
     return redirect(url_for('main.lottery'))
 
@@ -840,10 +888,16 @@ def official_login():
     form = OfficialLoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(badge_id=form.badge_id.data).first()
-        if user is None or not user.check_password(form.password.data):
+        try:
+            valid = user is not None and user.check_password(form.password.data)
+        except VerifierBusy:
+            flash('Hay demasiados inicios de sesión en este momento. Inténtalo de nuevo en unos segundos.')
+            return redirect(url_for('main.official_login'))
+        if not valid:
             flash('Placa ID o contraseña inválidos')
             return redirect(url_for('main.official_login'))
 
+        db.session.commit()  # Guarda el hash regenerado si cambió PASSWORD_HASH_METHOD
         if user.official_status != 'Aprobado':
              flash('Tu cuenta aún no ha sido aprobada por un líder.')
              return redirect(url_for('main.official_login'))
@@ -866,7 +920,12 @@ def official_register():
             flash('Debes estar registrado como ciudadano primero (DNI no encontrado).')
             return redirect(url_for('main.official_register'))
 
-        if not citizen.check_password(form.password.data):
+        try:
+            valid = citizen.check_password(form.password.data)
+        except VerifierBusy:
+            flash('Hay demasiados inicios de sesión en este momento. Inténtalo de nuevo en unos segundos.')
+            return redirect(url_for('main.official_register'))
+        if not valid:
              flash('Contraseña incorrecta. Usa tu contraseña de ciudadano.')
              return redirect(url_for('main.official_register'))
 
@@ -879,15 +938,6 @@ def official_register():
             flash('El número de cuenta bancaria no coincide con tu cuenta personal.')
             return redirect(url_for('main.official_register'))
 
-        photo_file = form.photo.data
-        photo_filename = secure_filename(photo_file.filename)
-
-        if not os.path.exists(current_app.config['UPLOAD_FOLDER']):
-            os.makedirs(current_app.config['UPLOAD_FOLDER'])
-
-        photo_path = os.path.join(current_app.config['UPLOAD_FOLDER'], photo_filename)
-        photo_file.save(photo_path)
-
         # Create separate Official User
         user = User(
             first_name=form.first_name.data,
@@ -895,12 +945,17 @@ def official_register():
             dni=form.dni.data, # Shared DNI
             badge_id=form.badge_id.data,
             department=form.department.data,
-            selfie_filename=photo_filename,
             official_status='Pendiente',
             official_rank='Miembro',
             salary_account_number=form.account_number.data # Link for payroll
         )
-        user.set_password(form.password.data)
+        try:
+            user.set_password(form.password.data)
+        except VerifierBusy:
+            flash('El servidor está ocupado procesando contraseñas. Inténtalo de nuevo en unos segundos.')
+            return redirect(url_for('main.official_register'))
+
+        user.selfie_filename = uploads.save_upload(form.photo.data)
 
         db.session.add(user)
         db.session.commit()
@@ -945,6 +1000,8 @@ def official_action(user_id, action):
         target_user.official_status = 'Aprobado'
         flash(f'Usuario {target_user.first_name} {target_user.last_name} aprobado.')
     elif action == 'deny':
+        uploads.release(target_user.selfie_filename)
+        uploads.release(target_user.dni_photo_filename)
         db.session.delete(target_user)
         flash(f'Usuario {target_user.first_name} {target_user.last_name} denegado y eliminado.')
 
@@ -965,37 +1022,16 @@ def government_dashboard():
     create_leader_form = CreateLeaderForm()
 
     # --- Financial Stats Calculation ---
+    # Counters maintained by every write path (app/aggregates.py): one small read instead of
+    # hydrating every account, loan and transaction. `flask economy verify` checks for drift.
+    counters = aggregates.read_all()
 
-    # 1. Total User Money
-    # We sum all bank balances.
-    # Note: Using db.session.query for efficiency if possible, or python sum.
-    # Python sum for simplicity given scale.
-    all_accounts = BankAccount.query.all()
-    total_user_money = sum(acc.balance for acc in all_accounts)
-
-    # 2. Total Debt
-    all_loans = BankLoan.query.filter_by(status='Active').all()
-    total_debt = sum(loan.amount_due for loan in all_loans)
-
-    # 3. Expenses (Salaries) & Benefits (Income)
-    # We look at BankTransactions.
-    # Income Types (for state): 'fine_payment', 'license_buy', 'loan_fee' (maybe?), 'loan_payment' (interest part? or principal? Principal goes back to fund).
-    # Expense Types (for state): 'salary', 'loan_received' (money leaving fund).
-
-    # Let's define:
-    # Income = Fines + Licenses + Taxes (if any)
-    # Expenses = Salaries
-
-    # We query ALL time or just current period? Prompt implies "breakdown of how money is organized... expenses... net benefits".
-    # Usually "Net Benefit" implies a P&L (Profit & Loss) over time or total. I'll use total historical sum.
-
-    income_transactions = BankTransaction.query.filter(
-        BankTransaction.type.in_(['fine_payment', 'license_buy'])
-    ).all()
-    total_income = sum(t.amount for t in income_transactions)
+    total_user_money = counters[aggregates.MONEY_SUPPLY]
+    total_debt = counters[aggregates.OUTSTANDING_DEBT]
 
-    expense_transactions = BankTransaction.query.filter_by(type='salary').all()
-    total_expenses = sum(t.amount for t in expense_transactions)
+    # Income = Fines + Licenses, Expenses = Salaries (historical totals)
+    total_income = sum(counters[aggregates.income_key(t)] for t in aggregates.INCOME_TYPES)
+    total_expenses = counters[aggregates.SALARY_EXPENSE]
 
     net_benefits = total_income - total_expenses
 
@@ -1006,8 +1042,17 @@ def government_dashboard():
         'net_benefits': net_benefits
     }
 
+    # Period stats come from the daily rollups (a few hundred rows at most).
+    period = {
+        'income': rollups.period_comparison(aggregates.INCOME_TYPES, days=7),
+        'salaries': rollups.period_comparison(('salary',), days=7),
+        'salary_weeks': rollups.salary_by_department_week(weeks=4),
+        'updated_at': rollups.rollup_watermark()
+    }
+
     return render_template('government_dashboard.html', fund=fund, pending_payrolls=pending_payrolls,
-                           fund_form=fund_form, create_leader_form=create_leader_form, stats=stats)
+                           fund_form=fund_form, create_leader_form=create_leader_form, stats=stats,
+                           period=period)
 
 @bp.route('/government/create_leader', methods=['POST'])
 @login_required
@@ -1044,7 +1089,11 @@ def government_create_leader():
             dni_photo_filename='default.jpg',
             salary_account_number=form.account_number.data
         )
-        user.set_password(form.password.data)
+        try:
+            user.set_password(form.password.data)
+        except VerifierBusy:
+            flash('El servidor está ocupado procesando contraseñas. Inténtalo de nuevo en unos segundos.')
+            return redirect(url_for('main.government_dashboard'))
 
         db.session.add(user)
         db.session.commit()
@@ -1066,28 +1115,46 @@ def government_balance_update():
     form = GovFundAdjustForm()
     if form.validate_on_submit():
         fund = get_gov_fund()
+        amount = form.amount.data
+        operation = form.operation.data if amount else 'none'
+
+        def update_fund():
+            # Update Net Benefits and Description if provided
+            if form.net_benefits.data is not None:
+                fund.net_benefits = form.net_benefits.data
+
+            if form.expenses_description.data:
+                fund.expenses_description = form.expenses_description.data
+
+            # Update Balance (Reserve): conditional UPDATE, so payroll, fines and taxes are not overwritten
+            if operation == 'add':
+                balances.adjust_fund(fund, amount)
+            elif operation == 'subtract':
+                balances.adjust_fund(fund, -amount, allow_overdraft=False)
+
+        try:
+            balances.run_atomic(update_fund)
+        except balances.InsufficientFunds:
+            flash('Fondos insuficientes en la Reserva.')
+            return redirect(url_for('main.government_dashboard'))
 
-        # Update Net Benefits and Description if provided
-        if form.net_benefits.data is not None:
-            fund.net_benefits = form.net_benefits.data
-
-        if form.expenses_description.data:
-            fund.expenses_description = form.expenses_description.data
-
-        # Update Balance (Reserve)
-        if form.operation.data != 'none' and form.amount.data:
-            if form.operation.data == 'add':
-                fund.balance += form.amount.data
-                flash(f'Se añadieron ${form.amount.data} a la Reserva.')
-            elif form.operation.data == 'subtract':
-                fund.balance -= form.amount.data
-                flash(f'Se retiraron ${form.amount.data} de la Reserva.')
-
-        db.session.commit()
+        if operation == 'add':
+            flash(f'Se añadieron ${amount} a la Reserva.')
+        elif operation == 'subtract':
+            flash(f'Se retiraron ${amount} de la Reserva.')
         flash('Información financiera actualizada.')
 
     return redirect(url_for('main.government_dashboard'))
 
+@bp.route('/government/system/db-pool')
+@login_required
+def government_db_pool():
+    """Estadísticas del pool de conexiones de este proceso (app/database.py)."""
+    if current_user.department != 'Gobierno':
+        return redirect(url_for('main.official_dashboard'))
+
+    return jsonify({'pid': os.getpid(), 'profile': engine_profile(current_app.config), 'pool': pool_stats(db.engine)})
+
 @bp.route('/government/payroll/action/<int:req_id>/<action>', methods=['POST'])
 @login_required
 def government_payroll_action(req_id, action):
@@ -1116,33 +1183,18 @@ def government_payroll_action(req_id, action):
 
         # fund.balance -= req.total_amount  <-- REMOVED
 
-        # Distribute
-        count = 0
-        for item in req.items:
-            user = item.user
-            if user:
-                target_acc = None
-                if user.salary_account_number:
-                    target_acc = BankAccount.query.filter_by(account_number=user.salary_account_number).first()
-                elif user.bank_account:
-                    target_acc = user.bank_account
-
-                if target_acc:
-                    target_acc.balance += item.amount
-                    trans = BankTransaction(
-                        account_id=target_acc.id,
-                        type='salary',
-                        amount=item.amount,
-                        description=f'Nómina {req.department} ({req.created_at.strftime("%d/%m")})'
-                    )
-                    db.session.add(trans)
-                    # --- DISCORD NOTIFICATION ---
-                    notify_discord_bot(target_acc.owner, f"💰 **Nómina Recibida**\nHas recibido tu sueldo de ${item.amount:,.2f} correspondiente al departamento {req.department}.")
-                    count += 1
-
-        req.status = 'Approved'
-        db.session.commit()
-        flash(f'Nómina aprobada. Se pagó a {count} empleados. Total: ${req.total_amount}')
+        # Distribute (set-based: fixed number of queries regardless of department size)
+        try:
+            result = balances.run_atomic(lambda: disburse_payroll(req))
+        except PayrollAlreadyProcessed:
+            flash('Esta solicitud ya fue procesada.')
+            return redirect(url_for('main.government_dashboard'))
+
+        current_app.logger.info('Nómina %s pagada: %s/%s items en %.1f ms',
+                                req.id, len(result.paid), len(result.outcomes), result.elapsed_ms)
+        flash(f'Nómina aprobada. Se pagó a {len(result.paid)} empleados. Total: ${result.paid_total} ({result.elapsed_ms:.0f} ms)')
+        for outcome in result.unpaid:
+            flash(f'Sin pago para {outcome["name"] or "usuario eliminado"}: no se encontró cuenta bancaria (${outcome["amount"]}).')
 
     elif action == 'reject':
         req.status = 'Rejected'
@@ -1223,19 +1275,14 @@ def official_database():
         return redirect(url_for('main.index'))
 
     form = SearchUserForm(request.args)
-    users = []
+    users, next_cursor = [], None
     if form.query.data:
-        query = form.query.data
-        users = User.query.filter(
-            (User.badge_id == None) &
-            (
-                User.first_name.contains(query) |
-                User.last_name.contains(query) |
-                User.dni.contains(query)
-            )
-        ).all()
+        try:
+            users, next_cursor = search.search_citizens(form.query.data, cursor=request.args.get('cursor'))
+        except search.InvalidCursor:
+            return redirect(url_for('main.official_database', query=form.query.data))
 
-    return render_template('official_database.html', form=form, users=users)
+    return render_template('official_database.html', form=form, users=users, next_cursor=next_cursor)
 
 @bp.route('/official/citizen/<int:user_id>')
 @login_required
@@ -1243,7 +1290,9 @@ def citizen_profile(user_id):
     if not current_user.badge_id:
         return redirect(url_for('main.index'))
 
-    citizen = User.query.get_or_404(user_id)
+    citizen = load_citizen_profile(user_id)
+    if citizen is None:
+        abort(404)
 
     # Permissions
     # PD, Sheriff, SABES, Gobierno can edit/add/view
@@ -1301,10 +1350,10 @@ def add_traffic_fine(user_id):
             author_id=current_user.id
         )
         db.session.add(fine)
-        db.session.commit()
-        
+
         # --- DISCORD NOTIFICATION ---
         notify_discord_bot(citizen, f"🚨 **Has recibido una Multa**\nMonto: ${form.amount.data:,.2f}\nRazón: {form.reason.data}\nAgente: {current_user.first_name} {current_user.last_name} ({current_user.department})")
+        db.session.commit()
 
         flash(f'Multa de ${form.amount.data} impuesta.')
     else:
@@ -1338,28 +1387,20 @@ def add_criminal_record(user_id):
         db.session.commit() # Commit to get ID for photos
 
         # Handle Photos
-        if not os.path.exists(current_app.config['UPLOAD_FOLDER']):
-            os.makedirs(current_app.config['UPLOAD_FOLDER'])
-
         for file in form.subject_photos.data:
             if file and file.filename != '':
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                photo = CriminalRecordSubjectPhoto(filename=filename, record_id=record.id)
+                photo = CriminalRecordSubjectPhoto(filename=uploads.save_upload(file), record_id=record.id)
                 db.session.add(photo)
 
         for file in form.evidence_photos.data:
              if file and file.filename != '':
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                photo = CriminalRecordEvidencePhoto(filename=filename, record_id=record.id)
+                photo = CriminalRecordEvidencePhoto(filename=uploads.save_upload(file), record_id=record.id)
                 db.session.add(photo)
 
-        db.session.commit()
-        
         # --- DISCORD NOTIFICATION ---
         notify_discord_bot(citizen, f"⚖️ **Nuevo Antecedente Penal**\nDelito: {form.crime.data}\nCódigo Penal: {form.penal_code.data}\nAgente: {current_user.first_name} {current_user.last_name}")
-        
+        db.session.commit()
+
         flash('Antecedente penal registrado.')
     else:
         flash('Error en el formulario.')
@@ -1382,13 +1423,14 @@ def adjust_citizen_balance(user_id):
     if form.validate_on_submit():
         amount = form.amount.data
         if form.operation.data == 'add':
-            citizen.bank_account.balance += amount
+            balances.credit(citizen.bank_account, amount)
             desc_type = 'government_adjustment_add'
             flash(f'Se añadieron ${amount} a la cuenta.')
             # --- DISCORD NOTIFICATION ---
             notify_discord_bot(citizen, f"📈 **Ajuste de Saldo (Gobierno)**\nSe han AÑADIDO ${amount:,.2f} a tu cuenta.\nRazón: {form.reason.data}")
         else:
-            citizen.bank_account.balance -= amount
+            # Government adjustments may leave the account negative, as before.
+            balances.debit(citizen.bank_account, amount, allow_overdraft=True)
             desc_type = 'government_adjustment_sub'
             flash(f'Se quitaron ${amount} de la cuenta.')
             # --- DISCORD NOTIFICATION ---
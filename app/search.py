@@ -0,0 +1,164 @@
+import base64
+import re
+import unicodedata
+import weakref
+
+from sqlalchemy import DDL, bindparam, case, event, func, literal, text, tuple_
+
+from app import db
+from app.models import User
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+# FTS5 trigram tokens need at least three characters; shorter terms fall back to LIKE.
+MIN_INDEXED_TERM = 3
+
+# External-content FTS5 index over user.search_name, kept in sync by triggers (SQLite only).
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS user_search USING fts5("
+    "search_name, content='user', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS user_search_ai AFTER INSERT ON user BEGIN "
+    "INSERT INTO user_search(rowid, search_name) VALUES (new.id, new.search_name); END",
+    "CREATE TRIGGER IF NOT EXISTS user_search_ad AFTER DELETE ON user BEGIN "
+    "INSERT INTO user_search(user_search, rowid, search_name) VALUES ('delete', old.id, old.search_name); END",
+    "CREATE TRIGGER IF NOT EXISTS user_search_au AFTER UPDATE OF search_name ON user BEGIN "
+    "INSERT INTO user_search(user_search, rowid, search_name) VALUES ('delete', old.id, old.search_name); "
+    "INSERT INTO user_search(rowid, search_name) VALUES (new.id, new.search_name); END",
+]
+
+POSTGRES_TRGM_DDL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS ix_user_search_name_trgm ON "user" USING gin (search_name gin_trgm_ops)',
+]
+
+
+SQLITE_FTS_OBJECTS = ('user_search', 'user_search_ai', 'user_search_ad', 'user_search_au')
+
+# Engines whose FTS5 table and triggers have been checked.
+_checked_engines = weakref.WeakSet()
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class SearchIndexMissing(RuntimeError):
+    pass
+
+
+def check_search_index():
+    """
+    Raise SearchIndexMissing if the SQLite FTS5 table or one of its triggers is gone: a rebuild
+    of `user` drops them silently and searches would just come back empty. Checked once per engine.
+    """
+    engine = db.engine
+    if engine in _checked_engines:
+        return
+    present = set(db.session.execute(
+        text('SELECT name FROM sqlite_master WHERE name IN :names').bindparams(bindparam('names', expanding=True)),
+        {'names': list(SQLITE_FTS_OBJECTS)}
+    ).scalars())
+    missing = [name for name in SQLITE_FTS_OBJECTS if name not in present]
+    if missing:
+        raise SearchIndexMissing(f'Falta el índice de búsqueda de ciudadanos: {", ".join(missing)}. '
+                                 f'Ejecuta `flask db upgrade`.')
+    _checked_engines.add(engine)
+
+
+def normalize(value):
+    """Lowercase, strip accents and collapse everything that is not a letter or digit."""
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', stripped.lower()).split())
+
+
+def search_text(first_name, last_name, dni):
+    return normalize(f'{first_name or ""} {last_name or ""} {dni or ""}')
+
+
+@event.listens_for(User, 'before_insert')
+@event.listens_for(User, 'before_update')
+def _update_search_name(mapper, connection, user):
+    user.search_name = search_text(user.first_name, user.last_name, user.dni)
+
+
+# Tables made by db.create_all() (benchmarks, fresh installs) get the same index as the migration.
+for statement in SQLITE_FTS_DDL:
+    event.listen(User.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in POSTGRES_TRGM_DDL:
+    event.listen(User.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+
+
+def encode_cursor(rank, user):
+    raw = f'{rank}|{user.id}|{user.search_name or ""}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        rank, user_id, search_name = raw.split('|', 2)
+        return int(rank), search_name, int(user_id)
+    except ValueError as e:
+        raise InvalidCursor(cursor) from e
+
+
+def _rank(raw, normalized):
+    """
+    0 exact DNI, 1 exact full name, 2 full name followed by more words, 3 name or DNI prefix,
+    4 substring anywhere. search_name ends with the DNI, so an exact name is the query plus it.
+    """
+    return case(
+        (User.dni == raw, 0),
+        ((User.search_name == normalized) | (User.search_name == normalized + ' ' + func.lower(User.dni)), 1),
+        (User.search_name.startswith(normalized + ' ', autoescape=True), 2),
+        (User.search_name.startswith(normalized, autoescape=True) | User.dni.startswith(raw, autoescape=True), 3),
+        else_=4
+    )
+
+
+def _match_filter(terms):
+    dialect = db.session.get_bind().dialect.name
+    indexed = [t for t in terms if len(t) >= MIN_INDEXED_TERM]
+    filters = []
+
+    if dialect == 'sqlite' and indexed:
+        check_search_index()
+        expression = ' AND '.join('"%s"' % t.replace('"', '""') for t in indexed)
+        filters.append(User.id.in_(
+            text('SELECT rowid FROM user_search WHERE user_search MATCH :expr').bindparams(expr=expression)
+        ))
+        terms = [t for t in terms if len(t) < MIN_INDEXED_TERM]
+
+    # PostgreSQL answers these LIKEs from the pg_trgm GIN index.
+    filters.extend(User.search_name.contains(t, autoescape=True) for t in terms)
+    return filters
+
+
+def search_citizens(query, cursor=None, limit=PAGE_SIZE):
+    """
+    Return `(citizens, next_cursor)` for one page of results, best matches first.
+
+    Candidates come from the trigram index (FTS5 on SQLite, pg_trgm on PostgreSQL) and are
+    ordered by (rank, search_name, id); the cursor is that tuple, so later pages are a seek
+    rather than an OFFSET.
+    """
+    raw = (query or '').strip()
+    normalized = normalize(raw)
+    if not normalized:
+        return [], None
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rank = _rank(raw, normalized)
+    stmt = db.session.query(User, rank.label('rank')).filter(
+        User.badge_id == None, *_match_filter(normalized.split())
+    )
+    if cursor:
+        stmt = stmt.filter(tuple_(rank, User.search_name, User.id) > tuple_(*map(literal, decode_cursor(cursor))))
+
+    rows = stmt.order_by(rank, User.search_name, User.id).limit(limit + 1).all()
+    citizens = [user for user, _ in rows[:limit]]
+    if len(rows) > limit:
+        return citizens, encode_cursor(rows[limit - 1].rank, citizens[-1])
+    return citizens, None
@@ -0,0 +1,298 @@
+// --- Three.js Logic ---
+let scene, camera, renderer, cardMesh, controls;
+
+function init3D() {
+    const container = document.getElementById('three-card-container');
+    const width = container.clientWidth;
+    const height = container.clientHeight;
+
+    scene = new THREE.Scene();
+
+    // Camera
+    camera = new THREE.PerspectiveCamera(45, width / height, 0.1, 1000);
+    camera.position.z = 12; // Zoomed in closer
+
+    // Renderer
+    renderer = new THREE.WebGLRenderer({ alpha: true, antialias: true });
+    renderer.setSize(width, height);
+    renderer.setPixelRatio(window.devicePixelRatio);
+    container.appendChild(renderer.domElement);
+
+    // Lighting for "Real Reflection"
+    const ambientLight = new THREE.AmbientLight(0xffffff, 0.6);
+    scene.add(ambientLight);
+
+    const pointLight = new THREE.PointLight(0xffffff, 0.8);
+    pointLight.position.set(10, 10, 10);
+    scene.add(pointLight);
+
+    const pointLight2 = new THREE.PointLight(0xffffff, 0.5);
+    pointLight2.position.set(-10, -10, 10);
+    scene.add(pointLight2);
+
+    // Geometry (BoxGeometry for thickness)
+    // Scale roughly credit card: 8.56 x 5.39. Let's say 8.5 x 5.4 x 0.1
+    const geometry = new THREE.BoxGeometry(8.5, 5.4, 0.1);
+
+    // Textures
+    const textureLoader = new THREE.TextureLoader();
+    const frontTexture = createCardTexture(); // Canvas texture
+    const backTexture = createBackTexture(); // Back Canvas texture
+
+    // Materials
+    // Front: Canvas
+    // Back: Canvas with strip
+    // Sides: Dark
+
+    const frontMaterial = new THREE.MeshPhysicalMaterial({
+        map: frontTexture,
+        roughness: 0.4,
+        metalness: 0.1,
+        clearcoat: 1.0,
+        clearcoatRoughness: 0.1
+    });
+
+    const backMaterial = new THREE.MeshStandardMaterial({
+        map: backTexture,
+        roughness: 0.8
+    });
+
+    const sideMaterial = new THREE.MeshStandardMaterial({ color: 0x111111 });
+
+    const materials = [
+        sideMaterial, // right
+        sideMaterial, // left
+        sideMaterial, // top
+        sideMaterial, // bottom
+        frontMaterial, // front
+        backMaterial  // back
+    ];
+
+    cardMesh = new THREE.Mesh(geometry, materials);
+    scene.add(cardMesh);
+
+    // Orbit Controls
+    controls = new THREE.OrbitControls(camera, renderer.domElement);
+    controls.enableDamping = true;
+    controls.dampingFactor = 0.05;
+    controls.enableZoom = false;
+    controls.enablePan = false;
+
+    // Animation Loop
+    animate();
+
+    // Handle Resize
+    window.addEventListener('resize', onWindowResize, false);
+}
+
+function createCardTexture() {
+    const canvas = document.createElement('canvas');
+    canvas.width = 1024;
+    canvas.height = 640;
+    const ctx = canvas.getContext('2d');
+
+    // 1. Background
+    if (cardData.style === 'custom' && cardData.customImageUrl !== 'null') {
+        const img = new Image();
+        img.src = cardData.customImageUrl;
+        // We need to wait for image load to draw, but texture needs immediate return.
+        // We can redraw texture later.
+        img.onload = function() {
+            ctx.drawImage(img, 0, 0, 1024, 640);
+            drawCardText(ctx);
+            cardMesh.material[4].map.needsUpdate = true;
+        };
+    } else {
+        let gradient;
+        if (cardData.style === 'gold') {
+            gradient = ctx.createLinearGradient(0, 0, 1024, 640);
+            gradient.addColorStop(0, '#f1c40f');
+            gradient.addColorStop(1, '#d35400');
+        } else if (cardData.style === 'black') {
+            gradient = ctx.createLinearGradient(0, 0, 1024, 640);
+            gradient.addColorStop(0, '#2c3e50');
+            gradient.addColorStop(1, '#000000');
+        } else { // blue default
+            gradient = ctx.createLinearGradient(0, 0, 1024, 640);
+            gradient.addColorStop(0, '#2980b9');
+            gradient.addColorStop(1, '#2c3e50');
+        }
+        ctx.fillStyle = gradient;
+        ctx.fillRect(0, 0, 1024, 640);
+        drawCardText(ctx);
+    }
+
+    const texture = new THREE.CanvasTexture(canvas);
+    return texture;
+}
+
+function createBackTexture() {
+    const canvas = document.createElement('canvas');
+    canvas.width = 1024;
+    canvas.height = 640;
+    const ctx = canvas.getContext('2d');
+
+    // Background (Standard Grey/Dark)
+    ctx.fillStyle = '#34495e';
+    ctx.fillRect(0, 0, 1024, 640);
+
+    // Magnetic Stripe (Black)
+    ctx.fillStyle = '#000000';
+    ctx.fillRect(0, 80, 1024, 150);
+
+    // Signature / CVV strip (White)
+    ctx.fillStyle = '#ffffff';
+    ctx.fillRect(100, 300, 600, 80);
+
+    // CVV Text
+    ctx.font = '30px Arial';
+    ctx.fillStyle = '#000000';
+    ctx.textAlign = 'right';
+    ctx.fillText('CVV: ***', 680, 350);
+
+    // Bank Info Text
+    ctx.font = '20px Arial';
+    ctx.fillStyle = '#bdc3c7';
+    ctx.textAlign = 'center';
+    ctx.fillText('Propiedad del Gobierno de San Andreas. Uso intransferible.', 512, 550);
+    ctx.fillText('Si encuentra esta tarjeta, por favor devuélvala a la sucursal más cercana.', 512, 580);
+
+    const texture = new THREE.CanvasTexture(canvas);
+    return texture;
+}
+
+function drawCardText(ctx) {
+    // Chip
+    ctx.fillStyle = '#f1c40f';
+    ctx.fillRect(100, 250, 140, 100);
+    ctx.strokeStyle = '#d35400';
+    ctx.lineWidth = 2;
+    ctx.strokeRect(100, 250, 140, 100);
+
+    // Bank Name
+    ctx.font = 'bold 50px Arial';
+    ctx.fillStyle = 'white';
+    ctx.textAlign = 'left';
+    ctx.fillText('BANCA ESTATAL', 80, 100);
+
+    // Balance
+    ctx.textAlign = 'right';
+    ctx.fillText(cardData.balance, 944, 100);
+
+    // Account Number
+    ctx.font = '60px Courier New'; // Monospace-ish
+    ctx.textAlign = 'center';
+    ctx.fillText(cardData.number.match(/.{1,4}/g).join('  '), 512, 400);
+
+    // Holder Name
+    ctx.font = '40px Arial';
+    ctx.textAlign = 'left';
+    ctx.fillText(cardData.holder.toUpperCase(), 80, 550);
+}
+
+function animate() {
+    requestAnimationFrame(animate);
+    controls.update();
+    renderer.render(scene, camera);
+}
+
+function onWindowResize() {
+    const container = document.getElementById('three-card-container');
+    camera.aspect = container.clientWidth / container.clientHeight;
+    camera.updateProjectionMatrix();
+    renderer.setSize(container.clientWidth, container.clientHeight);
+}
+
+// --- Other Logic (Modal, Lookup) ---
+
+function openModal(id) {
+    document.getElementById(id).style.display = "block";
+}
+function closeModal(id) {
+    document.getElementById(id).style.display = "none";
+}
+window.onclick = function(event) {
+    if (event.target.classList.contains('modal')) {
+        event.target.style.display = "none";
+    }
+}
+
+function lookupAccount(number) {
+    const resultDiv = document.getElementById('accountName');
+    if (number.length > 3) {
+        fetch(`/banking/lookup/${number}`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.name) {
+                    resultDiv.innerText = data.name;
+                    resultDiv.style.color = '#27ae60';
+                } else {
+                    resultDiv.innerText = "Cuenta no encontrada";
+                    resultDiv.style.color = '#e74c3c';
+                }
+            });
+    } else {
+        resultDiv.innerText = "";
+    }
+}
+
+// --- Transaction history (keyset pagination) ---
+
+const transactionList = document.getElementById('transactionList');
+let historyLoading = false;
+
+function historyParams(cursor) {
+    const params = new URLSearchParams(new FormData(document.getElementById('historyFilters')));
+    if (cursor) params.set('cursor', cursor);
+    return params;
+}
+
+function renderTransaction(t) {
+    const li = document.createElement('li');
+    li.className = 'transaction-item';
+    li.innerHTML = `
+        <div style="display: flex; justify-content: space-between;">
+            <span></span>
+            <span class="transaction-amount ${t.is_positive ? 'positive' : 'negative'}">
+                ${t.is_positive ? '+' : '-'}$${t.amount.toFixed(2)}
+            </span>
+        </div>
+        <div style="font-size: 11px; color: #95a5a6;">${t.date_str}</div>`;
+    li.querySelector('span').textContent = t.description || '';
+    return li;
+}
+
+function loadTransactions(reset) {
+    const cursor = reset ? '' : transactionList.dataset.nextCursor;
+    if (historyLoading || (!reset && !cursor)) return;
+    historyLoading = true;
+    fetch(`${cardData.transactionsUrl}?${historyParams(cursor)}`)
+        .then(response => response.json())
+        .then(data => {
+            if (reset) transactionList.innerHTML = '';
+            (data.transactions || []).forEach(t => transactionList.appendChild(renderTransaction(t)));
+            if (reset && !transactionList.children.length) {
+                transactionList.innerHTML = '<p style="text-align: center; color: #ccc;">No hay transacciones recientes.</p>';
+            }
+            transactionList.dataset.nextCursor = data.next_cursor || '';
+        })
+        .finally(() => { historyLoading = false; });
+}
+
+transactionList.addEventListener('scroll', () => {
+    if (transactionList.scrollTop + transactionList.clientHeight >= transactionList.scrollHeight - 40) {
+        loadTransactions(false);
+    }
+});
+
+document.getElementById('historyFilters').addEventListener('submit', (event) => {
+    event.preventDefault();
+    loadTransactions(true);
+});
+
+function checkCustom(val) {
+    document.getElementById('customUpload').style.display = (val === 'custom') ? 'block' : 'none';
+}
+
+// Init 3D scene on load
+window.onload = init3D;
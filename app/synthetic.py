@@ -0,0 +1,353 @@
+"""
+Synthetic, production-sized data for load tests (`flask synthetic generate`).
+
+Every row goes in through chunked executemany INSERTs on the tables, so ORM events do not
+run; the derived state they would maintain (search_name, economy counters, daily rollups,
+lottery number counts, upload refcounts) is filled in explicitly at the end.
+"""
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, update
+
+from app import aggregates, db, rollups
+from app.accounts import allocate_account_numbers
+from app.lottery import get_lottery
+from app.models import (
+    BankAccount, BankLoan, BankSavings, BankTransaction, Comment, CriminalRecord,
+    CriminalRecordEvidencePhoto, CriminalRecordSubjectPhoto, GovernmentFund, License,
+    LotteryNumberCount, LotteryTicket, PayrollItem, PayrollRequest, TrafficFine, UploadBlob, User,
+)
+from app.passwords import hash_password
+from app.search import search_text
+
+# Synthetic citizens get DNIs from here up, officials badges 'SYN00000'...; both stay clear of real data.
+DNI_BASE = 90000000
+BADGE_PREFIX = 'SYN'
+DEPARTMENTS = ('Gobierno', 'Policia', 'SABES', 'Sheriff', 'LSFD', 'Universidad')
+CHUNK_SIZE = 10000
+
+FIRST_NAMES = ['José', 'María', 'Ana', 'Luis', 'Sofía', 'Martín', 'Lucía', 'Andrés', 'Valentina', 'Raúl',
+               'Camila', 'Diego', 'Elena', 'Tomás', 'Isabel', 'Joaquín', 'Carmen', 'Ramón', 'Inés', 'Óscar']
+LAST_NAMES = ['García', 'Rodríguez', 'González', 'Fernández', 'López', 'Martínez', 'Sánchez', 'Pérez',
+              'Gómez', 'Martín', 'Jiménez', 'Ruiz', 'Hernández', 'Díaz', 'Moreno', 'Muñoz', 'Álvarez',
+              'Romero', 'Alonso', 'Gutiérrez', 'Navarro', 'Torres', 'Domínguez', 'Vázquez', 'Ramos']
+# (type, min amount, max amount, weight) for the transaction history.
+TRANSACTION_MIX = [
+    ('transfer_in', 10, 5000, 25), ('transfer_out', 10, 5000, 25), ('salary', 800, 4000, 8),
+    ('lottery_ticket', 500, 500, 10), ('savings_deposit', 100, 5000, 5), ('savings_withdrawal', 100, 5000, 3),
+    ('loan_received', 5500, 5500, 2), ('loan_payment', 100, 6000, 3), ('fine_payment', 50, 2000, 5),
+    ('license_buy', 500, 5000, 4), ('interest', 1, 200, 10),
+]
+CRIMES = [('Robo', '2.1'), ('Asalto', '3.4'), ('Tráfico de drogas', '5.2'), ('Vandalismo', '1.7'),
+          ('Conducción temeraria', '4.1'), ('Evasión', '6.3')]
+FINE_REASONS = ['Exceso de velocidad', 'Estacionamiento indebido', 'Semáforo en rojo', 'Sin casco', 'Sin licencia']
+LICENSE_TYPES = ['Conducir', 'Armas', 'Caza', 'Pesca', 'Negocio']
+
+
+def synthetic_dni(index):
+    return str(DNI_BASE + index)
+
+
+def has_synthetic_data():
+    return db.session.query(User.id).filter(User.badge_id.like(f'{BADGE_PREFIX}%')).first() is not None
+
+
+def _bulk(model, rows, commit=False):
+    """
+    INSERT `rows` (any iterable of dicts) in CHUNK_SIZE executemany batches. With `commit`, each
+    batch is committed so a multi-million row run never holds one huge transaction.
+    """
+    table = model.__table__
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK_SIZE:
+            db.session.execute(insert(table), batch)
+            total += len(batch)
+            batch = []
+            if commit:
+                db.session.commit()
+    if batch:
+        db.session.execute(insert(table), batch)
+        total += len(batch)
+    return total
+
+
+def _make_photos(count, rng):
+    """A small pool of real JPEGs in the upload store, shared by every photo column."""
+    from PIL import Image, ImageDraw
+
+    from app.uploads import save_path
+
+    names = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(count):
+            image = Image.new('RGB', (640, 800), tuple(rng.randrange(40, 220) for _ in range(3)))
+            draw = ImageDraw.Draw(image)
+            for _ in range(12):
+                x, y = rng.randrange(640), rng.randrange(800)
+                draw.ellipse((x, y, x + rng.randrange(20, 200), y + rng.randrange(20, 200)),
+                             fill=tuple(rng.randrange(256) for _ in range(3)))
+            path = os.path.join(tmp, f'synthetic-{i}.jpg')
+            image.save(path, 'JPEG', quality=80)
+            names.append(save_path(path))
+    return names
+
+
+def generate_world(citizens=20000, transactions=2000000, officials_per_department=40, photos=24,
+                   tickets=50000, days=180, password='synthetic', seed=1, echo=print):
+    """Generate the data set, committing step by step and reporting through `echo`. Returns row counts."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    # Keep every timestamp older than the rollup settle window so rebuild_rollups sees all of it.
+    end = now - timedelta(seconds=rollups.SETTLE_SECONDS * 2)
+    start = end - timedelta(days=days)
+    span = (end - start).total_seconds()
+    counts = {}
+
+    def step(name, started):
+        db.session.commit()
+        rows = f'{counts[name]:,} filas en ' if name in counts else ''
+        echo(f'{name}: {rows}{time.perf_counter() - started:.1f}s')
+
+    started = time.perf_counter()
+    photo_names = _make_photos(photos, rng)
+    references = Counter()
+    counts['fotos'] = len(photo_names)
+    step('fotos', started)
+
+    # --- Citizens and accounts ---
+    started = time.perf_counter()
+    password_hash = hash_password(password)
+
+    def citizen_rows():
+        for i in range(citizens):
+            first = rng.choice(FIRST_NAMES)
+            last = f'{rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}'
+            dni = synthetic_dni(i)
+            selfie, dni_photo = rng.choice(photo_names), rng.choice(photo_names)
+            references[selfie] += 1
+            references[dni_photo] += 1
+            yield {
+                'first_name': first, 'last_name': last, 'dni': dni, 'search_name': search_text(first, last, dni),
+                'password_hash': password_hash, 'selfie_filename': selfie, 'dni_photo_filename': dni_photo,
+                'discord_id': str(10 ** 17 + i) if rng.random() < 0.3 else None,
+                'official_rank': 'Miembro', 'salary': 0.0, 'criminal_record_version': 0,
+                'created_at': start + timedelta(seconds=rng.uniform(0, span)),
+            }
+
+    counts['ciudadanos'] = _bulk(User, citizen_rows())
+    citizen_ids = dict(db.session.execute(
+        select(User.dni, User.id).where(User.badge_id.is_(None), User.dni >= synthetic_dni(0),
+                                        User.dni <= synthetic_dni(citizens - 1))
+    ).all())
+    step('ciudadanos', started)
+
+    started = time.perf_counter()
+    numbers = allocate_account_numbers(len(citizen_ids))
+    account_rows = [
+        {'account_number': number, 'balance': round(rng.lognormvariate(8, 1.2), 2),
+         'card_style': rng.choice(['blue', 'gold', 'black']), 'user_id': user_id}
+        for number, user_id in zip(numbers, citizen_ids.values())
+    ]
+    counts['cuentas'] = _bulk(BankAccount, account_rows)
+    accounts = db.session.execute(select(BankAccount.id, BankAccount.account_number, BankAccount.user_id).where(
+        BankAccount.user_id.between(min(citizen_ids.values()), max(citizen_ids.values()))
+    )).all()
+    account_by_user = {user_id: (account_id, number) for account_id, number, user_id in accounts}
+    step('cuentas', started)
+
+    # --- Officials: separate User rows sharing a citizen's DNI, paid into that citizen's account ---
+    started = time.perf_counter()
+    dnis = list(citizen_ids)
+    official_rows = []
+    for d, department in enumerate(DEPARTMENTS):
+        for j in range(officials_per_department):
+            dni = dnis[(d * officials_per_department + j) % len(dnis)]
+            photo = rng.choice(photo_names)
+            references[photo] += 1
+            index = d * officials_per_department + j
+            official_rows.append({
+                'first_name': rng.choice(FIRST_NAMES), 'last_name': rng.choice(LAST_NAMES), 'dni': dni,
+                'badge_id': f'{BADGE_PREFIX}{index:05d}', 'department': department,
+                'official_rank': 'Lider' if j == 0 else 'Miembro', 'official_status': 'Aprobado',
+                'salary': float(rng.randrange(1000, 4000, 50)), 'password_hash': password_hash,
+                'salary_account_number': account_by_user[citizen_ids[dni]][1], 'selfie_filename': photo,
+                'search_name': None, 'criminal_record_version': 0, 'created_at': start,
+            })
+    counts['funcionarios'] = _bulk(User, official_rows)
+    officials = db.session.execute(
+        select(User.id, User.department).where(User.badge_id.like(f'{BADGE_PREFIX}%'))
+    ).all()
+    authors = [official_id for official_id, department in officials if department in ('Policia', 'Sheriff')]
+    step('funcionarios', started)
+
+    # --- Transaction history: skewed towards a minority of busy accounts, in time order ---
+    started = time.perf_counter()
+    account_list = list(account_by_user.values())
+    weights = [rng.paretovariate(1.2) for _ in account_list]
+    cumulative = []
+    running = 0.0
+    for weight in weights:
+        running += weight
+        cumulative.append(running)
+    types = [t for t, _, _, _ in TRANSACTION_MIX]
+    type_weights = [w for _, _, _, w in TRANSACTION_MIX]
+    ranges = {t: (low, high) for t, low, high, _ in TRANSACTION_MIX}
+
+    def transaction_rows():
+        for i in range(0, transactions, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, transactions - i)
+            picked = rng.choices(account_list, cum_weights=cumulative, k=size)
+            kinds = rng.choices(types, weights=type_weights, k=size)
+            for k, ((account_id, _), kind) in enumerate(zip(picked, kinds)):
+                low, high = ranges[kind]
+                related = rng.choice(account_list)[1] if kind in ('transfer_in', 'transfer_out') else None
+                yield {
+                    'account_id': account_id, 'type': kind, 'amount': round(rng.uniform(low, high), 2),
+                    'related_account': related, 'description': kind.replace('_', ' ').capitalize(),
+                    'timestamp': start + timedelta(seconds=span * (i + k) / transactions + rng.uniform(0, 1)),
+                    'department': rng.choice(DEPARTMENTS) if kind == 'salary' else None,
+                }
+
+    counts['transacciones'] = _bulk(BankTransaction, transaction_rows(), commit=True)
+    step('transacciones', started)
+
+    # --- Loans, savings ---
+    started = time.perf_counter()
+    loan_rows, savings_rows = [], []
+    for account_id, _ in account_list:
+        if rng.random() < 0.1:
+            granted = start + timedelta(seconds=rng.uniform(span * 0.8, span))
+            loan_rows.append({'account_id': account_id, 'amount_due': 6000.0, 'start_date': granted,
+                              'due_date': granted + timedelta(days=14), 'status': 'Active'})
+        for _ in range(rng.choice((0, 0, 0, 0, 1, 2))):
+            savings_rows.append({'account_id': account_id, 'amount': round(rng.uniform(100, 20000), 2),
+                                 'deposit_date': start + timedelta(seconds=rng.uniform(0, span)),
+                                 'status': 'Active'})
+    counts['préstamos'] = _bulk(BankLoan, loan_rows)
+    counts['ahorros'] = _bulk(BankSavings, savings_rows)
+    step('préstamos', started)
+
+    # --- Fines, licenses, comments, criminal records with photos ---
+    started = time.perf_counter()
+    citizen_id_list = list(citizen_ids.values())
+    fine_rows, license_rows, comment_rows, record_rows = [], [], [], []
+    for user_id in citizen_id_list:
+        for _ in range(rng.choice((0, 0, 0, 1, 1, 2, 3))):
+            fine_rows.append({'amount': float(rng.randrange(50, 2000, 50)), 'reason': rng.choice(FINE_REASONS),
+                              'date': start + timedelta(seconds=rng.uniform(0, span)),
+                              'status': rng.choice(('Pendiente', 'Pagada')), 'user_id': user_id,
+                              'author_id': rng.choice(authors)})
+        for kind in rng.sample(LICENSE_TYPES, rng.choice((0, 1, 1, 2))):
+            license_rows.append({'type': kind, 'status': 'Activa', 'user_id': user_id,
+                                 'expiration_date': (end + timedelta(days=rng.randrange(30, 700))).date()})
+        if rng.random() < 0.05:
+            comment_rows.append({'content': 'Ciudadano generado para pruebas de carga.', 'user_id': user_id,
+                                 'author_id': rng.choice(authors), 'date': end})
+        if rng.random() < 0.05:
+            for _ in range(rng.randrange(1, 5)):
+                crime, code = rng.choice(CRIMES)
+                record_rows.append({'crime': crime, 'penal_code': code, 'user_id': user_id,
+                                    'author_id': rng.choice(authors), 'report_text': f'Informe de {crime.lower()}.',
+                                    'date': start + timedelta(seconds=rng.uniform(0, span))})
+    counts['multas'] = _bulk(TrafficFine, fine_rows)
+    counts['licencias'] = _bulk(License, license_rows)
+    counts['comentarios'] = _bulk(Comment, comment_rows)
+    counts['antecedentes'] = _bulk(CriminalRecord, record_rows)
+
+    record_ids = db.session.execute(select(CriminalRecord.id).where(
+        CriminalRecord.user_id.between(min(citizen_id_list), max(citizen_id_list)))).scalars().all()
+    subject_rows, evidence_rows = [], []
+    for record_id in record_ids:
+        for rows in (subject_rows, evidence_rows):
+            for _ in range(rng.randrange(0, 3)):
+                name = rng.choice(photo_names)
+                references[name] += 1
+                rows.append({'filename': name, 'record_id': record_id})
+    counts['fotos de antecedentes'] = _bulk(CriminalRecordSubjectPhoto, subject_rows) + \
+        _bulk(CriminalRecordEvidencePhoto, evidence_rows)
+    step('antecedentes', started)
+
+    # --- Lottery tickets for the last week, with their per-number counts ---
+    started = time.perf_counter()
+    get_lottery()
+    ticket_rows = []
+    per_number = Counter()
+    for _ in range(tickets):
+        day = (end - timedelta(days=rng.randrange(7))).date()
+        numbers = f'{rng.randrange(100000):05d}'
+        ticket_rows.append({'user_id': rng.choice(citizen_id_list), 'numbers': numbers, 'date': day})
+        per_number[(day, numbers)] += 1
+    counts['boletos'] = _bulk(LotteryTicket, ticket_rows)
+    existing = set(db.session.execute(select(LotteryNumberCount.date, LotteryNumberCount.numbers).where(
+        LotteryNumberCount.date >= (end - timedelta(days=7)).date())).all())
+    for day, numbers in existing & set(per_number):
+        db.session.execute(update(LotteryNumberCount).where(
+            LotteryNumberCount.date == day, LotteryNumberCount.numbers == numbers
+        ).values(count=LotteryNumberCount.count + per_number.pop((day, numbers))))
+    _bulk(LotteryNumberCount, ({'date': day, 'numbers': numbers, 'count': count}
+                               for (day, numbers), count in per_number.items()))
+    step('boletos', started)
+
+    # --- One pending payroll per department ---
+    started = time.perf_counter()
+    if not db.session.query(GovernmentFund.id).first():
+        db.session.add(GovernmentFund(balance=1000000.0))
+    salaries = dict(db.session.execute(select(User.id, User.salary).where(User.badge_id.like(f'{BADGE_PREFIX}%'))).all())
+    for department in DEPARTMENTS:
+        members = [official_id for official_id, dept in officials if dept == department]
+        request = PayrollRequest(department=department, status='Pending', created_at=end,
+                                 total_amount=sum(salaries[m] for m in members))
+        db.session.add(request)
+        db.session.flush()
+        _bulk(PayrollItem, ({'request_id': request.id, 'user_id': m, 'amount': salaries[m]} for m in members))
+    counts['nóminas'] = len(DEPARTMENTS)
+    step('nóminas', started)
+
+    # --- Derived state the skipped ORM events and write paths would have kept ---
+    started = time.perf_counter()
+    for name, refs in references.items():
+        db.session.execute(update(UploadBlob).where(UploadBlob.key == name).values(refcount=refs))
+    db.session.commit()
+    aggregates.verify(fix=True)
+    rollups.rebuild_rollups()
+    step('agregados', started)
+    return counts
+
+
+
+def write_manifest(path, password, sample=2000, seed=1):
+    """
+    What the load harness (benchmarks/load_test.py) needs to log in and pick targets: the
+    shared password, synthetic citizens, officials' badges by department, a sample of account
+    numbers and search terms.
+    """
+    rng = random.Random(seed)
+    citizens = db.session.execute(select(User.id, User.dni).where(
+        User.badge_id.is_(None), User.dni >= synthetic_dni(0))).all()
+    officials = {}
+    for badge, department in db.session.execute(
+            select(User.badge_id, User.department).where(User.badge_id.like(f'{BADGE_PREFIX}%'))):
+        officials.setdefault(department, []).append(badge)
+    citizens = rng.sample(citizens, min(sample, len(citizens)))
+    accounts = db.session.execute(select(BankAccount.account_number).where(
+        BankAccount.user_id.in_([user_id for user_id, _ in citizens]))).scalars().all()
+
+    manifest = {
+        'password': password,
+        'citizens': [{'id': user_id, 'dni': dni} for user_id, dni in citizens],
+        'officials': officials,
+        'accounts': accounts,
+        'search_terms': LAST_NAMES + FIRST_NAMES[:5] + [dni for _, dni in citizens[:20]],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    return manifest
@@ -0,0 +1,208 @@
+import hashlib
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from flask import current_app, url_for
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db, metrics
+from app.models import BankAccount, CriminalRecordEvidencePhoto, CriminalRecordSubjectPhoto, UploadBlob, User
+
+STORE_PREFIX = 'cas'
+CHUNK_SIZE = 64 * 1024
+ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'webp'}
+# Shown until the worker has built the variants, and for uploads it rejected as invalid.
+PLACEHOLDER = 'img/upload-pending.png'
+# Orphaned files (written but never committed) younger than this are left alone by gc.
+GC_GRACE_SECONDS = 3600
+
+
+class UnsupportedUpload(ValueError):
+    pass
+
+
+def is_stored(name):
+    return bool(name) and name.startswith(STORE_PREFIX + '/')
+
+
+def _extension(filename):
+    ext = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if ext not in ALLOWED_EXTENSIONS:
+        raise UnsupportedUpload(filename)
+    return 'jpg' if ext == 'jpeg' else ext
+
+
+def blob_path(name):
+    """Absolute path of a stored name; legacy flat names resolve to UPLOAD_FOLDER as before."""
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], *name.split('/'))
+
+
+def _ingest(stream, ext):
+    """
+    Copy `stream` into the store while hashing it; identical bytes end up in the same file.
+    Returns `(name, size, created)`; created is False when the content was already stored.
+    """
+    root = os.path.join(current_app.config['UPLOAD_FOLDER'], STORE_PREFIX)
+    os.makedirs(root, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=root, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        hexdigest = digest.hexdigest()
+        name = f'{STORE_PREFIX}/{hexdigest[:2]}/{hexdigest[2:4]}/{hexdigest}.{ext}'
+        path = blob_path(name)
+        created = not os.path.exists(path)
+        if created:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp, path)
+        else:
+            os.remove(tmp)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return name, size, created
+
+
+def acquire(name, size):
+    """+1 reference in the current transaction (upsert, so concurrent first uploads do not collide)."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        upsert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+        stmt = upsert(UploadBlob).values(key=name, size=size, refcount=1, created_at=datetime.utcnow())
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['key'], set_={'refcount': UploadBlob.refcount + 1}
+        ))
+        return
+
+    updated = db.session.execute(
+        update(UploadBlob).where(UploadBlob.key == name)
+        .values(refcount=UploadBlob.refcount + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not updated:
+        db.session.add(UploadBlob(key=name, size=size, refcount=1))
+
+
+def release(name):
+    """-1 reference; files are removed later by `flask uploads gc` once nothing points at them."""
+    if is_stored(name):
+        db.session.execute(
+            update(UploadBlob).where(UploadBlob.key == name)
+            .values(refcount=UploadBlob.refcount - 1)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def save_upload(file_storage):
+    """
+    Store a werkzeug FileStorage by content and return its name for the model column.
+
+    The name replaces the old `secure_filename(file.filename)`: two citizens uploading
+    'image.png' no longer overwrite each other, and re-uploading the same bytes costs no space.
+    """
+    name, size, created = _ingest(file_storage.stream, _extension(file_storage.filename))
+    stored = 'new' if created else 'duplicate'
+    metrics.UPLOADS.inc(stored=stored)
+    metrics.UPLOAD_BYTES.inc(size, stored=stored)
+    acquire(name, size)
+    return name
+
+
+def save_path(path):
+    """Ingest an existing file (legacy import); returns its stored name, reference acquired."""
+    with open(path, 'rb') as f:
+        name, size, _ = _ingest(f, _extension(path))
+    acquire(name, size)
+    return name
+
+
+def upload_url(name, variant='print'):
+    """
+    URL of the `variant` ('thumb', 'profile', 'print') of an upload. Only variants are served:
+    they are re-encoded without EXIF (GPS included), the original is not. Until they exist the
+    URL points at PLACEHOLDER.
+    """
+    if is_stored(name):
+        from app.images import variant_name
+        name = variant_name(name, variant)
+        if not os.path.exists(blob_path(name)):
+            return url_for('static', filename=PLACEHOLDER)
+        return url_for('main.uploaded_file', name=name[len(STORE_PREFIX) + 1:])
+    return url_for('static', filename='img/' + (name or 'default.jpg'))
+
+
+def collect_garbage(now=None):
+    """Delete blobs nobody references and stray files older than the grace period. Returns the count."""
+    now = now or time.time()
+    removed = 0
+    from app.images import variant_names
+
+    for blob in UploadBlob.query.filter(UploadBlob.refcount <= 0).all():
+        for name in [blob.key] + variant_names(blob.key):
+            path = blob_path(name)
+            if os.path.exists(path):
+                os.remove(path)
+        db.session.delete(blob)
+        removed += 1
+    db.session.commit()
+
+    root = os.path.join(current_app.config['UPLOAD_FOLDER'], STORE_PREFIX)
+    known = set()
+    for key, in db.session.query(UploadBlob.key):
+        known.add(key)
+        known.update(variant_names(key))
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, current_app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+            if name not in known and now - os.path.getmtime(path) > GC_GRACE_SECONDS:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+# Model columns that hold upload names.
+REFERENCES = (
+    (User, 'selfie_filename'),
+    (User, 'dni_photo_filename'),
+    (BankAccount, 'custom_image'),
+    (CriminalRecordSubjectPhoto, 'filename'),
+    (CriminalRecordEvidencePhoto, 'filename'),
+)
+
+
+def import_legacy():
+    """
+    Rewrite flat `static/img` names to store names, one reference per row. Byte-identical
+    legacy files collapse into one blob; the originals are left in place.
+    Returns `(migrated, missing)`.
+    """
+    migrated = missing = 0
+    stored = {}
+    for model, column in REFERENCES:
+        attribute = getattr(model, column)
+        for row in model.query.filter(attribute != None, ~attribute.startswith(STORE_PREFIX + '/')).all():
+            legacy = getattr(row, column)
+            path = blob_path(legacy)
+            if not os.path.isfile(path) or os.path.splitext(legacy)[1].lower().lstrip('.') not in ALLOWED_EXTENSIONS:
+                missing += 1
+                continue
+            if legacy in stored:
+                name = stored[legacy]
+                acquire(name, os.path.getsize(path))
+            else:
+                name = stored[legacy] = save_path(path)
+            setattr(row, column, name)
+            migrated += 1
+        db.session.commit()
+    return migrated, missing
@@ -0,0 +1,69 @@
+import logging
+import time
+
+from app import db, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    """A callable run by the worker every `interval` seconds."""
+
+    def __init__(self, name, interval, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.last_run = None
+
+    def is_due(self, now):
+        return self.last_run is None or now - self.last_run >= self.interval
+
+
+def build_jobs(app):
+    """Background jobs that run outside the request path."""
+    from app.images import ImagePipeline
+    from app.loans import sweep_loan_penalties
+    from app.lottery import run_daily_draw
+    from app.notifications import OutboxDispatcher
+    from app.rollups import build_rollups
+
+    jobs = []
+    if app.config.get('BOT_URL'):
+        dispatcher = OutboxDispatcher.from_config(app.config)
+        jobs.append(PeriodicJob('notifications', app.config['NOTIFY_POLL_INTERVAL'], dispatcher.run_once))
+    else:
+        logger.warning("Variable 'BOT_URL' no configurada; las notificaciones se quedan en el outbox "
+                       "y el job 'notifications' no se ejecuta.")
+    return jobs + [
+        PeriodicJob('rollups', app.config['ROLLUP_INTERVAL'], build_rollups),
+        PeriodicJob('loan_penalties', app.config['LOAN_SWEEP_INTERVAL'], sweep_loan_penalties),
+        PeriodicJob('lottery_draw', app.config['LOTTERY_DRAW_INTERVAL'], run_daily_draw),
+        PeriodicJob('images', app.config['IMAGE_POLL_INTERVAL'], ImagePipeline.from_config(app.config).run_once),
+    ]
+
+
+def run_job(app, job):
+    with app.app_context():
+        try:
+            return job.func()
+        except Exception:
+            logger.exception('Error en el job %s', job.name)
+            db.session.rollback()
+        finally:
+            db.session.remove()
+            metrics.REGISTRY.flush()
+
+
+def run_worker(app, only=None, once=False, tick=0.5):
+    jobs = [job for job in build_jobs(app) if not only or job.name in only]
+    logger.info('Worker iniciado con jobs: %s', ', '.join(job.name for job in jobs))
+
+    while True:
+        now = time.monotonic()
+        for job in jobs:
+            if job.is_due(now):
+                job.last_run = now
+                run_job(app, job)
+        if once:
+            return
+        time.sleep(tick)
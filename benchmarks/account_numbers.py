@@ -0,0 +1,84 @@
+"""
+Account number allocation throughput: the old random-digits-plus-lookup loop against the
+sequence + Feistel permutation allocator in app/accounts.py.
+
+The table is pre-filled with `--existing` accounts so the lookup loop pays for its
+per-attempt query the way it does in production.
+
+    python -m benchmarks.account_numbers --existing 50000 --allocations 5000
+    BENCH_DATABASE_URL=postgresql://... python -m benchmarks.account_numbers
+"""
+import argparse
+import random
+import string
+import time
+
+from benchmarks.common import bench_app
+
+
+def legacy_generate(BankAccount):
+    attempts = 0
+    while True:
+        attempts += 1
+        number = ''.join(random.choices(string.digits, k=10))
+        if not BankAccount.query.filter_by(account_number=number).first():
+            return number, attempts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--existing', type=int, default=20000, help='Cuentas precargadas.')
+    parser.add_argument('--allocations', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=100, help='Tamaño de bloque para la asignación por lotes.')
+    args = parser.parse_args()
+
+    app = bench_app()
+    from app import db
+    from app.accounts import AccountNumberPermutation, account_number_key, allocate_account_number, allocate_account_numbers
+    from app.models import BankAccount, User
+    from sqlalchemy import insert
+
+    with app.app_context():
+        user = User(first_name='Bench', last_name='Accounts', dni='B000000')
+        db.session.add(user)
+        db.session.commit()
+        db.session.execute(insert(BankAccount), [
+            {'account_number': f'{number:010d}', 'balance': 0.0, 'user_id': user.id}
+            for number in random.sample(range(10 ** 10), args.existing)
+        ])
+        db.session.commit()
+
+        permutation = AccountNumberPermutation(account_number_key())
+        start = time.perf_counter()
+        for value in range(args.allocations * 10):
+            permutation.format(value)
+        pure = args.allocations * 10 / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        total_attempts = sum(legacy_generate(BankAccount)[1] for _ in range(args.allocations))
+        legacy = args.allocations / (time.perf_counter() - start)
+        db.session.commit()
+
+        start = time.perf_counter()
+        single = {allocate_account_number() for _ in range(args.allocations)}
+        db.session.commit()
+        sequential = args.allocations / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        batched = set()
+        for _ in range(0, args.allocations, args.batch):
+            batched.update(allocate_account_numbers(args.batch))
+        db.session.commit()
+        bulk = len(batched) / (time.perf_counter() - start)
+
+        assert len(single) == args.allocations and not single & batched, 'números repetidos'
+
+    print(f'Cuentas existentes:          {args.existing}')
+    print(f'Permutación (sin BD):        {pure:,.0f} números/s')
+    print(f'Bucle aleatorio + consulta:  {legacy:,.0f} números/s ({total_attempts / args.allocations:.3f} intentos/número)')
+    print(f'Secuencia + permutación:     {sequential:,.0f} números/s')
+    print(f'Por lotes de {args.batch}:{" " * max(1, 16 - len(str(args.batch)))}{bulk:,.0f} números/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Citizen search latency: the old `contains()` LIKE scan against app/search.py
+(FTS5 trigram on SQLite, pg_trgm on PostgreSQL) over a synthetic population.
+
+    python -m benchmarks.citizen_search --citizens 100000
+    BENCH_DATABASE_URL=postgresql://... python -m benchmarks.citizen_search
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import bench_app, percentile
+
+FIRST_NAMES = ['José', 'María', 'Ana', 'Luis', 'Sofía', 'Martín', 'Lucía', 'Andrés', 'Valentina', 'Raúl',
+               'Camila', 'Diego', 'Elena', 'Tomás', 'Isabel', 'Joaquín', 'Carmen', 'Ramón', 'Inés', 'Óscar']
+LAST_NAMES = ['García', 'Rodríguez', 'González', 'Fernández', 'López', 'Martínez', 'Sánchez', 'Pérez',
+              'Gómez', 'Martín', 'Jiménez', 'Ruiz', 'Hernández', 'Díaz', 'Moreno', 'Muñoz', 'Álvarez',
+              'Romero', 'Alonso', 'Gutiérrez', 'Navarro', 'Torres', 'Domínguez', 'Vázquez', 'Ramos']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--citizens', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    app = bench_app()
+    from app import db, search
+    from app.models import User
+    from sqlalchemy import insert
+
+    with app.app_context():
+        rows = []
+        for i in range(args.citizens):
+            first, last = rng.choice(FIRST_NAMES), f'{rng.choice(LAST_NAMES)}{rng.randrange(1000)}'
+            dni = f'{10000000 + i}'
+            rows.append({'first_name': first, 'last_name': last, 'dni': dni,
+                         'search_name': search.search_text(first, last, dni)})
+        for start in range(0, len(rows), 10000):
+            db.session.execute(insert(User), rows[start:start + 10000])
+        db.session.commit()
+
+        samples = [rng.choice(rows) for _ in range(args.queries)]
+        queries = [s['dni'] for s in samples[:len(samples) // 3]]
+        queries += [s['last_name'][:-3] for s in samples[len(samples) // 3:2 * len(samples) // 3]]
+        queries += [f"{s['first_name']} {s['last_name']}" for s in samples[2 * len(samples) // 3:]]
+
+        def legacy(q):
+            return User.query.filter(
+                (User.badge_id == None) &
+                (User.first_name.contains(q) | User.last_name.contains(q) | User.dni.contains(q))
+            ).all()
+
+        def indexed(q):
+            return search.search_citizens(q)[0]
+
+        for label, func in (('LIKE contains() (sin límite)', legacy), ('Índice trigram + ranking', indexed)):
+            timings, returned = [], 0
+            for q in queries:
+                start = time.perf_counter()
+                returned += len(func(q))
+                timings.append((time.perf_counter() - start) * 1000)
+                db.session.expire_all()
+            print(f'{label:32} p50={percentile(timings, 50):8.2f} ms  p95={percentile(timings, 95):8.2f} ms  '
+                  f'filas/consulta={returned / len(queries):8.1f}')
+
+        exact = sum(1 for s in samples[:len(samples) // 3] if indexed(s['dni'])[0].dni == s['dni'])
+        print(f'DNI exacto en primera posición: {exact}/{len(samples) // 3}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+
+def bench_app(database_url=None, **overrides):
+    """
+    App for benchmarks: uses `database_url` (or BENCH_DATABASE_URL) if given, otherwise a
+    fresh SQLite file in a temporary directory. Tables are created with `db.create_all()`.
+    """
+    from app import create_app, db
+
+    tmp = tempfile.mkdtemp(prefix='hermes-bench-')
+    url = database_url or os.environ.get('BENCH_DATABASE_URL') or 'sqlite:///' + os.path.join(tmp, 'bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = url
+        UPLOAD_FOLDER = os.path.join(tmp, 'img')
+        WTF_CSRF_ENABLED = False
+        TESTING = True
+
+    for key, value in overrides.items():
+        setattr(BenchConfig, key, value)
+
+    os.makedirs(BenchConfig.UPLOAD_FOLDER, exist_ok=True)
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
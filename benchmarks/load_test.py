@@ -0,0 +1,171 @@
+"""
+Weighted load test against a running server, with the accounts written by
+`flask synthetic generate` (instance/synthetic.json).
+
+Each virtual user keeps three logged-in sessions (a citizen, an official and a Gobierno
+official) and loops over the actions below, picked by weight, for `--duration` seconds.
+Reports p50/p95/p99 and throughput per action and overall; logins are reported apart.
+
+    flask synthetic generate --citizens 20000 --transactions 2000000
+    gunicorn -w 4 -b 127.0.0.1:8000 run:app
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --users 32 --duration 60
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+
+import requests
+
+from benchmarks.common import percentile
+
+# (action, session, weight)
+ACTIONS = [
+    ('banking_dashboard', 'citizen', 30),
+    ('banking_transfer', 'citizen', 8),
+    ('lottery_buy', 'citizen', 6),
+    ('official_database', 'official', 20),
+    ('citizen_profile', 'official', 26),
+    ('government_dashboard', 'government', 10),
+]
+CSRF = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+
+
+class VirtualUser:
+    def __init__(self, base, manifest, rng, timeout):
+        self.base = base
+        self.manifest = manifest
+        self.rng = rng
+        self.timeout = timeout
+        self.sessions = {}
+        self.tokens = {}
+
+    def request(self, role, method, path, **kwargs):
+        return self.sessions[role].request(method, self.base + path, allow_redirects=False,
+                                           timeout=self.timeout, **kwargs)
+
+    def login(self, role):
+        """Log `role` in on a fresh session; returns the response of the login POST."""
+        session = self.sessions[role] = requests.Session()
+        manifest = self.manifest
+        if role == 'citizen':
+            path, data = '/', {'dni': self.rng.choice(manifest['citizens'])['dni']}
+        else:
+            departments = ['Gobierno'] if role == 'government' else \
+                [d for d in manifest['officials'] if d != 'Gobierno']
+            path, data = '/official/login', {
+                'badge_id': self.rng.choice(manifest['officials'][self.rng.choice(departments)])}
+        page = session.get(self.base + path, timeout=self.timeout)
+        match = CSRF.search(page.text)
+        # The token is tied to the session, so the login page's one serves every later form.
+        self.tokens[role] = match.group(1) if match else ''
+        data.update(password=manifest['password'], csrf_token=self.tokens[role])
+        return self.request(role, 'POST', path, data=data)
+
+    def run(self, action):
+        manifest, rng = self.manifest, self.rng
+        if action == 'banking_dashboard':
+            return self.request('citizen', 'GET', '/banking')
+        if action == 'banking_transfer':
+            return self.request('citizen', 'POST', '/banking/transfer', data={
+                'account_number': rng.choice(manifest['accounts']), 'amount': round(rng.uniform(1, 20), 2),
+                'csrf_token': self.tokens['citizen']})
+        if action == 'lottery_buy':
+            return self.request('citizen', 'POST', '/lottery/buy', data={
+                'numbers': f'{rng.randrange(100000):05d}', 'csrf_token': self.tokens['citizen']})
+        if action == 'official_database':
+            return self.request('official', 'GET', '/official/database',
+                                params={'query': rng.choice(manifest['search_terms'])})
+        if action == 'citizen_profile':
+            return self.request('official', 'GET', f"/official/citizen/{rng.choice(manifest['citizens'])['id']}")
+        return self.request('government', 'GET', '/government/dashboard')
+
+
+def succeeded(action, response):
+    # POSTs answer with a redirect back to their page; a GET redirected means the session was lost.
+    if action in ('login', 'banking_transfer', 'lottery_buy'):
+        return response.status_code == 302
+    return response.status_code == 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--manifest', default=os.path.join('instance', 'synthetic.json'))
+    parser.add_argument('--users', type=int, default=16, help='Usuarios virtuales concurrentes.')
+    parser.add_argument('--duration', type=float, default=30, help='Segundos de carga.')
+    parser.add_argument('--think', type=float, default=0.0, help='Pausa media entre acciones, en segundos.')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with open(args.manifest, encoding='utf-8') as f:
+        manifest = json.load(f)
+    names = [name for name, _, _ in ACTIONS]
+    roles = {name: role for name, role, _ in ACTIONS}
+    weights = [weight for _, _, weight in ACTIONS]
+
+    latencies = {name: [] for name in ['login'] + names}
+    errors = {name: 0 for name in latencies}
+    lock = threading.Lock()
+    ready = threading.Barrier(args.users + 1)
+    stop = threading.Event()
+
+    def record(action, started, response):
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies[action].append(elapsed)
+            if response is None or not succeeded(action, response):
+                errors[action] += 1
+
+    def timed(action, call):
+        started = time.perf_counter()
+        try:
+            response = call()
+        except requests.RequestException:
+            response = None
+        record(action, started, response)
+        return response
+
+    def virtual_user(seed):
+        user = VirtualUser(args.url.rstrip('/'), manifest, random.Random(seed), args.timeout)
+        for role in ('citizen', 'official', 'government'):
+            timed('login', lambda: user.login(role))
+        ready.wait()
+        while not stop.is_set():
+            action = user.rng.choices(names, weights=weights)[0]
+            response = timed(action, lambda: user.run(action))
+            if response is not None and response.status_code == 302 and \
+                    action not in ('banking_transfer', 'lottery_buy'):
+                timed('login', lambda: user.login(roles[action]))
+            if args.think:
+                time.sleep(user.rng.expovariate(1 / args.think))
+
+    threads = [threading.Thread(target=virtual_user, args=(args.seed * 1000 + i,)) for i in range(args.users)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(f'{args.users} usuarios, {elapsed:.0f}s contra {args.url}')
+    print(f'{"Acción":<22} {"peticiones":>10} {"errores":>8} {"req/s":>8} {"p50":>9} {"p95":>9} {"p99":>9}')
+    every = [value for name in names for value in latencies[name]]
+    for name, values in latencies.items():
+        print(f'{name:<22} {len(values):>10} {errors[name]:>8} {len(values) / elapsed:>8.1f} '
+              f'{percentile(values, 50) * 1000:>7.1f}ms {percentile(values, 95) * 1000:>7.1f}ms '
+              f'{percentile(values, 99) * 1000:>7.1f}ms')
+    print(f'{"total (sin login)":<22} {len(every):>10} {sum(errors[n] for n in names):>8} '
+          f'{len(every) / elapsed:>8.1f} {percentile(every, 50) * 1000:>7.1f}ms '
+          f'{percentile(every, 95) * 1000:>7.1f}ms {percentile(every, 99) * 1000:>7.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Login throughput for candidate PASSWORD_HASH_METHOD values, to pick the hashing cost.
+
+For each method: the cost of one hash, then a login storm of `--concurrency` clients posting
+to the citizen login while one more client keeps requesting a cheap page, so the table shows
+both how many logins/s the method allows and how much the storm slows everything else down
+with and without the bounded verification pool (PASSWORD_VERIFY_WORKERS).
+
+    python -m benchmarks.login_throughput
+    python -m benchmarks.login_throughput --method scrypt:16384:8:1 --method pbkdf2:sha256:600000 --workers 0 --workers 2
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.common import bench_app, percentile
+
+DEFAULT_METHODS = ['pbkdf2:sha256:600000', 'scrypt:16384:8:1', 'scrypt:32768:8:1']
+PASSWORD = 'contraseña-de-prueba'
+
+
+def run_storm(app, users, logins, concurrency):
+    """Returns (login latencies, background page latencies, busy responses, elapsed seconds)."""
+    login_latencies, page_latencies = [], []
+    busy = [0]
+    lock = threading.Lock()
+    remaining = iter(range(logins))
+    done = threading.Event()
+
+    def login_client():
+        client = app.test_client()
+        while True:
+            with lock:
+                i = next(remaining, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            response = client.post('/', data={'dni': f'L{i % users:07d}', 'password': PASSWORD})
+            elapsed = time.perf_counter() - start
+            with lock:
+                login_latencies.append(elapsed)
+                if response.status_code != 302:
+                    raise RuntimeError(f'login devolvió {response.status_code}')
+            client.get('/logout')
+            with client.session_transaction() as session:
+                if any('demasiados' in message for _, message in session.get('_flashes', [])):
+                    busy[0] += 1
+                session.clear()
+
+    def page_client():
+        client = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/')
+            page_latencies.append(time.perf_counter() - start)
+
+    background = threading.Thread(target=page_client)
+    threads = [threading.Thread(target=login_client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    background.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    background.join()
+    return login_latencies, page_latencies, busy[0], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--method', action='append', help='Método a probar (repetible).')
+    parser.add_argument('--workers', action='append', type=int, help='PASSWORD_VERIFY_WORKERS a probar (repetible).')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+    methods = args.method or DEFAULT_METHODS
+    worker_counts = args.workers or [0, 2]
+
+    print(f'{"Método":<24} {"hash ms":>8} {"hilos":>5} {"logins/s":>9} {"login p50":>10} '
+          f'{"login p95":>10} {"página p95":>11} {"ocupado":>8}')
+    for method in methods:
+        for workers in worker_counts:
+            app = bench_app(PASSWORD_HASH_METHOD=method, PASSWORD_VERIFY_WORKERS=workers)
+            from app import db
+            from app.models import User
+            from app.passwords import hash_password
+            from sqlalchemy import insert
+
+            with app.app_context():
+                start = time.perf_counter()
+                password_hash = hash_password(PASSWORD)
+                hash_ms = (time.perf_counter() - start) * 1000
+                db.session.execute(insert(User), [
+                    {'first_name': 'Bench', 'last_name': str(i), 'dni': f'L{i:07d}', 'password_hash': password_hash}
+                    for i in range(args.users)
+                ])
+                db.session.commit()
+
+            logins, pages, busy, elapsed = run_storm(app, args.users, args.logins, args.concurrency)
+            print(f'{method:<24} {hash_ms:>8.1f} {workers:>5} {len(logins) / elapsed:>9.1f} '
+                  f'{percentile(logins, 50) * 1000:>8.0f}ms {percentile(logins, 95) * 1000:>8.0f}ms '
+                  f'{percentile(pages, 95) * 1000:>9.1f}ms {busy:>8}')
+
+
+if __name__ == '__main__':
+    main()
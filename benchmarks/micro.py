@@ -0,0 +1,305 @@
+"""
+Micro-benchmarks for helpers and hot paths, with a stored baseline and regression thresholds.
+
+Each case runs `--rounds` timed rounds (after one warm-up) and keeps the median and the best
+time per operation. `--save` stores them as the baseline; a normal run compares against it
+and exits with status 1 when a case's median is more than its threshold slower.
+
+    python -m benchmarks.micro --save                  # on the commit before the change
+    python -m benchmarks.micro                         # after it: table + regressions
+    python -m benchmarks.micro --case pdf_render --case banking_render
+
+Baselines depend on the machine, so the default file lives in instance/ (not versioned);
+compare runs made on the same machine only.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from benchmarks.common import bench_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, 'instance', 'micro_baseline.json')
+DEFAULT_THRESHOLD = 0.20
+# Cases dominated by CPU-bound C code or by disk vary more from run to run.
+THRESHOLDS = {'password_hash': 0.30, 'pdf_render': 0.30}
+PASSWORD = 'contraseña-de-prueba'
+
+
+def _citizens(count, prefix):
+    from sqlalchemy import insert
+
+    from app import db
+    from app.accounts import allocate_account_numbers
+    from app.models import BankAccount, User
+
+    db.session.execute(insert(User), [
+        {'first_name': 'Micro', 'last_name': str(i), 'dni': f'{prefix}{i:07d}'} for i in range(count)
+    ])
+    users = User.query.filter(User.dni.like(f'{prefix}%')).order_by(User.id).all()
+    numbers = allocate_account_numbers(len(users))
+    db.session.execute(insert(BankAccount), [
+        {'account_number': number, 'balance': 10000.0, 'user_id': user.id} for number, user in zip(numbers, users)
+    ])
+    db.session.commit()
+    return users
+
+
+# Every case takes (app, args) inside an app context and returns (operations, run, reset):
+# `run()` does `operations` operations and is timed; `reset()` restores the state before each round.
+
+def case_account_numbers(app, args):
+    """Allocate and commit one account number at a time."""
+    from app import db
+    from app.accounts import allocate_account_number
+
+    def run():
+        for _ in range(args.allocations):
+            allocate_account_number()
+            db.session.commit()
+
+    return args.allocations, run, None
+
+
+def case_loan_penalties(app, args):
+    """One sweep over `--loans` overdue loans."""
+    from sqlalchemy import insert, update
+
+    from app import db
+    from app.loans import sweep_loan_penalties
+    from app.models import BankLoan
+
+    users = _citizens(args.loans, 'P')
+    now = datetime.utcnow()
+    due = now - timedelta(days=9)
+    db.session.execute(insert(BankLoan), [
+        {'account_id': user.bank_account.id, 'amount_due': 6000.0, 'start_date': due - timedelta(days=14),
+         'due_date': due, 'status': 'Active'} for user in users
+    ])
+    db.session.commit()
+
+    def reset():
+        db.session.execute(update(BankLoan).values(amount_due=6000.0, last_penalty_check=None))
+        db.session.commit()
+
+    return 1, lambda: sweep_loan_penalties(now=now), reset
+
+
+def case_lottery_draw(app, args):
+    """The daily draw over `--tickets` tickets, with winners to pay."""
+    from sqlalchemy import delete, insert, update
+
+    from app import db
+    from app.lottery import BASE_JACKPOT, get_lottery, run_daily_draw
+    from app.models import LotteryDraw, LotteryNumberCount, LotteryTicket
+
+    users = _citizens(200, 'T')
+    today = datetime.utcnow().date()
+    day = today - timedelta(days=1)
+    winning = ''.join(random.Random(args.seed).choices(string.digits, k=5))
+    rng = random.Random(args.seed)
+    tickets = [{'user_id': rng.choice(users).id, 'numbers': f'{rng.randrange(100000):05d}', 'date': day}
+               for _ in range(args.tickets)]
+    tickets += [{'user_id': user.id, 'numbers': winning, 'date': day} for user in users[:20]]
+    db.session.execute(insert(LotteryTicket), tickets)
+    counts = {}
+    for ticket in tickets:
+        counts[ticket['numbers']] = counts.get(ticket['numbers'], 0) + 1
+    db.session.execute(insert(LotteryNumberCount), [
+        {'date': day, 'numbers': numbers, 'count': count} for numbers, count in counts.items()
+    ])
+    lottery = get_lottery()
+
+    def reset():
+        db.session.execute(delete(LotteryDraw))
+        db.session.execute(update(type(lottery)).values(last_run_date=day, current_jackpot=BASE_JACKPOT))
+        db.session.commit()
+
+    return 1, lambda: run_daily_draw(today=today, rng=random.Random(args.seed)), reset
+
+
+def case_pdf_render(app, args):
+    """A criminal-record PDF with `--photos` photos, warm shared resources."""
+    from app.pdfs import PdfResources, render_criminal_record
+    from benchmarks.pdf_render import make_photos
+
+    directory = tempfile.mkdtemp(prefix='hermes-micro-')
+    names = make_photos(directory, args.photos, (1600, 1200))
+    half = len(names) // 2
+    citizen = SimpleNamespace(first_name='José', last_name='Núñez', dni='12345678')
+    records = [SimpleNamespace(crime='Robo a mano armada', penal_code='CP-101', report_text='Informe ' * 40,
+                               date=datetime(2024, 1, 1),
+                               subject_photos=[SimpleNamespace(filename=n) for n in names[:half]],
+                               evidence_photos=[SimpleNamespace(filename=n) for n in names[half:]])]
+    resources = PdfResources()
+    return 1, lambda: render_criminal_record(citizen, records, directory, resources), None
+
+
+def case_password_hash(app, args):
+    """hash_password with the configured PASSWORD_HASH_METHOD."""
+    from app.passwords import hash_password
+
+    return 1, lambda: hash_password(PASSWORD), None
+
+
+def case_banking_render(app, args):
+    """banking.html with `--rows` transactions in the list, no database access."""
+    from flask import render_template
+    from flask_login import login_user
+
+    from app.forms import (CardCustomizationForm, LoanForm, LoanRepayForm, SavingsForm, TransactionFilterForm,
+                           TransferForm)
+    from app.models import BankTransaction
+
+    user = _citizens(1, 'R')[0]
+    account = user.bank_account
+    rng = random.Random(args.seed)
+    start = datetime(2024, 1, 1)
+    kinds = ['transfer_in', 'transfer_out', 'salary', 'lottery_ticket', 'interest']
+    transactions = [BankTransaction(account_id=account.id, type=rng.choice(kinds), amount=round(rng.uniform(1, 5000), 2),
+                                    description='Transferencia de prueba', timestamp=start + timedelta(minutes=i))
+                    for i in range(args.rows)]
+
+    def run():
+        with app.test_request_context('/banking'):
+            login_user(user)
+            render_template('banking.html', account=account, transfer_form=TransferForm(), loan_form=LoanForm(),
+                            repay_form=LoanRepayForm(), savings_form=SavingsForm(),
+                            card_form=CardCustomizationForm(), active_loan=None, savings_deposits=[],
+                            transactions=transactions, next_cursor='x', filter_form=TransactionFilterForm())
+
+    return 1, run, None
+
+
+def case_banking_page(app, args):
+    """GET /banking for an account with `--history` transactions: query, page and render."""
+    from sqlalchemy import insert
+
+    from app import db
+    from app.models import BankTransaction
+
+    user = _citizens(1, 'B')[0]
+    start = datetime.utcnow() - timedelta(days=365)
+    db.session.execute(insert(BankTransaction), [
+        {'account_id': user.bank_account.id, 'type': 'transfer_in', 'amount': 10.0,
+         'description': 'Transferencia de prueba', 'timestamp': start + timedelta(minutes=i)}
+        for i in range(args.history)
+    ])
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+
+    def run():
+        response = client.get('/banking')
+        if response.status_code != 200:
+            raise RuntimeError(f'/banking devolvió {response.status_code}')
+
+    return 1, run, None
+
+
+CASES = {
+    'account_numbers': case_account_numbers,
+    'loan_penalties': case_loan_penalties,
+    'lottery_draw': case_lottery_draw,
+    'pdf_render': case_pdf_render,
+    'password_hash': case_password_hash,
+    'banking_render': case_banking_render,
+    'banking_page': case_banking_page,
+}
+
+
+def measure(app, name, args):
+    operations, run, reset = CASES[name](app, args)
+    timings = []
+    for round_ in range(args.rounds + 1):
+        if reset:
+            reset()
+        start = time.perf_counter()
+        run()
+        elapsed = (time.perf_counter() - start) / operations
+        if round_:  # the first round only warms caches
+            timings.append(elapsed)
+    return {'median_ms': statistics.median(timings) * 1000, 'best_ms': min(timings) * 1000}
+
+
+def describe_machine():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'commit': commit, 'python': platform.python_version(), 'machine': platform.node(),
+            'date': datetime.utcnow().isoformat(timespec='seconds')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--case', action='append', choices=list(CASES), help='Caso a ejecutar (repetible).')
+    parser.add_argument('--rounds', type=int, default=7)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save', action='store_true', help='Guarda los resultados como nueva línea base.')
+    parser.add_argument('--threshold', type=float, help='Regresión tolerada para todos los casos (0.2 = 20%%).')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--allocations', type=int, default=200, help='account_numbers: números por ronda.')
+    parser.add_argument('--loans', type=int, default=1000, help='loan_penalties: préstamos vencidos.')
+    parser.add_argument('--tickets', type=int, default=20000, help='lottery_draw: boletos del día.')
+    parser.add_argument('--photos', type=int, default=10, help='pdf_render: fotos en el informe.')
+    parser.add_argument('--rows', type=int, default=1000, help='banking_render: transacciones en la lista.')
+    parser.add_argument('--history', type=int, default=50000, help='banking_page: historial de la cuenta.')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    previous = baseline.get('cases', {})
+    if previous:
+        meta = baseline.get('machine', {})
+        print(f"Línea base: {meta.get('commit') or '?'} del {meta.get('date', '?')} ({args.baseline})")
+
+    results = {}
+    regressions = []
+    print(f'{"Caso":<16} {"mediana":>11} {"mejor":>11} {"base":>11} {"cambio":>8}')
+    for name in args.case or CASES:
+        # A fresh app and database per case, so no case sees another's rows.
+        app = bench_app()
+        with app.app_context():
+            results[name] = measure(app, name, args)
+        median = results[name]['median_ms']
+        line = f'{name:<16} {median:>9.3f}ms {results[name]["best_ms"]:>9.3f}ms'
+        if name in previous:
+            base = previous[name]['median_ms']
+            change = median / base - 1
+            threshold = args.threshold if args.threshold is not None else THRESHOLDS.get(name, DEFAULT_THRESHOLD)
+            flag = '  REGRESIÓN' if change > threshold else ''
+            if flag:
+                regressions.append(name)
+            line += f' {base:>9.3f}ms {change:>+7.1%}{flag}'
+        print(line)
+
+    if args.save:
+        cases = dict(previous)
+        cases.update(results)
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'machine': describe_machine(), 'cases': cases}, f, indent=1)
+        print(f'Línea base guardada en {args.baseline}')
+    elif regressions:
+        print(f'{len(regressions)} casos por encima del umbral: {", ".join(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
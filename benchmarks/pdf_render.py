@@ -0,0 +1,75 @@
+"""
+Criminal-record PDF throughput for a citizen with `--photos` photos (default 20).
+
+Compares rendering without shared resources (every photo decoded and compressed again)
+against app/pdfs.PdfResources with a warm per-process cache. The disk PDF cache is not
+involved: every iteration is a full render.
+
+    python -m benchmarks.pdf_render --photos 20 --iterations 20
+    python -m benchmarks.pdf_render --font /path/DejaVuSans.ttf
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from PIL import Image
+
+from benchmarks.common import percentile
+
+
+def make_photos(directory, count, size):
+    names = []
+    for i in range(count):
+        noise = Image.effect_noise(size, 40 + i)
+        photo = Image.merge('RGB', (noise, noise.rotate(90, expand=False), noise.transpose(Image.FLIP_LEFT_RIGHT)))
+        name = f'photo{i}.{"png" if i % 2 else "jpg"}'
+        photo.save(os.path.join(directory, name))
+        names.append(name)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--photos', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--size', type=int, nargs=2, default=(2000, 1500), metavar=('W', 'H'))
+    parser.add_argument('--font', help='TTF a usar (por defecto Arial de fpdf).')
+    args = parser.parse_args()
+
+    from app.pdfs import PdfResources, render_criminal_record
+
+    directory = tempfile.mkdtemp(prefix='hermes-pdf-')
+    names = make_photos(directory, args.photos, tuple(args.size))
+    half = len(names) // 2
+    citizen = SimpleNamespace(first_name='José', last_name='Núñez', dni='12345678')
+    records = [
+        SimpleNamespace(crime='Robo a mano armada', penal_code='CP-101', report_text='Informe ' * 40,
+                        date=datetime.utcnow(),
+                        subject_photos=[SimpleNamespace(filename=n) for n in names[:half]],
+                        evidence_photos=[SimpleNamespace(filename=n) for n in names[half:]])
+    ]
+
+    def run(label, resources):
+        timings, size = [], 0
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            size = len(render_criminal_record(citizen, records, directory, resources))
+            timings.append(time.perf_counter() - start)
+        total = sum(timings)
+        print(f'{label:28} {args.iterations / total:7.2f} PDF/s  p50={percentile(timings, 50) * 1000:8.1f} ms  '
+              f'tamaño={size / 1024:8.0f} KiB')
+
+    run('Sin caché compartida', None)
+    resources = PdfResources(font_path=args.font)
+    start = time.perf_counter()
+    render_criminal_record(citizen, records, directory, resources)
+    print(f'{"Primer render (caché fría)":28} {(time.perf_counter() - start) * 1000:8.1f} ms')
+    run('Caché compartida (caliente)', resources)
+    print(f'Imágenes: {resources.image_hits} aciertos, {resources.image_misses} fallos')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Multi-process write throughput on one SQLite file, the way several gunicorn workers share
+instance/hermes.db: SQLite's stock settings against the production mode of app/database.py
+(WAL + pragmas), with and without the per-process writer queue.
+
+Each process runs `--threads` threads doing transfers through balances.run_atomic plus a
+history read per transfer. A transfer that still fails after the retries counts as an error.
+
+    python -m benchmarks.sqlite_writes --processes 4 --threads 4 --transfers 100
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+from benchmarks.common import bench_app, percentile
+
+MODES = {
+    # What the app ran with before the production mode: rollback journal, sqlite3's 5 s timeout.
+    'por defecto': {'DB_SQLITE_TUNED': '0', 'DB_SQLITE_BUSY_TIMEOUT': '5'},
+    'WAL': {'DB_SQLITE_TUNED': '1', 'DB_SQLITE_SERIALIZE_WRITES': '0'},
+    'WAL + cola': {'DB_SQLITE_TUNED': '1', 'DB_SQLITE_SERIALIZE_WRITES': '1'},
+}
+
+
+def run_process(url, overrides, account_ids, threads, transfers, seed):
+    app = bench_app(database_url=url, **overrides)
+    from app import balances, db
+    from app.history import transaction_page
+    from app.models import BankAccount, BankTransaction
+
+    latencies, outcomes = [], {'ok': 0, 'insufficient': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def worker(worker_seed):
+        rng = random.Random(worker_seed)
+        with app.app_context():
+            for _ in range(transfers):
+                source_id, target_id = rng.sample(account_ids, 2)
+                amount = round(rng.uniform(1, 50), 2)
+
+                def do_transfer():
+                    source = db.session.get(BankAccount, source_id)
+                    target = db.session.get(BankAccount, target_id)
+                    balances.transfer(source, target, amount)
+                    db.session.add(BankTransaction(account_id=source_id, type='transfer_out', amount=amount))
+                    db.session.add(BankTransaction(account_id=target_id, type='transfer_in', amount=amount))
+
+                started = time.perf_counter()
+                try:
+                    balances.run_atomic(do_transfer)
+                    outcome = 'ok'
+                except balances.InsufficientFunds:
+                    outcome = 'insufficient'
+                except Exception:
+                    outcome = 'errors'
+                transaction_page(source_id)
+                db.session.rollback()
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+                    outcomes[outcome] += 1
+            db.session.remove()
+
+    pool = [threading.Thread(target=worker, args=(seed * 1000 + i,)) for i in range(threads)]
+    # Wall-clock bounds so the parent can leave process start-up out of the throughput.
+    started = time.time()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return latencies, outcomes, started, time.time()
+
+
+def run_mode(name, overrides, args):
+    tmp = tempfile.mkdtemp(prefix='hermes-sqlite-')
+    url = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+    app = bench_app(database_url=url, **overrides)
+    from app import db
+    from app.models import BankAccount, User
+
+    with app.app_context():
+        for i in range(args.accounts):
+            user = User(first_name=f'Bench{i}', last_name='SQLite', dni=f'S{i:06d}')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(BankAccount(account_number=f'8{i:09d}', balance=1000.0, user_id=user.id))
+        db.session.commit()
+        account_ids = [a.id for a in BankAccount.query.all()]
+        db.session.remove()
+        db.engine.dispose()
+
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(args.processes) as pool:
+        results = pool.starmap(run_process, [
+            (url, overrides, account_ids, args.threads, args.transfers, seed) for seed in range(args.processes)
+        ])
+    wall = max(result[3] for result in results) - min(result[2] for result in results)
+
+    latencies = [value for result in results for value in result[0]]
+    outcomes = {key: sum(result[1][key] for result in results) for key in ('ok', 'insufficient', 'errors')}
+    committed = outcomes['ok'] + outcomes['insufficient']
+    print(f'{name:<12} {committed / wall:>9.0f} {percentile(latencies, 50) * 1000:>8.1f}ms '
+          f'{percentile(latencies, 95) * 1000:>8.1f}ms {percentile(latencies, 99) * 1000:>8.1f}ms {outcomes["errors"]:>7}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4, help='Hilos por proceso.')
+    parser.add_argument('--transfers', type=int, default=100, help='Transferencias por hilo.')
+    parser.add_argument('--accounts', type=int, default=50)
+    parser.add_argument('--mode', action='append', choices=list(MODES), help='Modo a probar (repetible).')
+    args = parser.parse_args()
+
+    print(f'{args.processes} procesos x {args.threads} hilos x {args.transfers} transferencias')
+    print(f'{"Modo":<12} {"escrit/s":>9} {"p50":>10} {"p95":>10} {"p99":>10} {"errores":>7}')
+    for name in args.mode or MODES:
+        run_mode(name, MODES[name], args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Concurrency stress test for app/balances.py.
+
+Fires random transfers between a small set of accounts from many threads and then checks
+that money was conserved and that no account went negative.
+
+    python -m benchmarks.transfer_stress --threads 16 --transfers 200
+    BENCH_DATABASE_URL=postgresql://... python -m benchmarks.transfer_stress
+"""
+import argparse
+import random
+import threading
+import time
+
+from benchmarks.common import bench_app, percentile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accounts', type=int, default=10)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--transfers', type=int, default=200, help='Transferencias por hilo.')
+    parser.add_argument('--initial-balance', type=float, default=1000.0)
+    args = parser.parse_args()
+
+    app = bench_app()
+    from app import balances, db
+    from app.models import BankAccount, BankTransaction, User
+    from sqlalchemy import func
+
+    with app.app_context():
+        for i in range(args.accounts):
+            user = User(first_name=f'Bench{i}', last_name='Stress', dni=f'B{i:06d}')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(BankAccount(account_number=f'9{i:09d}', balance=args.initial_balance, user_id=user.id))
+        db.session.commit()
+        account_ids = [a.id for a in BankAccount.query.all()]
+        expected_total = args.initial_balance * args.accounts
+
+    stats = {'ok': 0, 'insufficient': 0, 'errors': 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        with app.app_context():
+            for _ in range(args.transfers):
+                source_id, target_id = rng.sample(account_ids, 2)
+                amount = round(rng.uniform(1, args.initial_balance / 2), 2)
+                started = time.perf_counter()
+
+                def do_transfer():
+                    source = db.session.get(BankAccount, source_id)
+                    target = db.session.get(BankAccount, target_id)
+                    balances.transfer(source, target, amount)
+                    db.session.add(BankTransaction(account_id=source_id, type='transfer_out', amount=amount))
+                    db.session.add(BankTransaction(account_id=target_id, type='transfer_in', amount=amount))
+
+                try:
+                    balances.run_atomic(do_transfer, attempts=8)
+                    outcome = 'ok'
+                except balances.InsufficientFunds:
+                    outcome = 'insufficient'
+                except Exception:
+                    outcome = 'errors'
+                elapsed = time.perf_counter() - started
+                with lock:
+                    stats[outcome] += 1
+                    latencies.append(elapsed)
+            db.session.remove()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    with app.app_context():
+        total = db.session.query(func.sum(BankAccount.balance)).scalar()
+        negative = BankAccount.query.filter(BankAccount.balance < 0).count()
+
+    attempts = sum(stats.values())
+    print(f"{attempts} transferencias en {wall:.2f}s ({attempts / wall:.0f}/s) con {args.threads} hilos")
+    print(f"  ok={stats['ok']} fondos_insuficientes={stats['insufficient']} errores={stats['errors']}")
+    print(f"  latencia p50={percentile(latencies, 50) * 1000:.1f}ms p95={percentile(latencies, 95) * 1000:.1f}ms "
+          f"p99={percentile(latencies, 99) * 1000:.1f}ms")
+    print(f"  total esperado={expected_total:,.2f} total final={total:,.2f} cuentas negativas={negative}")
+
+    assert abs(total - expected_total) < 0.01, 'El dinero no se conservó'
+    assert negative == 0, 'Hay cuentas con saldo negativo'
+    print('OK: dinero conservado.')
+
+
+if __name__ == '__main__':
+    main()
@@ -11,4 +11,95 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'instance', 'hermes.db')
     
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Perfil del motor (app/database.py): valores por defecto distintos para PostgreSQL y SQLite;
+    # estas variables los sobrescriben. Ojo: cada proceso de gunicorn y el worker tienen su propio
+    # pool, así que (DB_POOL_SIZE + DB_MAX_OVERFLOW) * procesos debe caber en max_connections.
+    DB_POOL_SIZE = os.environ.get('DB_POOL_SIZE')
+    DB_MAX_OVERFLOW = os.environ.get('DB_MAX_OVERFLOW')
+    DB_POOL_TIMEOUT = os.environ.get('DB_POOL_TIMEOUT')
+    DB_POOL_RECYCLE = os.environ.get('DB_POOL_RECYCLE')
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING')
+    DB_STATEMENT_TIMEOUT_MS = os.environ.get('DB_STATEMENT_TIMEOUT_MS')
+    DB_SQLITE_BUSY_TIMEOUT = os.environ.get('DB_SQLITE_BUSY_TIMEOUT')
+    # Modo producción de SQLite: WAL, synchronous=NORMAL, mmap y un solo escritor por proceso.
+    # DB_SQLITE_TUNED=0 deja SQLite con su configuración de fábrica.
+    DB_SQLITE_TUNED = os.environ.get('DB_SQLITE_TUNED')
+    DB_SQLITE_MMAP_SIZE = os.environ.get('DB_SQLITE_MMAP_SIZE')
+    DB_SQLITE_CACHE_KIB = os.environ.get('DB_SQLITE_CACHE_KIB')
+    DB_SQLITE_SERIALIZE_WRITES = os.environ.get('DB_SQLITE_SERIALIZE_WRITES')
+
+    # Notificaciones de Discord: se guardan en el outbox y las envía `flask worker`.
+    BOT_URL = os.environ.get('BOT_URL')
+    # Token compartido con el bot para /api/citizens/lookup (`Authorization: Bearer <token>`). Sin él, la ruta responde 401.
+    BOT_API_TOKEN = os.environ.get('BOT_API_TOKEN')
+    NOTIFY_POLL_INTERVAL = float(os.environ.get('NOTIFY_POLL_INTERVAL', 1))
+    NOTIFY_BATCH_SIZE = int(os.environ.get('NOTIFY_BATCH_SIZE', 50))
+    NOTIFY_CONCURRENCY = int(os.environ.get('NOTIFY_CONCURRENCY', 4))
+    NOTIFY_TIMEOUT = float(os.environ.get('NOTIFY_TIMEOUT', 5))
+    NOTIFY_MAX_ATTEMPTS = int(os.environ.get('NOTIFY_MAX_ATTEMPTS', 8))
+    NOTIFY_BREAKER_THRESHOLD = int(os.environ.get('NOTIFY_BREAKER_THRESHOLD', 5))
+    NOTIFY_BREAKER_COOLDOWN = float(os.environ.get('NOTIFY_BREAKER_COOLDOWN', 60))
+
+    # Cada cuánto el worker agrega las transacciones nuevas en los rollups diarios.
+    ROLLUP_INTERVAL = float(os.environ.get('ROLLUP_INTERVAL', 60))
+
+    # Cada cuánto el worker aplica los cargos por mora de préstamos vencidos.
+    LOAN_SWEEP_INTERVAL = float(os.environ.get('LOAN_SWEEP_INTERVAL', 3600))
+
+    # Cada cuánto el worker comprueba si toca el sorteo diario de la lotería.
+    LOTTERY_DRAW_INTERVAL = float(os.environ.get('LOTTERY_DRAW_INTERVAL', 60))
+
+    # Clave de la permutación de números de cuenta (app/accounts.py). Se guarda en la base de datos
+    # (app_setting) la primera vez; si se define después, debe coincidir con la guardada.
+    ACCOUNT_NUMBER_KEY = os.environ.get('ACCOUNT_NUMBER_KEY')
+
+    # En tests: cualquier relación no prevista por app/profiles.py lanza error en lugar de cargarse perezosamente.
+    PROFILE_STRICT_LOADING = os.environ.get('PROFILE_STRICT_LOADING', '0') == '1'
+
+    # Caché por proceso del usuario autenticado (app/identity.py). TTL 0 la desactiva.
+    IDENTITY_CACHE_TTL = float(os.environ.get('IDENTITY_CACHE_TTL', 30))
+    IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 1024))
+
+    # Caché en disco de PDFs generados (app/pdfs.py). Por defecto en instance/pdf_cache.
+    PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR')
+    PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+    # Fuente TTF para los PDFs (nombres con tildes/ñ fuera de latin-1). Sin ella se usa Arial.
+    PDF_FONT_PATH = os.environ.get('PDF_FONT_PATH')
+    PDF_BOLD_FONT_PATH = os.environ.get('PDF_BOLD_FONT_PATH')
+    # Lado mayor (px) al que se reescalan las fotos antes de incrustarlas.
+    PDF_IMAGE_PX = int(os.environ.get('PDF_IMAGE_PX', 600))
+
+    # Variantes de imágenes subidas (app/images.py). IMAGE_WORKERS 0 = un proceso por CPU.
+    IMAGE_POLL_INTERVAL = float(os.environ.get('IMAGE_POLL_INTERVAL', 2))
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 0))
+    IMAGE_BATCH_SIZE = int(os.environ.get('IMAGE_BATCH_SIZE', 32))
+
+    # Hash de contraseñas (app/passwords.py): 'scrypt:N:r:p' o 'pbkdf2:sha256:iteraciones'. Los hashes con
+    # otro método o coste se regeneran al iniciar sesión. Elegir con benchmarks/login_throughput.py.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # Hilos dedicados a verificar contraseñas (0 = en el hilo de la petición), cola y espera máxima en segundos.
+    PASSWORD_VERIFY_WORKERS = int(os.environ.get('PASSWORD_VERIFY_WORKERS', 2))
+    PASSWORD_VERIFY_QUEUE = int(os.environ.get('PASSWORD_VERIFY_QUEUE', 16))
+    PASSWORD_VERIFY_WAIT = float(os.environ.get('PASSWORD_VERIFY_WAIT', 5))
+
+    # Perfil SQL por petición (app/profiling.py): fracción de peticiones perfiladas (0 = desactivado),
+    # umbral de log en ms y repeticiones de una misma consulta para marcarla como N+1.
+    # Con SQL_PROFILE_HEADER=1 se puede forzar con `X-SQL-Profile: 1` y se añaden cabeceras de depuración.
+    SQL_PROFILE_SAMPLE_RATE = float(os.environ.get('SQL_PROFILE_SAMPLE_RATE', 0.01))
+    SQL_PROFILE_HEADER = os.environ.get('SQL_PROFILE_HEADER', '0') == '1'
+    SQL_PROFILE_SLOW_MS = float(os.environ.get('SQL_PROFILE_SLOW_MS', 100))
+    SQL_PROFILE_N_PLUS_ONE = int(os.environ.get('SQL_PROFILE_N_PLUS_ONE', 5))
+
+    # Métricas Prometheus en /metrics (app/metrics.py). Cada proceso (gunicorn, worker) vuelca sus
+    # contadores en METRICS_DIR (por defecto instance/metrics) y /metrics los suma todos.
+    # Con METRICS_TOKEN definido, /metrics exige `Authorization: Bearer <token>`; sin él solo acepta
+    # peticiones desde localhost. En Windows (sin fcntl) cada proceso expone solo sus propias métricas.
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Genera app/static/dist al arrancar si falta o está desactualizado (app/assets.py).
+    ASSETS_AUTO_BUILD = os.environ.get('ASSETS_AUTO_BUILD', '1') == '1'
@@ -0,0 +1,53 @@
+"""Shard economy aggregates into slots
+
+Revision ID: b7e2d9f4a6c3
+Revises: a9c3e5f7b1d2
+Create Date: 2026-10-18 20:14:09.603127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d9f4a6c3'
+down_revision = 'a9c3e5f7b1d2'
+branch_labels = None
+depends_on = None
+
+
+def _read(summed=False):
+    old = sa.table('economy_aggregate', sa.column('name', sa.String), sa.column('value', sa.Float),
+                   sa.column('updated_at', sa.DateTime))
+    if summed:
+        query = sa.select(old.c.name, sa.func.sum(old.c.value).label('value'),
+                          sa.func.max(old.c.updated_at).label('updated_at')).group_by(old.c.name)
+    else:
+        query = sa.select(old.c.name, old.c.value, old.c.updated_at)
+    return [dict(row) for row in op.get_bind().execute(query).mappings()]
+
+
+def _create_table(*slot_columns):
+    return op.create_table('economy_aggregate',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    *slot_columns,
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name', *(column.name for column in slot_columns))
+    )
+
+
+def upgrade():
+    # The primary key changes, which SQLite cannot alter in place: copy the counters into the
+    # new table, each one in slot 0.
+    rows = _read()
+    op.drop_table('economy_aggregate')
+    table = _create_table(sa.Column('slot', sa.Integer(), autoincrement=False, nullable=False))
+    op.bulk_insert(table, [dict(row, slot=0) for row in rows])
+
+
+def downgrade():
+    rows = _read(summed=True)
+    op.drop_table('economy_aggregate')
+    table = _create_table()
+    op.bulk_insert(table, rows)
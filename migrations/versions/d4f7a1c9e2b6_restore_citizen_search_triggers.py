@@ -0,0 +1,35 @@
+"""Restore the citizen search triggers dropped by the password_hash table rebuild
+
+Revision ID: d4f7a1c9e2b6
+Revises: c8d2f6a0e4b7
+Create Date: 2026-10-19 10:12:08.604217
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f7a1c9e2b6'
+down_revision = 'c8d2f6a0e4b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases upgraded through c8d2f6a0e4b7 before it skipped SQLite lost the triggers that
+    # keep user_search in sync; recreate them and reindex whatever changed meanwhile.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("CREATE TRIGGER IF NOT EXISTS user_search_ai AFTER INSERT ON user BEGIN "
+               "INSERT INTO user_search(rowid, search_name) VALUES (new.id, new.search_name); END")
+    op.execute("CREATE TRIGGER IF NOT EXISTS user_search_ad AFTER DELETE ON user BEGIN "
+               "INSERT INTO user_search(user_search, rowid, search_name) VALUES ('delete', old.id, old.search_name); END")
+    op.execute("CREATE TRIGGER IF NOT EXISTS user_search_au AFTER UPDATE OF search_name ON user BEGIN "
+               "INSERT INTO user_search(user_search, rowid, search_name) VALUES ('delete', old.id, old.search_name); "
+               "INSERT INTO user_search(rowid, search_name) VALUES (new.id, new.search_name); END")
+    op.execute("INSERT INTO user_search(user_search) VALUES ('rebuild')")
+
+
+def downgrade():
+    pass
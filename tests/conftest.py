@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import bench_app
+
+
+@pytest.fixture
+def app():
+    """A fresh app on its own SQLite file and upload folder."""
+    app = bench_app()
+    with app.app_context():
+        yield app
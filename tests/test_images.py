@@ -0,0 +1,59 @@
+import os
+
+from PIL import Image
+
+from app import db, images
+from app.images import WORKER_DIED, ImagePipeline, build_variants, variant_names
+from app.models import UploadBlob
+from app.uploads import blob_path, save_path
+
+CRASH_COLOR = (255, 0, 0)
+
+
+def crash_on_red(path):
+    """build_variants, except that a pure red image kills the pool process, like a decoder segfault."""
+    with Image.open(path) as image:
+        if image.getpixel((0, 0)) == CRASH_COLOR:
+            os._exit(1)
+    return build_variants(path)
+
+
+def stored_image(app, tmp_path, name, color):
+    path = tmp_path / name
+    Image.new('RGB', (64, 48), color).save(path)
+    key = save_path(str(path))
+    db.session.commit()
+    return key
+
+
+def test_worker_death_marks_only_the_culprit_invalid(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(images, 'build_variants', crash_on_red)
+    good = [stored_image(app, tmp_path, f'good{i}.png', (0, 0, 40 * i)) for i in range(3)]
+    bad = stored_image(app, tmp_path, 'bad.png', CRASH_COLOR)
+
+    pipeline = ImagePipeline(workers=2)
+    try:
+        assert pipeline.run_once() == 4
+        statuses = dict(db.session.query(UploadBlob.key, UploadBlob.status))
+        assert statuses[bad] == 'Invalid'
+        assert all(statuses[key] == 'Ready' for key in good)
+        assert not any(os.path.exists(blob_path(name)) for name in variant_names(bad))
+
+        # The replacement pool keeps working for the next upload.
+        later = stored_image(app, tmp_path, 'later.png', (0, 90, 0))
+        assert pipeline.run_once() == 1
+        assert db.session.get(UploadBlob, later).status == 'Ready'
+        assert pipeline.run_once() == 0
+    finally:
+        pipeline.shutdown()
+
+
+def test_build_reports_the_dead_worker(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(images, 'build_variants', crash_on_red)
+    bad = stored_image(app, tmp_path, 'bad.png', CRASH_COLOR)
+
+    pipeline = ImagePipeline(workers=1)
+    try:
+        assert pipeline.build([blob_path(bad)]) == {blob_path(bad): WORKER_DIED}
+    finally:
+        pipeline.shutdown()
@@ -0,0 +1,21 @@
+from app import db
+from app.models import User
+from app.search import search_citizens
+
+
+def citizen(first_name, last_name, dni):
+    user = User(first_name=first_name, last_name=last_name, dni=dni)
+    db.session.add(user)
+    return user
+
+
+def test_exact_full_name_outranks_a_longer_name(app):
+    # 'ana ruiz abad 111' sorts before 'ana ruiz z999', so only the rank can put the exact name first.
+    longer = citizen('Ana', 'Ruiz Abad', '111')
+    exact = citizen('Ana', 'Ruiz', 'Z999')
+    substring = citizen('Mariana', 'Ruiz', '333')
+    db.session.commit()
+
+    citizens, _ = search_citizens('Ana Ruiz')
+    assert citizens == [exact, longer, substring]
+